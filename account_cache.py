@@ -0,0 +1,92 @@
+import threading
+import time
+
+class AccountSequenceCache:
+    """Caches account sequence numbers for order admission.
+
+    Entries expire after ``ttl`` seconds and are all dropped whenever a new
+    ledger is validated (on_ledger_closed), since any account's sequence may have
+    moved with it. Concurrent lookups for the same address are single-flight:
+    one caller fetches while the others wait for its result.
+    """
+
+    def __init__(self, fetch_sequence, ttl=10.0):
+        self.fetch_sequence = fetch_sequence
+        self.ttl = ttl
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get(self, address):
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            flight = self._in_flight.get(address)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[address] = _Flight()
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            sequence = self.fetch_sequence(address)
+        except Exception as e:
+            with self._lock:
+                # A ledger close may have cleared this flight, and a newer one taken its place
+                if self._in_flight.get(address) is flight:
+                    del self._in_flight[address]
+            flight.fail(e)
+            raise
+
+        with self._lock:
+            # A ledger close during the fetch clears the flight; don't cache a pre-close value then
+            if self._in_flight.get(address) is flight:
+                self._entries[address] = (sequence, time.monotonic())
+                del self._in_flight[address]
+        flight.succeed(sequence)
+        return sequence
+
+    def peek(self, address):
+        """Cached sequence for ``address`` if it is still fresh, without ever fetching."""
+        with self._lock:
+            entry = self._entries.get(address)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def invalidate(self, address=None):
+        with self._lock:
+            if address is None:
+                self._entries.clear()
+                self._in_flight.clear()
+            else:
+                self._entries.pop(address, None)
+                self._in_flight.pop(address, None)
+
+    def on_ledger_closed(self, ledger_index):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
+
+class _Flight:
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def succeed(self, result):
+        self._result = result
+        self._done.set()
+
+    def fail(self, error):
+        self._error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
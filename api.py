@@ -1,102 +1,316 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from order_book import Order, OrderBook
-import time
+from replay_filter import ReplayFilter
+from signature_verifier import VerificationCache, signed_tx_hash
+from market_data import L2SnapshotCache
+from config import REPLAY_CONFIG, SERVER_CONFIG
+import json
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class API:
-    def __init__(self, order_book, matching_engine, xrpl_integration):
-        self.app = Flask(__name__)
+    def __init__(self, order_book, matching_engine, xrpl_integration, market_data=None):
         self.order_book = order_book
         self.matching_engine = matching_engine
         self.xrpl_integration = xrpl_integration
-        self.pending_orders = {}
-        self.last_matching_time = time.time()
+        self.market_data = market_data
+        self.replay_filter = ReplayFilter(REPLAY_CONFIG["window_ledgers"], REPLAY_CONFIG["capacity"])
+        self.verification_cache = VerificationCache(REPLAY_CONFIG["verification_cache_size"])
+        self.l2_cache = L2SnapshotCache(order_book)
 
-        self.setup_routes()
-        self.process_pending_orders()  # Process any existing pending orders on startup
+        self.app = self.create_app()
 
-    def process_pending_orders(self):
-        for address, orders in self.pending_orders.items():
-            for order in orders:
-                self.order_book.add_order(order)
-            self.pending_orders[address] = []  # Clear processed orders
+    def create_app(self):
+        app = Flask(__name__)
+        self.setup_routes(app)
+        return app
 
-    def setup_routes(self):
-        @self.app.route('/place_order', methods=['POST'])
-        def place_order():
-            data = request.json
-            logger.debug(f"Received full order data: {data}")
+    # Order entry. The steps are split out so the synchronous path below and the
+    # async server in asgi_api.py share everything except how they wait on I/O.
+    # Each step returns (response body, HTTP status) to stop admission early.
 
-            try:
-                # Get the current sequence number
-                current_sequence = self.xrpl_integration.get_account_sequence(data['xrp_address'])
-
-                # Check if the provided sequence number is valid
-                if data['sequence'] < current_sequence:
-                    return jsonify({"status": "error", "message": "Invalid sequence number"}), 400
-
-                # Check if multisig_destination is provided
-                if 'multisig_destination' not in data:
-                    return jsonify({"status": "error", "message": "Multisig destination is required"}), 400
-
-                order = Order(
-                    price=data['price'],
-                    amount=data['amount_drops'],
-                    order_type=data['order_type'],
-                    xrp_address=data['xrp_address'],
-                    public_key=data['public_key'],
-                    expiration=data['expiration'],
-                    sequence=data['sequence'],
-                    payment_tx_signature=data['payment_tx_signature'],
-                    multisig_destination=data['multisig_destination'],
-                    last_ledger_sequence=data.get('last_ledger_sequence'),
-                    signed_tx_json=data['signed_tx_json']
-                )
-                logger.debug(f"Created order object: {order.__dict__}")
+    def place_order(self, data):
+        logger.debug(f"Received full order data: {data}")
+        try:
+            tx_hash, response = self.screen_replay(data)
+            if response is not None:
+                return response
 
-                # Verify payment transaction signature
+            # Get the current sequence number
+            current_sequence = self.xrpl_integration.get_account_sequence(data['xrp_address'])
+            order, response = self.build_order(data, current_sequence)
+            if response is not None:
+                return response
+
+            # Verify payment transaction signature, reusing the result for retried submissions
+            verification_key = (tx_hash, order.public_key, order.payment_tx_signature)
+            payment_signature_valid = self.verification_cache.get(verification_key)
+            if payment_signature_valid is None:
                 payment_signature_valid = self.xrpl_integration.verify_payment_signature(
                     order.payment_tx_signature,
                     order.public_key,
                     data['signed_tx_json']
                 )
-                logger.debug(f"Payment signature verification result: {payment_signature_valid}")
+                self.verification_cache.put(verification_key, payment_signature_valid)
+            return self.admit_order(order, tx_hash, payment_signature_valid)
+
+        except Exception as e:
+            logger.error(f"Error processing order: {str(e)}", exc_info=True)
+            return {"status": "error", "message": str(e)}, 400
+
+    def screen_replay(self, data):
+        # Screen out client retries before any crypto or network work. A retry
+        # carries the same signature, so only a miss on it pays for the hash.
+        signature = data['payment_tx_signature']
+        if self.replay_filter.seen(signature):
+            return None, self.replay_response(signature)
+        tx_hash = signed_tx_hash(data['signed_tx_json'])
+        if self.replay_filter.seen(tx_hash):
+            return tx_hash, self.replay_response(signature)
+        return tx_hash, None
+
+    def replay_response(self, payment_tx_signature):
+        if payment_tx_signature in self.order_book.order_map:
+            return {"status": "success", "message": "Order already placed"}, 200
+        return {"status": "error", "message": "Duplicate order"}, 409
+
+    def build_order(self, data, current_sequence):
+        # Check if the provided sequence number is valid
+        if data['sequence'] < current_sequence:
+            return None, ({"status": "error", "message": "Invalid sequence number"}, 400)
+
+        # Check if multisig_destination is provided
+        if 'multisig_destination' not in data:
+            return None, ({"status": "error", "message": "Multisig destination is required"}, 400)
+
+        order = Order(
+            price=self.order_book.market.price_to_ticks(data['price']),
+            amount=self.order_book.market.validate_amount(data['amount_drops']),
+            order_type=data['order_type'],
+            xrp_address=data['xrp_address'],
+            public_key=data['public_key'],
+            expiration=data['expiration'],
+            sequence=data['sequence'],
+            payment_tx_signature=data['payment_tx_signature'],
+            multisig_destination=data['multisig_destination'],
+            last_ledger_sequence=data.get('last_ledger_sequence'),
+            signed_tx_json=data['signed_tx_json']
+        )
+        logger.debug("Created order object: %r", order)
+        return order, None
 
-                if not payment_signature_valid:
-                    logger.warning(f"Invalid payment transaction signature for order: {order.__dict__}")
-                    return jsonify({"status": "error", "message": "Invalid payment transaction signature"}), 400
+    def admit_order(self, order, tx_hash, payment_signature_valid):
+        logger.debug(f"Payment signature verification result: {payment_signature_valid}")
+        if not payment_signature_valid:
+            logger.warning("Invalid payment transaction signature for order: %r", order)
+            return {"status": "error", "message": "Invalid payment transaction signature"}, 400
 
-                # Store the order in a pending orders list, sorted by sequence number
-                self.pending_orders.setdefault(data['xrp_address'], []).append(order)
-                self.pending_orders[data['xrp_address']].sort(key=lambda x: x.sequence)
+        rejected = self.insert_orders([(order, tx_hash)])
+        if order in rejected:
+            return rejected[order]
+        logger.info("Order placed and processed: %r", order)
+        return {"status": "success", "message": "Order placed and processed"}, 200
 
-                self.process_pending_orders()  # Process pending orders after adding a new one
-                logger.info(f"Order placed and processed: {order.__dict__}")
-                return jsonify({"status": "success", "message": "Order placed and processed"})
+    def insert_orders(self, admissions):
+        """Insert verified (order, tx_hash) pairs into the book in one pass under the book lock.
 
+        Each account's orders go in by sequence number. Returns {order: (response
+        body, HTTP status)} for orders the book refused.
+        """
+        rejected = {}
+        with self.order_book.lock:
+            for order, tx_hash in sorted(admissions, key=lambda admission: (admission[0].xrp_address, admission[0].sequence)):
+                try:
+                    self.order_book.add_order(order)
+                except ValueError as e:
+                    if order.payment_tx_signature in self.order_book.order_map:
+                        # A concurrent retry got in after both passed screen_replay
+                        rejected[order] = self.replay_response(order.payment_tx_signature)
+                    else:
+                        rejected[order] = ({"status": "error", "message": str(e)}, 400)
+                    continue
+                self.replay_filter.add(order.payment_tx_signature, tx_hash)
+        return rejected
+
+    # Bulk order entry. /place_orders takes {"orders": [...]} with the same fields
+    # as /place_order and answers with one result per order, in request order.
+    # Accounts are looked up once each, uncached signatures are verified as one
+    # batch and the survivors go into the book in a single insert_orders pass.
+
+    def place_orders(self, data):
+        batch, response = self.screen_orders(data)
+        if response is not None:
+            return response
+
+        try:
+            sequences = {}
+            for address in {entry["data"]["xrp_address"] for entry in batch if entry["result"] is None}:
+                try:
+                    sequences[address] = self.xrpl_integration.get_account_sequence(address)
+                except Exception as e:
+                    sequences[address] = e
+            self.build_orders(batch, sequences)
+
+            unverified = self.unverified_orders(batch)
+            if unverified:
+                verified = self.xrpl_integration.verify_payment_signatures(
+                    [(entry["order"].payment_tx_signature, entry["order"].public_key, entry["data"]["signed_tx_json"]) for entry in unverified]
+                )
+                self.record_verifications(unverified, verified)
+            return self.admit_orders(batch)
+        except Exception as e:
+            logger.error(f"Error processing bulk order request: {str(e)}", exc_info=True)
+            return {"status": "error", "message": str(e)}, 400
+
+    def screen_orders(self, data):
+        orders = data.get("orders") if isinstance(data, dict) else None
+        if not isinstance(orders, list) or not orders:
+            return None, ({"status": "error", "message": "Expected a non-empty list of orders"}, 400)
+        if len(orders) > SERVER_CONFIG["max_bulk_orders"]:
+            return None, ({"status": "error", "message": f"At most {SERVER_CONFIG['max_bulk_orders']} orders per request"}, 400)
+
+        batch = []
+        signatures = set()
+        for order_data in orders:
+            entry = {"data": order_data, "result": None, "order": None, "tx_hash": None, "valid": None}
+            batch.append(entry)
+            try:
+                order_data['xrp_address']  # Needed up front to group the account lookups
+                if order_data['payment_tx_signature'] in signatures:
+                    entry["result"] = ({"status": "error", "message": "Duplicate order"}, 409)
+                    continue
+                signatures.add(order_data['payment_tx_signature'])
+                entry["tx_hash"], entry["result"] = self.screen_replay(order_data)
             except Exception as e:
-                logger.error(f"Error processing order: {str(e)}", exc_info=True)
-                return jsonify({"status": "error", "message": str(e)}), 400
+                entry["result"] = ({"status": "error", "message": str(e)}, 400)
+        return batch, None
 
-        @self.app.route('/l2_order_book', methods=['GET'])
+    def build_orders(self, batch, sequences):
+        for entry in batch:
+            if entry["result"] is not None:
+                continue
+            try:
+                current_sequence = sequences[entry["data"]["xrp_address"]]
+                if isinstance(current_sequence, Exception):
+                    raise current_sequence
+                entry["order"], entry["result"] = self.build_order(entry["data"], current_sequence)
+            except Exception as e:
+                entry["result"] = ({"status": "error", "message": str(e)}, 400)
+
+    def unverified_orders(self, batch):
+        """Fill in cached verification results, returning the entries still to verify."""
+        unverified = []
+        for entry in batch:
+            if entry["result"] is None:
+                order = entry["order"]
+                entry["valid"] = self.verification_cache.get((entry["tx_hash"], order.public_key, order.payment_tx_signature))
+                if entry["valid"] is None:
+                    unverified.append(entry)
+        return unverified
+
+    def record_verifications(self, unverified, verified):
+        for entry, payment_signature_valid in zip(unverified, verified):
+            order = entry["order"]
+            entry["valid"] = payment_signature_valid
+            self.verification_cache.put((entry["tx_hash"], order.public_key, order.payment_tx_signature), payment_signature_valid)
+
+    def admit_orders(self, batch):
+        admissions = []
+        for entry in batch:
+            if entry["result"] is None and not entry["valid"]:
+                logger.warning("Invalid payment transaction signature for order: %r", entry["order"])
+                entry["result"] = ({"status": "error", "message": "Invalid payment transaction signature"}, 400)
+            elif entry["result"] is None:
+                admissions.append((entry["order"], entry["tx_hash"]))
+
+        rejected = self.insert_orders(admissions) if admissions else {}
+        for entry in batch:
+            if entry["result"] is None:
+                if entry["order"] in rejected:
+                    entry["result"] = rejected[entry["order"]]
+                else:
+                    entry["result"] = ({"status": "success", "message": "Order placed and processed"}, 200)
+        logger.info(f"Bulk order request: {len(admissions) - len(rejected)} of {len(batch)} orders placed")
+        results = [dict(entry["result"][0], code=entry["result"][1]) for entry in batch]
+        return {"status": "success", "results": results}, 200
+
+    def l2_order_book(self, args, headers):
+        """Cached /l2_order_book response as (body bytes, HTTP status, headers).
+
+        Accepts ``depth`` (levels per side) and ``bucket`` (a price step that
+        levels are grouped by). The ETag is the book version.
+        """
+        try:
+            depth, bucket = self.l2_query(args)
+        except ValueError as e:
+            return self.l2_error(e)
+        return self.l2_response(self.l2_cache.get(depth, bucket), headers)
+
+    def l2_query(self, args):
+        """(depth, bucket in ticks) from /l2_order_book query arguments; raises ValueError."""
+        depth = int(args['depth']) if args.get('depth') else None
+        bucket = self.order_book.market.price_to_ticks(args['bucket']) if args.get('bucket') else None
+        if (depth is not None and depth <= 0) or (bucket is not None and bucket <= 0):
+            raise ValueError("depth and bucket must be positive")
+        return depth, bucket
+
+    def l2_error(self, error):
+        return json.dumps({"status": "error", "message": str(error)}).encode(), 400, {}
+
+    def l2_response(self, cached, headers):
+        version, body = cached
+        etag = f'"{version}"'
+        if headers.get('If-None-Match') == etag:
+            return b"", 304, {"ETag": etag}
+        return body, 200, {"ETag": etag}
+
+    def setup_routes(self, app):
+        @app.route('/place_order', methods=['POST'])
+        def place_order():
+            body, status = self.place_order(request.json)
+            return jsonify(body), status
+
+        @app.route('/place_orders', methods=['POST'])
+        def place_orders():
+            body, status = self.place_orders(request.json)
+            return jsonify(body), status
+
+        @app.route('/l2_order_book', methods=['GET'])
         def get_l2_order_book():
-            self.order_book.clean_expired_orders()
-            book = self.order_book.get_l2_order_book()
-            logger.debug(f"Current L2 order book: {book}")
-            return jsonify(book)
-
-    def run(self):
-        def run_matching_engine():
-            current_time = time.time()
-            if current_time - self.last_matching_time >= self.matching_engine.batch_interval:
-                self.matching_engine.run_batch_auction()  # Runs every 15 seconds
-                self.last_matching_time = current_time
-
-        @self.app.before_request
-        def before_request():
-            run_matching_engine()
-
-        self.app.run(debug=True)
+            body, status, headers = self.l2_order_book(request.args, request.headers)
+            return Response(body, status=status, headers=headers, mimetype='application/json')
+
+        if self.market_data is not None:
+            @app.route('/stream/l2', methods=['GET'])
+            def stream_l2():
+                return Response(self.l2_events(self.last_event_id(request.headers)), mimetype='text/event-stream')
+
+    def last_event_id(self, headers):
+        last_event_id = headers.get('Last-Event-ID', '')
+        return int(last_event_id) if last_event_id.isdigit() else None
+
+    def l2_events(self, last_sequence=None, keepalive=15):
+        """Server-sent event stream of the market data feed, for the threaded server."""
+        subscription, initial = self.market_data.subscribe(last_sequence)
+        try:
+            for message in initial:
+                yield message.sse
+            while True:
+                message = subscription.get(keepalive)
+                if message is not None:
+                    yield message.sse
+                elif subscription.lagged:
+                    yield self.market_data.resync(subscription).sse
+                else:
+                    yield b": keepalive\n\n"
+        finally:
+            self.market_data.unsubscribe(subscription)
+
+    def run(self, host="127.0.0.1", port=5000):
+        # Auctions are fired by AuctionScheduler, never from a request. main() starts
+        # it and the other background services before this, so the debug reloader,
+        # which re-runs the script in a child process, would run a second exchange
+        # against its own book: keep the debugger, never the reloader.
+        self.app.run(host=host, port=port, debug=True, use_reloader=False)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+from api import API
+
+logger = logging.getLogger(__name__)
+
+class AsyncAPI(API):
+    """The order-entry API served from an asyncio event loop.
+
+    Same routes and responses as the Flask server, but account lookups and
+    signature checks are awaited, so many submissions can be in flight at once
+    while each waits on the XRPL or the verifier pool. Book mutations wait for
+    ``order_book.lock`` off the loop while an auction holds it. Requires the
+    ``asgi`` extra (starlette, uvicorn).
+    """
+
+    def create_app(self):
+        routes = [
+            Route('/place_order', self.handle_place_order, methods=['POST']),
+            Route('/place_orders', self.handle_place_orders, methods=['POST']),
+            Route('/l2_order_book', self.handle_l2_order_book, methods=['GET']),
+        ]
+        if self.market_data is not None:
+            routes += [
+                Route('/stream/l2', self.handle_l2_stream, methods=['GET']),
+                WebSocketRoute('/ws/l2', self.handle_l2_websocket),
+            ]
+        return Starlette(routes=routes)
+
+    async def with_book_lock(self, function, *args):
+        """Call ``function`` holding the book lock without blocking the event loop.
+
+        The lock is only contended while an auction runs; only then is the call
+        moved to a worker thread to wait for it.
+        """
+        if self.order_book.lock.acquire(blocking=False):
+            try:
+                return function(*args)
+            finally:
+                self.order_book.lock.release()
+        return await asyncio.to_thread(self._call_locked, function, *args)
+
+    def _call_locked(self, function, *args):
+        with self.order_book.lock:
+            return function(*args)
+
+    async def place_order_async(self, data):
+        logger.debug(f"Received full order data: {data}")
+        try:
+            tx_hash, response = self.screen_replay(data)
+            if response is not None:
+                return response
+
+            current_sequence = await self.xrpl_integration.get_account_sequence_async(data['xrp_address'])
+            order, response = self.build_order(data, current_sequence)
+            if response is not None:
+                return response
+
+            verification_key = (tx_hash, order.public_key, order.payment_tx_signature)
+            payment_signature_valid = self.verification_cache.get(verification_key)
+            if payment_signature_valid is None:
+                payment_signature_valid = await self.xrpl_integration.verify_payment_signature_async(
+                    order.payment_tx_signature,
+                    order.public_key,
+                    data['signed_tx_json']
+                )
+                self.verification_cache.put(verification_key, payment_signature_valid)
+            return await self.with_book_lock(self.admit_order, order, tx_hash, payment_signature_valid)
+
+        except Exception as e:
+            logger.error(f"Error processing order: {str(e)}", exc_info=True)
+            return {"status": "error", "message": str(e)}, 400
+
+    async def place_orders_async(self, data):
+        batch, response = self.screen_orders(data)
+        if response is not None:
+            return response
+
+        try:
+            addresses = list({entry["data"]["xrp_address"] for entry in batch if entry["result"] is None})
+            lookups = await asyncio.gather(*(self.xrpl_integration.get_account_sequence_async(address) for address in addresses), return_exceptions=True)
+            self.build_orders(batch, dict(zip(addresses, lookups)))
+
+            unverified = self.unverified_orders(batch)
+            if unverified:
+                verified = await self.xrpl_integration.verify_payment_signatures_async(
+                    [(entry["order"].payment_tx_signature, entry["order"].public_key, entry["data"]["signed_tx_json"]) for entry in unverified]
+                )
+                self.record_verifications(unverified, verified)
+            return await self.with_book_lock(self.admit_orders, batch)
+        except Exception as e:
+            logger.error(f"Error processing bulk order request: {str(e)}", exc_info=True)
+            return {"status": "error", "message": str(e)}, 400
+
+    async def handle_place_order(self, request):
+        body, status = await self.place_order_async(await request.json())
+        return JSONResponse(body, status_code=status)
+
+    async def handle_place_orders(self, request):
+        body, status = await self.place_orders_async(await request.json())
+        return JSONResponse(body, status_code=status)
+
+    async def handle_l2_order_book(self, request):
+        try:
+            depth, bucket = self.l2_query(request.query_params)
+        except ValueError as e:
+            body, status, headers = self.l2_error(e)
+        else:
+            # A cache hit never touches the book lock, so it is served even while an auction holds it
+            cached = self.l2_cache.cached(depth, bucket)
+            if cached is None:
+                cached = await self.with_book_lock(self.l2_cache.get, depth, bucket)
+            body, status, headers = self.l2_response(cached, request.headers)
+        return Response(body, status_code=status, headers=headers, media_type='application/json')
+
+    async def subscribe_async(self, last_sequence=None):
+        # Subscribing takes the book lock, which a running auction may hold
+        return await asyncio.to_thread(self.market_data.subscribe, last_sequence, asyncio.get_running_loop())
+
+    async def next_message(self, subscription, keepalive=None):
+        """Next message to send a subscriber: a delta, a resync snapshot, or None on keepalive timeout."""
+        message = await subscription.get_async(keepalive)
+        if message is None and subscription.lagged:
+            message = await asyncio.to_thread(self.market_data.resync, subscription)
+        return message
+
+    async def handle_l2_stream(self, request):
+        subscription, initial = await self.subscribe_async(self.last_event_id(request.headers))
+
+        async def events():
+            try:
+                for message in initial:
+                    yield message.sse
+                while True:
+                    message = await self.next_message(subscription, keepalive=15)
+                    yield message.sse if message is not None else b": keepalive\n\n"
+            finally:
+                self.market_data.unsubscribe(subscription)
+
+        return StreamingResponse(events(), media_type='text/event-stream')
+
+    async def handle_l2_websocket(self, websocket):
+        """Same feed as /stream/l2; the client sends {"type": "resync"} when it detects a gap."""
+        await websocket.accept()
+        subscription, initial = await self.subscribe_async()
+
+        async def send():
+            for message in initial:
+                await websocket.send_text(message.text)
+            while True:
+                await websocket.send_text((await self.next_message(subscription)).text)
+
+        async def receive():
+            while True:
+                command = await websocket.receive_json()
+                if command.get("type") == "resync":
+                    subscription.mark_lagged()
+
+        tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not isinstance(task.exception(), WebSocketDisconnect):
+                    task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.market_data.unsubscribe(subscription)
+
+    def run(self, host="127.0.0.1", port=5000):
+        import uvicorn
+        uvicorn.run(self.app, host=host, port=port)
@@ -0,0 +1,106 @@
+import logging
+import math
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+class AuctionRun(namedtuple("AuctionRun", ["scheduled", "started", "finished", "succeeded"])):
+    """Wall-clock timestamps of one auction."""
+    __slots__ = ()
+
+    @property
+    def skew(self):
+        return self.started - self.scheduled
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+class AuctionScheduler:
+    """Fires batch auctions on a wall-clock grid, on its own thread.
+
+    Auctions start at every multiple of ``batch_interval`` seconds since the
+    epoch, independent of request traffic. If an auction overruns one or more
+    grid points, those are skipped (and counted in ``missed``) rather than run
+    back to back. The last ``history`` runs are kept for skew and duration
+    metrics.
+    """
+
+    def __init__(self, run_auction, batch_interval=15, history=100):
+        self.run_auction = run_auction
+        self.batch_interval = batch_interval
+        self.runs = deque(maxlen=history)
+        self.missed = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def next_auction_time(self, now=None):
+        now = time.time() if now is None else now
+        return math.floor(now / self.batch_interval + 1) * self.batch_interval
+
+    def _run(self):
+        scheduled = self.next_auction_time()
+        while not self._wait_until(scheduled):
+            self.runs.append(self._fire(scheduled))
+
+            following = self.next_auction_time()
+            skipped = round((following - scheduled) / self.batch_interval) - 1
+            if skipped > 0:
+                self.missed += skipped
+                logger.warning(f"Auction overran {skipped} grid point(s); next auction at {following}")
+            scheduled = following
+
+    def _wait_until(self, deadline):
+        # Event.wait can return a little early, so re-check against the wall clock
+        while (remaining := deadline - time.time()) > 0:
+            if self._stop_event.wait(remaining):
+                return True
+        return self._stop_event.is_set()
+
+    def _fire(self, scheduled):
+        started = time.time()
+        succeeded = True
+        try:
+            self.run_auction()
+        except Exception as e:
+            succeeded = False
+            logger.error(f"Batch auction failed: {e}", exc_info=True)
+        finished = time.time()
+        logger.info(f"Auction for {scheduled} started {(started - scheduled) * 1000:.1f}ms late, "
+                    f"took {(finished - started) * 1000:.1f}ms")
+        return AuctionRun(scheduled, started, finished, succeeded)
+
+    @property
+    def last_run(self):
+        return self.runs[-1] if self.runs else None
+
+    def metrics(self):
+        """Skew and duration summary (seconds) over the recorded runs."""
+        skews = sorted(run.skew for run in self.runs)
+        durations = [run.duration for run in self.runs]
+        last = self.last_run
+        return {
+            "auctions": len(skews),
+            "missed": self.missed,
+            "failed": sum(not run.succeeded for run in self.runs),
+            "last_scheduled": last.scheduled if last else None,
+            "last_started": last.started if last else None,
+            "last_finished": last.finished if last else None,
+            "skew_mean": sum(skews) / len(skews) if skews else None,
+            "skew_p99": skews[min(len(skews) - 1, math.ceil(len(skews) * 0.99) - 1)] if skews else None,
+            "skew_max": skews[-1] if skews else None,
+            "duration_max": max(durations) if durations else None,
+        }
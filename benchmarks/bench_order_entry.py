@@ -0,0 +1,152 @@
+"""Order-entry latency and throughput, Flask server against the ASGI server.
+
+Run from the project root (needs the asgi extra):
+
+    python -m benchmarks.bench_order_entry [orders] [concurrency] [rpc_latency_ms]
+
+Serves each API on localhost with a mocked XRPLIntegration whose account
+lookups take ``rpc_latency_ms``. Signature checks are mocked out too, so the
+numbers isolate how well each server overlaps waiting requests; verifier
+throughput has its own benchmark. Pre-signed orders are posted to /place_order
+with ``concurrency`` requests in flight and the table reports requests per
+second and p50/p99 latency of the successful requests, plus failed requests.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import socket
+import statistics
+import sys
+import time
+from unittest.mock import Mock
+import uvicorn
+from werkzeug.serving import make_server
+from xrpl.models import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+from api import API
+from asgi_api import AsyncAPI
+from order_book import OrderBook
+
+FLASK_PORT = 5071
+ASGI_PORT = 5072
+
+class MockXRPLIntegration:
+    def __init__(self, rpc_latency):
+        self.rpc_latency = rpc_latency
+
+    def get_account_sequence(self, address):
+        time.sleep(self.rpc_latency)
+        return 1
+
+    async def get_account_sequence_async(self, address):
+        await asyncio.sleep(self.rpc_latency)
+        return 1
+
+    def verify_payment_signature(self, payment_tx_signature, public_key, signed_tx_json):
+        return True
+
+    async def verify_payment_signature_async(self, payment_tx_signature, public_key, signed_tx_json):
+        return True
+
+def order_requests(count):
+    wallet = Wallet.create()
+    requests = []
+    for sequence in range(1, count + 1):
+        payment = Payment(account=wallet.classic_address, amount="1000000", destination="rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+                          sequence=sequence, fee="12", last_ledger_sequence=1000)
+        signed_tx_json = sign(payment, wallet).to_xrpl()
+        requests.append({
+            "price": f"{1 + sequence % 100 / 100:.2f}", "amount_drops": 1000000, "order_type": "buy" if sequence % 2 else "sell",
+            "xrp_address": wallet.classic_address, "public_key": wallet.public_key,
+            "expiration": int(time.time()) + 3600, "sequence": sequence,
+            "payment_tx_signature": signed_tx_json["TxnSignature"],
+            "multisig_destination": "rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+            "signed_tx_json": signed_tx_json,
+        })
+    return requests
+
+async def post(connection, port, body):
+    """Send one request over a keep-alive connection, reconnecting if the server closed it."""
+    if connection is None:
+        connection = await asyncio.open_connection("127.0.0.1", port)
+    reader, writer = connection
+    writer.write(b"POST /place_order HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                 b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) != b"\r\n":
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers["content-length"]))
+    if headers.get("connection", "").lower() == "close":
+        writer.close()
+        connection = None
+    return connection, status
+
+async def load(port, requests, concurrency):
+    # A bare asyncio client keeps the load generator from being the bottleneck
+    bodies = iter([json.dumps(data).encode() for data in requests])
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        connection = None
+        for body in bodies:
+            start = time.perf_counter()
+            try:
+                connection, status = await post(connection, port, body)
+            except (OSError, asyncio.IncompleteReadError):
+                connection, status = None, None
+            if status != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, errors
+
+def serve(api_class, port, rpc_latency):
+    logging.disable(logging.CRITICAL)
+    api = api_class(OrderBook(), Mock(), MockXRPLIntegration(rpc_latency))
+    if api_class is AsyncAPI:
+        uvicorn.run(api.app, host="127.0.0.1", port=port, log_level="warning")
+    else:
+        make_server("127.0.0.1", port, api.app, threaded=True).serve_forever()
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rpc_latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1000
+    logging.disable(logging.CRITICAL)
+    requests = order_requests(count)
+
+    print(f"{count} orders, {concurrency} in flight, {rpc_latency * 1000:.0f}ms account lookups")
+    print(f"{'server':<8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for name, api_class, port in (("flask", API, FLASK_PORT), ("asgi", AsyncAPI, ASGI_PORT)):
+        # Each server gets its own process so it does not share a GIL with the load generator
+        server = multiprocessing.Process(target=serve, args=(api_class, port, rpc_latency), daemon=True)
+        server.start()
+        wait_for_port(port)
+        elapsed, latencies, errors = asyncio.run(load(port, requests, concurrency))
+        server.terminate()
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f"{name:<8} {len(latencies) / elapsed:>10.0f} {percentiles[49] * 1000:>10.1f} {percentiles[98] * 1000:>10.1f} {errors:>8}")
+
+if __name__ == "__main__":
+    main()
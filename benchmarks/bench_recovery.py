@@ -0,0 +1,88 @@
+"""Order book recovery time from a snapshot plus journal tail.
+
+Run from the project root:
+
+    python -m benchmarks.bench_recovery [orders] [tail_records]
+
+Fills a book with ``orders`` resting orders (each with a signed_tx_json-sized
+payload), snapshots it through OrderJournal, then journals ``tail_records``
+further adds, fills and cancels. Reports snapshot time and size, journal write
+rate, and how long recover() takes to rebuild the book in a fresh process
+state from the snapshot and tail.
+
+The target for 1M orders is the low seconds; see docs/testing.md for the
+current figure and where the time goes.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from order_book import OrderBook, Order
+from order_journal import OrderJournal
+
+def make_orders(count, start=0):
+    expiration = int(time.time()) + 3600
+    orders = []
+    for i in range(start, start + count):
+        address = f"r{i % 20000:033d}"
+        sequence = i // 20000 + 1
+        signature = f"{i:0128X}"
+        signed_tx_json = {
+            "Account": address, "Amount": "1000000", "Destination": "rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+            "Fee": "12", "Flags": 0, "LastLedgerSequence": 100000, "Sequence": sequence,
+            "SigningPubKey": "ED" + "A" * 64, "TransactionType": "Payment", "TxnSignature": signature,
+        }
+        orders.append(Order(9000 + i % 2000, 1000000, "buy" if i % 2 else "sell", address, "ED" + "A" * 64,
+                            expiration, sequence, signature, "rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh", 100000, signed_tx_json))
+    return orders
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tail = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directory:
+        order_book = OrderBook()
+        order_book.restore(make_orders(count))
+        journal = OrderJournal(order_book, directory, snapshot_interval=None)
+        journal.start()
+
+        start = time.perf_counter()
+        journal.snapshot()
+        snapshot_time = time.perf_counter() - start
+        snapshot_size = directory_size(directory)
+
+        # The tail: a third new orders, a third partial fills, a third cancels
+        new_orders = make_orders(tail // 3, start=count)
+        resting = list(order_book.order_map.values())
+        start = time.perf_counter()
+        for order in new_orders:
+            order_book.add_order(order)
+        for order in resting[:tail // 3]:
+            order_book.fill_order(order, 1000)
+        for order in resting[-(tail // 3):]:
+            order_book.remove_order(order)
+        journal.sync()
+        tail_time = time.perf_counter() - start
+        journal.stop()
+        expected = len(order_book.order_map)
+        del order_book, resting, new_orders
+
+        recovered_book = OrderBook()
+        start = time.perf_counter()
+        OrderJournal(recovered_book, directory, snapshot_interval=None).recover()
+        recovery_time = time.perf_counter() - start
+        assert len(recovered_book.order_map) == expected
+
+    records = 3 * (tail // 3)
+    print(f"{count} resting orders, {records} journal records in the tail")
+    print(f"snapshot:  {snapshot_time:8.2f} s  {snapshot_size / 1e6:8.1f} MB")
+    print(f"journal:   {records / tail_time:8.0f} records/s (including fsync)")
+    print(f"recovery:  {recovery_time:8.2f} s  ({expected} orders)")
+
+if __name__ == "__main__":
+    main()
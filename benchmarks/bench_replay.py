@@ -0,0 +1,66 @@
+"""Replay a recorded order flow offline through each matching engine backend.
+
+Run from the project root:
+
+    python -m benchmarks.bench_replay <recording.jsonl> [backend ...]
+    python -m benchmarks.bench_replay --synthetic [orders] [orders_per_auction]
+
+A recording comes from running main.py with RECORDING_CONFIG["path"] set.
+``--synthetic`` generates a seeded random flow instead. Each backend (default:
+python and numpy) replays the flow through OrderBook, MatchingEngine and
+Settlement against a stubbed XRPL at full speed. The table reports order
+insertion rate, p50/p99/max auction latency, total fills and volume, and how
+many auctions came out differently from the recording.
+"""
+import contextlib
+import io
+import logging
+import random
+import sys
+import time
+from order_flow import load_order_flow, replay
+
+def synthetic_flow(count, orders_per_auction, seed=1):
+    rng = random.Random(seed)
+    now = time.time()
+    events = []
+    for i in range(count):
+        now += 0.01
+        address = f"r{rng.randrange(2000):033d}"
+        signature = f"{i:0128X}"
+        events.append({"type": "order", "time": now, "order": [
+            rng.randrange(9900, 10100), rng.randrange(1, 100) * 1000000, "buy" if rng.random() < 0.5 else "sell",
+            address, "ED" + "A" * 64, int(now) + rng.randrange(30, 600), i + 1, signature,
+            "rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh", 100000, {"Account": address, "Sequence": i + 1, "TxnSignature": signature},
+        ]})
+        if (i + 1) % orders_per_auction == 0:
+            # No recorded outcome to compare against
+            events.append({"type": "auction", "time": now, "ledger": 1000})
+    return events
+
+def main():
+    logging.disable(logging.CRITICAL)
+    if len(sys.argv) > 1 and sys.argv[1] == "--synthetic":
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+        orders_per_auction = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        events = synthetic_flow(count, orders_per_auction)
+        backends = ["python", "numpy"]
+        print(f"synthetic flow: {count} orders, an auction every {orders_per_auction}")
+    elif len(sys.argv) > 1:
+        events = load_order_flow(sys.argv[1])
+        backends = sys.argv[2:] or ["python", "numpy"]
+        print(f"{sys.argv[1]}: {len(events)} events")
+    else:
+        sys.exit(__doc__)
+
+    print(f"{'backend':<8} {'orders/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'fills':>8} {'volume':>16} {'mismatch':>9}")
+    for backend in backends:
+        # execute_trades prints every auction
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = replay(events, backend=backend)
+        print(f"{backend:<8} {report.orders_per_second:>10.0f} {report.auction_latency(0.5) * 1000:>8.1f} "
+              f"{report.auction_latency(0.99) * 1000:>8.1f} {report.auction_latency(1.0) * 1000:>8.1f} "
+              f"{report.fills:>8} {report.volume:>16} {report.mismatches:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Signature verification throughput per key type.
+
+Run from the project root:
+
+    python -m benchmarks.bench_signature_verification [orders] [workers]
+
+Signs ``orders`` payments offline for each key type and reports verifications
+per second in the request thread and through SignatureVerifier.verify_many.
+"""
+import asyncio
+import os
+import sys
+import time
+from xrpl.constants import CryptoAlgorithm
+from xrpl.models import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+from signature_verifier import SignatureVerifier, verify_payment_signature
+
+def signed_orders(algorithm, count):
+    wallet = Wallet.create(algorithm=algorithm)
+    orders = []
+    for sequence in range(1, count + 1):
+        payment = Payment(
+            account=wallet.classic_address,
+            amount=str(1000000 + sequence),
+            destination="rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+            sequence=sequence,
+            fee="12",
+            last_ledger_sequence=1000
+        )
+        signed_tx_json = sign(payment, wallet).to_xrpl()
+        orders.append((signed_tx_json["TxnSignature"], wallet.public_key, signed_tx_json))
+    return orders
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    verifier = SignatureVerifier(workers=workers)
+    # Warm up the worker processes so spawn time is not counted
+    asyncio.run(verifier.verify_many(signed_orders(CryptoAlgorithm.ED25519, workers)))
+
+    print(f"{'key type':<10} {'mode':<22} {'verifies/s':>12}")
+    for algorithm in (CryptoAlgorithm.SECP256K1, CryptoAlgorithm.ED25519):
+        orders = signed_orders(algorithm, count)
+
+        start = time.perf_counter()
+        assert all(verify_payment_signature(*order) for order in orders)
+        inline_rate = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        assert all(asyncio.run(verifier.verify_many(orders)))
+        pool_rate = count / (time.perf_counter() - start)
+
+        print(f"{algorithm.value:<10} {'inline':<22} {inline_rate:>12.0f}")
+        print(f"{algorithm.value:<10} {f'verify_many ({workers} workers)':<22} {pool_rate:>12.0f}")
+
+    verifier.shutdown()
+
+if __name__ == "__main__":
+    main()
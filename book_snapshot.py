@@ -0,0 +1,371 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from itertools import chain, count
+from operator import itemgetter
+from order_book import Order, OrderType
+
+# File layout, all little-endian:
+#   header       HEADER, then the metadata as UTF-8 JSON
+#   signatures   every payment_tx_signature as UTF-8 in record order, each followed by
+#                a newline so the region splits in one call
+#   blobs        per order: signed_tx_json as compact JSON, a u32 length (NONE_LENGTH
+#                for None) followed by the bytes
+#   strings      u32 count, then length-prefixed UTF-8 strings; addresses and public
+#                keys are stored once here and referenced by index (0 is None)
+#   records      one fixed-width RECORD per order, in book arrival order
+#   index        the book's own indexes over the records, so restoring needs no
+#                per-order grouping: a LEVEL per price level and an ACCOUNT per
+#                account, then the INDEX_ARRAYS, count entries each
+MAGIC = b"XDEXBOOK"
+VERSION = 2
+HEADER = struct.Struct("<8sIIQQQQQQQ")  # magic, version, metadata length, order count, level count, account count, signatures offset, strings offset, records offset, index offset
+RECORD = struct.Struct("<qqqqqBBxxIIIQ")  # price, amount, expiration, sequence, last_ledger_sequence, order type, flags, address, public key, multisig destination, blob offset
+LEVEL = struct.Struct("<qqIBxxx")  # price, total volume, order count, order type
+ACCOUNT = struct.Struct("<II")  # address, order count
+# The offset each signature ends at (before its newline), in record order; record
+# numbers by level (arrival order within each), by account (sequence order within
+# each) and by expiration (ties in arrival order); and the expirations in that order
+INDEX_ARRAYS = (("signature_ends", "Q"), ("by_level", "I"), ("by_account", "I"), ("by_expiration", "I"), ("expirations", "q"))
+SIGNATURE_END = struct.Struct("<Q")
+LENGTH = struct.Struct("<I")
+NONE_LENGTH = 0xFFFFFFFF
+
+HAS_SEQUENCE = 1
+HAS_LAST_LEDGER_SEQUENCE = 2
+HAS_PAYMENT_TX_SIGNATURE = 4
+ORDER_TYPES = (OrderType.BUY, OrderType.SELL)
+
+# The slot SnapshotOrder.signed_tx_json stores the decoded value in
+_signed_tx_json_slot = Order.signed_tx_json
+# Slots a restored order loads from its record on first use
+_RECORD_FIELDS = frozenset(Order.__slots__) - {"payment_tx_signature", "signed_tx_json"} | {"_blob_offset"}
+
+class SnapshotOrder(Order):
+    """An Order read from a BookSnapshot.
+
+    Orders from indexing or iterating a snapshot are loaded up front. Orders
+    from restore_into start with only payment_tx_signature set and load the
+    rest of their record the first time any other field is read, so a restart
+    does not pay for every order's fields before the book is usable.
+    signed_tx_json stays in the mapped file until first read either way; until
+    then a later snapshot copies the raw bytes across without decoding them.
+    """
+    __slots__ = ("_snapshot", "_index", "_blob_offset")
+
+    def __getattr__(self, name):
+        # Only reached for slots that are not set: the record fields of an unloaded order
+        snapshot = self._snapshot if name in _RECORD_FIELDS else None
+        if snapshot is None:
+            raise AttributeError(f"'SnapshotOrder' object has no attribute '{name}'")
+        snapshot.load(self)
+        return object.__getattribute__(self, name)
+
+    @property
+    def signed_tx_json(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            _signed_tx_json_slot.__set__(self, snapshot.signed_tx_json_at(self._blob_offset))
+            self._snapshot = None
+        return _signed_tx_json_slot.__get__(self)
+
+    @signed_tx_json.setter
+    def signed_tx_json(self, value):
+        if self._snapshot is not None:
+            # The other fields can no longer be loaded once the snapshot is let go
+            self._snapshot.load(self)
+        self._snapshot = None
+        _signed_tx_json_slot.__set__(self, value)
+
+_blob_offset_slot = SnapshotOrder._blob_offset
+_matched_amount_slot = Order.matched_amount
+
+def _blob(value):
+    if value is None:
+        return LENGTH.pack(NONE_LENGTH)
+    return LENGTH.pack(len(value)) + value
+
+def _sequence_key(member):
+    # (sequence, record number), orders without a sequence first like AccountOrders
+    return member[0] if member[0] is not None else -1
+
+def write_snapshot(path, orders, metadata=None):
+    """Write ``orders`` (in arrival order) and a JSON-able ``metadata`` dict to ``path``; returns the order count."""
+    orders = list(orders)
+    metadata_bytes = json.dumps(metadata or {}, separators=(",", ":")).encode()
+    strings = {None: 0}
+    records = bytearray()
+    signature_ends = array("Q")
+    # Level and account members, and expirations, by record number
+    levels = {}
+    level_volumes = {}
+    accounts = {}
+    expirations = []
+
+    def string_index(value):
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        f.write(metadata_bytes)
+        signatures_offset = HEADER.size + len(metadata_bytes)
+        end = 0
+        for order in orders:
+            if order.payment_tx_signature is not None:
+                signature = order.payment_tx_signature.encode()
+                f.write(signature)
+                end += len(signature)
+            signature_ends.append(end)
+            f.write(b"\n")
+            end += 1
+
+        offset = signatures_offset + end
+        for number, order in enumerate(orders):
+            if type(order) is SnapshotOrder and order._snapshot is not None:
+                # Never decoded, so the stored JSON is still current
+                signed_tx_json = order._snapshot.raw_blob_at(order._blob_offset)
+            else:
+                signed_tx_json = order.signed_tx_json
+                signed_tx_json = json.dumps(signed_tx_json, separators=(",", ":")).encode() if signed_tx_json is not None else None
+            blob = _blob(signed_tx_json)
+            flags = ((HAS_SEQUENCE if order.sequence is not None else 0)
+                     | (HAS_LAST_LEDGER_SEQUENCE if order.last_ledger_sequence is not None else 0)
+                     | (HAS_PAYMENT_TX_SIGNATURE if order.payment_tx_signature is not None else 0))
+            # Read once: the book may fill the order while this runs outside its lock
+            price, amount, expiration, order_type = order.price, order.amount, order.expiration, ORDER_TYPES.index(order.order_type)
+            address = string_index(order.xrp_address)
+            records += RECORD.pack(
+                price, amount, expiration, order.sequence or 0, order.last_ledger_sequence or 0,
+                order_type, flags, address, string_index(order.public_key), string_index(order.multisig_destination),
+                offset,
+            )
+            f.write(blob)
+            offset += len(blob)
+
+            level = (order_type, price)
+            if level in levels:
+                levels[level].append(number)
+                level_volumes[level] += amount
+            else:
+                levels[level] = [number]
+                level_volumes[level] = amount
+            accounts.setdefault(address, []).append((order.sequence, number))
+            expirations.append(expiration)
+
+        strings_offset = offset
+        table = LENGTH.pack(len(strings) - 1) + b"".join(_blob(value.encode()) for value in list(strings)[1:])
+        f.write(table)
+        offset += len(table)
+        # Align the records so they can be viewed in place as a structured array
+        padding = -offset % 8
+        f.write(bytes(padding))
+        records_offset = offset + padding
+        f.write(records)
+
+        by_level = array("I")
+        for (order_type, price), members in sorted(levels.items()):
+            f.write(LEVEL.pack(price, level_volumes[order_type, price], len(members), order_type))
+            by_level.extend(members)
+        by_account = array("I")
+        for address, members in accounts.items():
+            # Stable, so equal sequences keep arrival order as AccountOrders does
+            members.sort(key=_sequence_key)
+            f.write(ACCOUNT.pack(address, len(members)))
+            by_account.extend(map(itemgetter(1), members))
+        by_expiration = array("I", sorted(range(len(orders)), key=expirations.__getitem__))
+        sorted_expirations = array("q", map(expirations.__getitem__, by_expiration))
+        # In INDEX_ARRAYS order
+        for column in (signature_ends, by_level, by_account, by_expiration, sorted_expirations):
+            if sys.byteorder == "big":
+                column.byteswap()
+            column.tofile(f)
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(metadata_bytes), len(orders), len(levels), len(accounts),
+                            signatures_offset, strings_offset, records_offset, records_offset + len(records)))
+        f.flush()
+        os.fsync(f.fileno())
+    return len(orders)
+
+class BookSnapshot:
+    """A snapshot file written by write_snapshot, mapped into memory.
+
+    Opening reads only the header and the string table. ``records()`` walks
+    the fixed-width records as tuples without creating any Order, and
+    indexing or iterating yields SnapshotOrders built on demand, so a reader
+    after a few orders or a few columns pays only for those.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        (magic, version, metadata_length, self.count, self.level_count, self.account_count,
+         self.signatures_offset, strings_offset, self.records_offset, self.index_offset) = HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} order book snapshot: {path}")
+        self.metadata = json.loads(bytes(self._view[HEADER.size:HEADER.size + metadata_length]))
+        self.accounts_offset = self.index_offset + self.level_count * LEVEL.size
+        self._index_arrays = {}
+        offset = self.accounts_offset + self.account_count * ACCOUNT.size
+        for name, typecode in INDEX_ARRAYS:
+            self._index_arrays[name] = (typecode, offset)
+            offset += self.count * array(typecode).itemsize
+        # Serializes restored orders loading their records
+        self._load_lock = threading.Lock()
+
+        (string_count,) = LENGTH.unpack_from(self._view, strings_offset)
+        offset = strings_offset + LENGTH.size
+        self.strings = [None]
+        for _ in range(string_count):
+            (length,) = LENGTH.unpack_from(self._view, offset)
+            # Interned like Order.__init__ does, so restored orders share them with new ones
+            self.strings.append(sys.intern(str(self._view[offset + LENGTH.size:offset + LENGTH.size + length], "utf-8")))
+            offset += LENGTH.size + length
+
+    def __len__(self):
+        return self.count
+
+    def records(self):
+        """Raw record tuples in RECORD field order; see the module layout notes."""
+        return RECORD.iter_unpack(self._view[self.records_offset:self.records_offset + self.count * RECORD.size])
+
+    def raw_blob_at(self, offset):
+        """The stored signed_tx_json bytes of the order whose blob starts at ``offset``."""
+        (length,) = LENGTH.unpack_from(self._view, offset)
+        if length == NONE_LENGTH:
+            return None
+        return bytes(self._view[offset + LENGTH.size:offset + LENGTH.size + length])
+
+    def signed_tx_json_at(self, offset):
+        raw = self.raw_blob_at(offset)
+        return json.loads(raw) if raw is not None else None
+
+    def _signature(self, index, flags):
+        if not flags & HAS_PAYMENT_TX_SIGNATURE:
+            return None
+        _, ends_offset = self._index_arrays["signature_ends"]
+        start = SIGNATURE_END.unpack_from(self._view, ends_offset + (index - 1) * SIGNATURE_END.size)[0] + 1 if index else 0
+        (end,) = SIGNATURE_END.unpack_from(self._view, ends_offset + index * SIGNATURE_END.size)
+        return str(self._view[self.signatures_offset + start:self.signatures_offset + end], "utf-8")
+
+    def _fill(self, order, record):
+        price, amount, expiration, sequence, last_ledger_sequence, order_type, flags, address, public_key, multisig_destination, offset = record
+        strings = self.strings
+        order.price = price
+        order.amount = amount
+        order.order_type = ORDER_TYPES[order_type]
+        order.xrp_address = strings[address]
+        order.public_key = strings[public_key]
+        order.expiration = expiration
+        order.sequence = sequence if flags & HAS_SEQUENCE else None
+        order.multisig_destination = strings[multisig_destination]
+        order.last_ledger_sequence = last_ledger_sequence if flags & HAS_LAST_LEDGER_SEQUENCE else None
+        # Set last: a restored order is loaded once this is
+        order._blob_offset = offset
+
+    def _order(self, index, record):
+        # Bypass Order.__init__: the fields were validated and normalized when first added
+        order = SnapshotOrder.__new__(SnapshotOrder)
+        order.payment_tx_signature = self._signature(index, record[6])
+        order.matched_amount = None
+        order._snapshot = self
+        order._index = index
+        self._fill(order, record)
+        return order
+
+    def load(self, order):
+        """Load a restored order's fields from its record; does nothing once loaded."""
+        with self._load_lock:
+            try:
+                _blob_offset_slot.__get__(order)
+                return
+            except AttributeError:
+                pass
+            self._fill(order, RECORD.unpack_from(self._view, self.records_offset + order._index * RECORD.size))
+            try:
+                _matched_amount_slot.__get__(order)
+            except AttributeError:
+                order.matched_amount = None
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("snapshot index out of range")
+        return self._order(index, RECORD.unpack_from(self._view, self.records_offset + index * RECORD.size))
+
+    def __iter__(self):
+        return map(self._order, count(), self.records())
+
+    def index_array(self, name):
+        """One of the INDEX_ARRAYS, as an array."""
+        typecode, offset = self._index_arrays[name]
+        values = array(typecode)
+        values.frombytes(self._view[offset:offset + self.count * values.itemsize])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def signatures(self):
+        """Every order's payment_tx_signature, in record order, without reading the records."""
+        ends = self.index_array("signature_ends")
+        region = self._view[self.signatures_offset:self.signatures_offset + (ends[-1] + 1 if ends else 0)]
+        signatures = str(region, "utf-8").split("\n")
+        # Nothing follows the last newline
+        signatures.pop()
+        if len(signatures) != self.count:
+            # A signature contains a newline itself, so cut the region at the stored offsets
+            starts = chain((0,), (end + 1 for end in ends[:-1]))
+            signatures = [str(region[start:end], "utf-8") for start, end in zip(starts, ends)]
+        if "" in signatures:
+            # An empty span is either an empty signature or none at all
+            for index, signature in enumerate(signatures):
+                if signature == "" and not RECORD.unpack_from(self._view, self.records_offset + index * RECORD.size)[6] & HAS_PAYMENT_TX_SIGNATURE:
+                    signatures[index] = None
+        return signatures
+
+    def restore_into(self, order_book):
+        """Load every order into an empty book.
+
+        The book's price levels, account index and expiration heap come
+        straight from the index stored with the records, and the orders are
+        created unloaded (see SnapshotOrder), so the per-order work is little
+        more than reading each signature.
+        """
+        signatures = self.signatures()
+        new = SnapshotOrder.__new__
+        orders = []
+        append = orders.append
+        for index, signature in enumerate(signatures):
+            order = new(SnapshotOrder)
+            order.payment_tx_signature = signature
+            order._snapshot = self
+            order._index = index
+            append(order)
+
+        by_level = self.index_array("by_level")
+        levels = []
+        start = 0
+        for level in range(self.level_count):
+            price, total_volume, order_count, order_type = LEVEL.unpack_from(self._view, self.index_offset + level * LEVEL.size)
+            levels.append((ORDER_TYPES[order_type], price, total_volume, list(map(orders.__getitem__, by_level[start:start + order_count]))))
+            start += order_count
+
+        by_account = self.index_array("by_account")
+        accounts = []
+        start = 0
+        for account in range(self.account_count):
+            address, order_count = ACCOUNT.unpack_from(self._view, self.accounts_offset + account * ACCOUNT.size)
+            accounts.append((self.strings[address], list(map(orders.__getitem__, by_account[start:start + order_count]))))
+            start += order_count
+
+        by_expiration = map(orders.__getitem__, self.index_array("by_expiration"))
+        order_book.restore_indexed(orders, levels, accounts, self.index_array("expirations"), by_expiration)
@@ -0,0 +1,116 @@
+# Matching engine settings.
+# backend: "python" for the reference MatchingEngine, "numpy" for the vectorized
+# backend in vectorized_matching_engine.py (requires the optional numpy extra).
+MATCHING_CONFIG = {
+    "backend": "python",
+    "batch_interval": 15,  # seconds
+}
+
+# Market settings.
+# tick_size: smallest price increment; prices are stored as integer ticks.
+# lot_size: smallest tradable amount in drops; fills are whole lots.
+MARKET_CONFIG = {
+    "tick_size": "0.01",
+    "lot_size": 1,
+}
+
+# Settlement settings.
+# concurrency: matched orders settled in parallel per batch (1 settles serially).
+# payout_attempts: tries per payout when a failure leaves its multisig sequence unused.
+SETTLEMENT_CONFIG = {
+    "concurrency": 8,
+    "payout_attempts": 3,
+}
+
+# Ledger tracker settings.
+# poll_interval: seconds between background ledger index refreshes.
+# max_staleness: oldest cached ledger index (in seconds) a reader will accept.
+LEDGER_TRACKER_CONFIG = {
+    "poll_interval": 1.0,
+    "max_staleness": 4.0,
+}
+
+# Account sequence cache settings.
+# ttl: seconds a cached account sequence is served; every validated ledger also clears the cache.
+ACCOUNT_CACHE_CONFIG = {
+    "ttl": 10.0,
+}
+
+# XRPL connection settings.
+# endpoints: JSON-RPC URLs, tried in order with failover on transport errors.
+# timeout: default per-request timeout in seconds.
+# max_connections / max_keepalive_connections: size of the shared keep-alive pool.
+XRPL_CONFIG = {
+    "endpoints": ["https://s.altnet.rippletest.net:51234"],
+    "timeout": 10.0,
+    "max_connections": 50,
+    "max_keepalive_connections": 20,
+}
+
+# Signature verification settings.
+# workers: verification processes (None uses every core).
+# chunk_size: signatures sent to a worker per task in batch verification.
+VERIFIER_CONFIG = {
+    "workers": None,
+    "chunk_size": 64,
+}
+
+# Replay protection settings.
+# window_ledgers: validated ledgers an accepted order's signature and tx hash are remembered for.
+# capacity: keys per generation before the replay filter rotates early.
+# verification_cache_size: signature verification results kept in the LRU.
+REPLAY_CONFIG = {
+    "window_ledgers": 256,
+    "capacity": 1_000_000,
+    "verification_cache_size": 100_000,
+}
+
+# Order-entry server settings.
+# mode: "flask" for the threaded Flask server, "asgi" for the asyncio server in
+# asgi_api.py (needs the asgi extra: starlette and uvicorn).
+# max_bulk_orders: most orders accepted in one /place_orders request.
+SERVER_CONFIG = {
+    "mode": "flask",
+    "host": "127.0.0.1",
+    "port": 5000,
+    "max_bulk_orders": 500,
+}
+
+# Market data feed settings.
+# flush_interval: seconds between L2 delta messages; changes in between are coalesced.
+# replay_buffer: recent messages kept so reconnecting subscribers can catch up without a snapshot.
+# max_pending: messages a slow subscriber may queue before it is resynced from a snapshot.
+MARKET_DATA_CONFIG = {
+    "flush_interval": 0.1,
+    "replay_buffer": 1000,
+    "max_pending": 1000,
+}
+
+# Order cleaner settings.
+# interval: seconds between revalidation passes over every account with resting orders.
+# concurrency: most account_info requests in flight during a pass.
+# stream_url: XRPL WebSocket endpoint for account transaction streams (None polls only).
+# stream_sync_interval: seconds between updates of the streamed account set.
+ORDER_CLEANER_CONFIG = {
+    "interval": 60,
+    "concurrency": 16,
+    "stream_url": "wss://s.altnet.rippletest.net:51233",
+    "stream_sync_interval": 1.0,
+}
+
+# Order journal settings.
+# directory: where journal segments and book snapshots are kept.
+# fsync_interval: seconds between group fsyncs; a crash loses at most this much acknowledged order flow.
+# snapshot_interval: seconds between snapshots, which bound how much journal recovery replays.
+JOURNAL_CONFIG = {
+    "directory": "journal",
+    "fsync_interval": 0.05,
+    "snapshot_interval": 300,
+}
+
+# Order-flow recording settings.
+# path: file admitted orders and auctions are appended to for offline replay
+# (python -m benchmarks.bench_replay); None disables recording.
+RECORDING_CONFIG = {
+    "path": None,
+}
@@ -1,9 +1,9 @@
 import json
 from xrpl.wallet import generate_faucet_wallet
-from xrpl.clients import JsonRpcClient
+from xrpl_client import get_shared_pool
 
 def create_and_fund_wallet():
-    client = JsonRpcClient("https://s.altnet.rippletest.net:51234")
+    client = get_shared_pool().sync_client
     wallet = generate_faucet_wallet(client)
     
     wallet_info = {
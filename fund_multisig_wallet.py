@@ -1,5 +1,5 @@
 import json
-from xrpl.clients import JsonRpcClient
+from xrpl_client import get_shared_pool
 from xrpl.wallet import generate_faucet_wallet, Wallet
 from xrpl.models import Payment
 from xrpl.transaction import submit_and_wait, sign
@@ -7,7 +7,7 @@ from xrpl.utils import xrp_to_drops
 
 def fund_existing_wallet(existing_address: str, amount_xrp: int = 1000):
     # Initialize the client
-    client = JsonRpcClient("https://s.altnet.rippletest.net:51234")
+    client = get_shared_pool().sync_client
 
     # Generate a funding wallet using the Testnet faucet
     funding_wallet = generate_faucet_wallet(client, debug=True)
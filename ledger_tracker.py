@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class LedgerTracker:
+    """Keeps the current and validated ledger index in memory.
+
+    One background poller refreshes both indexes every ``poll_interval`` seconds,
+    so hot paths read them with no network round trip. Reads are bounded in
+    staleness: if the cached values are older than ``max_staleness`` seconds
+    (the poller is stuck or was never started) the reader refreshes them itself.
+    Listeners registered with add_listener are called with the new validated
+    index whenever it advances.
+    """
+
+    def __init__(self, fetch_indexes, poll_interval=1.0, max_staleness=4.0):
+        self.fetch_indexes = fetch_indexes
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.updated_at = None
+        self._current_ledger_index = None
+        self._validated_ledger_index = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.refresh()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing ledger indexes: {e}")
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def refresh(self):
+        current_ledger_index, validated_ledger_index = self.fetch_indexes()
+        self.update(current_ledger_index, validated_ledger_index)
+
+    def update(self, current_ledger_index, validated_ledger_index):
+        with self._lock:
+            previous_validated = self._validated_ledger_index
+            # Never move backwards if an older response arrives late
+            if self._current_ledger_index is None or current_ledger_index > self._current_ledger_index:
+                self._current_ledger_index = current_ledger_index
+            if previous_validated is None or validated_ledger_index > previous_validated:
+                self._validated_ledger_index = validated_ledger_index
+            self.updated_at = time.monotonic()
+            advanced = self._validated_ledger_index != previous_validated
+
+        if advanced:
+            for listener in self._listeners:
+                listener(self._validated_ledger_index)
+
+    def get_current_ledger_index(self):
+        self._ensure_fresh()
+        return self._current_ledger_index
+
+    def get_validated_ledger_index(self):
+        self._ensure_fresh()
+        return self._validated_ledger_index
+
+    def staleness(self):
+        return None if self.updated_at is None else time.monotonic() - self.updated_at
+
+    def _ensure_fresh(self):
+        staleness = self.staleness()
+        if staleness is None or staleness > self.max_staleness:
+            self.refresh()
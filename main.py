@@ -1,17 +1,30 @@
 import os
 import logging
 from order_book import OrderBook
-from matching_engine import MatchingEngine
+from matching_engine import create_matching_engine
 from api import API
+from auction_scheduler import AuctionScheduler
+from market_data import MarketDataFeed
+from order_cleaner import OrderCleaner
+from order_journal import OrderJournal
+from order_flow import OrderFlowRecorder
 from xrpl_integration import XRPLIntegration
 from multisig import MultisigWallet
+from config import MATCHING_CONFIG, LEDGER_TRACKER_CONFIG, ACCOUNT_CACHE_CONFIG, VERIFIER_CONFIG, SERVER_CONFIG, MARKET_DATA_CONFIG, ORDER_CLEANER_CONFIG, JOURNAL_CONFIG, RECORDING_CONFIG
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def main():
     order_book = OrderBook()
+    # Restore resting orders from the last run before accepting new ones
+    journal = OrderJournal(order_book, **JOURNAL_CONFIG)
+    last_auction = journal.recover()
+    journal.start()
     xrpl_integration = XRPLIntegration()
+    xrpl_integration.start_ledger_tracker(**LEDGER_TRACKER_CONFIG)
+    xrpl_integration.enable_account_cache(**ACCOUNT_CACHE_CONFIG)
+    xrpl_integration.start_signature_verifier(**VERIFIER_CONFIG)
     multisig_wallet = MultisigWallet()
     
     if os.path.exists("encrypted_wallet.key"):
@@ -35,11 +48,40 @@ def main():
     with open("multisig_address.txt", "w") as f:
         f.write(multisig_address)
     
-    matching_engine = MatchingEngine(order_book, xrpl_integration, multisig_wallet)
-    api = API(order_book, matching_engine, xrpl_integration)
+    matching_engine = create_matching_engine(
+        order_book, xrpl_integration, multisig_wallet,
+        backend=MATCHING_CONFIG["backend"],
+        batch_interval=MATCHING_CONFIG["batch_interval"]
+    )
+    matching_engine.add_auction_listener(journal.record_auction)
+    if last_auction is not None:
+        matching_engine.last_clearing_price = last_auction.clearing_price
+    market_data = MarketDataFeed(order_book, **MARKET_DATA_CONFIG)
+    matching_engine.add_auction_listener(market_data.publish_auction)
+    market_data.start()
+
+    if SERVER_CONFIG["mode"] == "asgi":
+        from asgi_api import AsyncAPI
+        api = AsyncAPI(order_book, matching_engine, xrpl_integration, market_data)
+    else:
+        api = API(order_book, matching_engine, xrpl_integration, market_data)
+    xrpl_integration.ledger_tracker.add_listener(api.replay_filter.on_ledger_closed)
+    if RECORDING_CONFIG["path"] is not None:
+        recorder = OrderFlowRecorder(RECORDING_CONFIG["path"])
+        order_book.recorder = recorder
+        matching_engine.add_auction_listener(recorder.record_auction)
+        matching_engine.add_settlement_listener(recorder.record_settlement)
     
+    # Auctions fire on their own thread, on a wall-clock grid
+    auction_scheduler = AuctionScheduler(matching_engine.run_auction, MATCHING_CONFIG["batch_interval"])
+    auction_scheduler.start()
+
+    # Pull orders whose account sequence has moved past them on the ledger
+    order_cleaner = OrderCleaner(order_book, xrpl_integration, **ORDER_CLEANER_CONFIG)
+    order_cleaner.start()
+
     # Run the API in the main thread
-    api.run()
+    api.run(SERVER_CONFIG["host"], SERVER_CONFIG["port"])
 
 if __name__ == "__main__":
     main()
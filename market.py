@@ -0,0 +1,41 @@
+from decimal import Decimal, InvalidOperation
+from config import MARKET_CONFIG
+
+class Market:
+    """Price grid and lot size for the order book.
+
+    Prices are carried as integer ticks everywhere inside OrderBook and the
+    matching engines; amounts are integer drops in multiples of lot_size.
+    Conversion to and from decimal prices happens only at the API and
+    settlement boundaries.
+    """
+
+    def __init__(self, tick_size=MARKET_CONFIG["tick_size"], lot_size=MARKET_CONFIG["lot_size"]):
+        self.tick_size = Decimal(str(tick_size))
+        self.lot_size = int(lot_size)
+        if self.tick_size <= 0 or self.lot_size <= 0:
+            raise ValueError("Tick size and lot size must be positive")
+
+    def price_to_ticks(self, price):
+        try:
+            ticks = Decimal(str(price)) / self.tick_size
+        except InvalidOperation:
+            raise ValueError(f"Invalid price: {price!r}")
+        if not ticks.is_finite():
+            raise ValueError(f"Price {price} is not finite")
+        if ticks != ticks.to_integral_value():
+            raise ValueError(f"Price {price} is not a multiple of the tick size {self.tick_size}")
+        return int(ticks)
+
+    def ticks_to_price(self, ticks):
+        return float(ticks * self.tick_size)
+
+    def validate_amount(self, amount):
+        amount = int(amount)
+        if amount <= 0 or amount % self.lot_size != 0:
+            raise ValueError(f"Amount {amount} is not a positive multiple of the lot size {self.lot_size}")
+        return amount
+
+    def quote_amount(self, amount, ticks):
+        """Value of ``amount`` drops at ``ticks``, rounded down to whole drops."""
+        return int(amount * ticks * self.tick_size)
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from order_book import OrderType
+
+logger = logging.getLogger(__name__)
+
+class Message(namedtuple("Message", ["sequence", "text", "sse"])):
+    """One feed message, serialized once as JSON and once as a server-sent event."""
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, sequence, body):
+        text = json.dumps(dict(body, sequence=sequence), separators=(",", ":"))
+        return cls(sequence, text, f"id: {sequence}\ndata: {text}\n\n".encode())
+
+class Subscription:
+    """A subscriber's queue of pending messages.
+
+    Consumers read with get() from a thread or ``await get_async()`` from the
+    event loop the subscription was created on. A subscriber that falls more
+    than ``max_pending`` messages behind is marked ``lagged`` and its backlog
+    dropped; it should then ask the feed to resync.
+    """
+
+    def __init__(self, max_pending, loop=None):
+        self.max_pending = max_pending
+        self.lagged = False
+        self._messages = deque()
+        self._condition = threading.Condition()
+        self._loop = loop
+        self._ready = asyncio.Event() if loop is not None else None
+
+    def deliver(self, message):
+        with self._condition:
+            if len(self._messages) >= self.max_pending:
+                self.lagged = True
+                self._messages.clear()
+            elif not self.lagged:
+                self._messages.append(message)
+            self._condition.notify()
+        self._wake()
+
+    def mark_lagged(self):
+        """Stop delivery until the consumer resyncs, e.g. when the client reports a gap."""
+        with self._condition:
+            self.lagged = True
+            self._messages.clear()
+            self._condition.notify()
+        self._wake()
+
+    def _wake(self):
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                pass  # The consumer's loop has shut down
+
+    def _reset(self):
+        with self._condition:
+            self.lagged = False
+            self._messages.clear()
+
+    def get(self, timeout=None):
+        """Next message, or None if the subscription lagged or ``timeout`` passed."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._messages or self.lagged, timeout)
+            return self._messages.popleft() if self._messages else None
+
+    async def get_async(self, timeout=None):
+        async def wait():
+            while True:
+                with self._condition:
+                    if self._messages or self.lagged:
+                        return self._messages.popleft() if self._messages else None
+                    self._ready.clear()
+                await self._ready.wait()
+        try:
+            return await asyncio.wait_for(wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class MarketDataFeed:
+    """Pushes L2 market data to subscribers as a snapshot followed by deltas.
+
+    Every ``flush_interval`` seconds a background thread drains the levels the
+    book has touched and publishes their new volumes as one ``l2_delta``
+    message; every auction publishes an ``auction`` message right after its own
+    deltas. Messages carry consecutive sequence numbers across both types, so a
+    subscriber that sees a gap knows it missed something. Each message is
+    serialized once and the same bytes go to every subscriber. The last
+    ``replay_buffer`` messages are kept so a reconnecting subscriber can catch
+    up without a fresh snapshot.
+
+    Lock order is the book lock, then the feed lock.
+    """
+
+    def __init__(self, order_book, flush_interval=0.1, replay_buffer=1000, max_pending=1000):
+        self.order_book = order_book
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.sequence = 0
+        self._history = deque(maxlen=replay_buffer)
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error publishing market data: {e}", exc_info=True)
+
+    def flush(self):
+        """Publish one delta covering every level changed since the last flush."""
+        with self.order_book.lock:
+            self.order_book.clean_expired_orders()
+            changes = self.order_book.drain_changed_levels()
+            if changes:
+                to_price = self.order_book.market.ticks_to_price
+                changes.sort(key=lambda change: (change[0], change[1]))
+                self._publish({
+                    "type": "l2_delta",
+                    "changes": [["bids" if order_type is OrderType.BUY else "asks", to_price(price), volume]
+                                for order_type, price, volume in changes],
+                })
+
+    def publish_auction(self, result):
+        """MatchingEngine auction listener: flush the auction's book changes, then report it."""
+        with self.order_book.lock:
+            self.flush()
+            clearing_price = result.clearing_price
+            self._publish({
+                "type": "auction",
+                "timestamp": result.timestamp,
+                "clearing_price": self.order_book.market.ticks_to_price(clearing_price) if clearing_price is not None else None,
+                "volume": result.volume,
+                "fills": result.fill_count,
+            })
+
+    def _publish(self, body):
+        with self._lock:
+            self.sequence += 1
+            message = Message.build(self.sequence, body)
+            self._history.append(message)
+            for subscription in self._subscriptions:
+                subscription.deliver(message)
+
+    def _snapshot(self):
+        # Caller holds both locks, so no delta can slip between snapshot and subscription
+        book = self.order_book.get_l2_order_book()
+        return Message.build(self.sequence, {"type": "snapshot", "bids": book["bids"], "asks": book["asks"]})
+
+    def subscribe(self, last_sequence=None, loop=None):
+        """Register a subscriber, returning it with the messages to send first.
+
+        With ``last_sequence`` (a reconnecting client's last seen message) the
+        missed messages are replayed from the buffer when it still holds them;
+        otherwise the first message is a snapshot.
+        """
+        with self.order_book.lock:
+            self.flush()
+            with self._lock:
+                subscription = Subscription(self.max_pending, loop)
+                self._subscriptions.add(subscription)
+                initial = self._replay_since(last_sequence)
+                if initial is None:
+                    initial = [self._snapshot()]
+        return subscription, initial
+
+    def _replay_since(self, last_sequence):
+        if last_sequence is None or last_sequence > self.sequence:
+            return None
+        if last_sequence == self.sequence:
+            return []
+        if not self._history or self._history[0].sequence > last_sequence + 1:
+            return None
+        return [message for message in self._history if message.sequence > last_sequence]
+
+    def history_since(self, sequence):
+        """Buffered messages numbered ``sequence`` and later."""
+        with self._lock:
+            return [message for message in self._history if message.sequence >= sequence]
+
+    def resync(self, subscription):
+        """Drop a subscriber's backlog and return a fresh snapshot to restart it from."""
+        with self.order_book.lock:
+            self.flush()
+            with self._lock:
+                subscription._reset()
+                return self._snapshot()
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+class L2SnapshotCache:
+    """Serialized /l2_order_book bodies, reused until the book changes.
+
+    Bodies are cached per (depth, bucket) and tagged with the book's version.
+    A request for an unchanged book, with no order due to expire, is a dict
+    lookup and a version compare; anything else rebuilds the body under the
+    book lock.
+    """
+
+    def __init__(self, order_book, max_entries=64):
+        self.order_book = order_book
+        self.max_entries = max_entries
+        self._bodies = {}
+        self._next_expiry = None
+
+    def get(self, depth=None, bucket=None):
+        """Return (version, JSON body bytes) for the current book."""
+        cached = self.cached(depth, bucket)
+        if cached is not None:
+            return cached
+
+        key = (depth, bucket)
+        with self.order_book.lock:
+            self.order_book.clean_expired_orders()
+            self._next_expiry = self.order_book.next_expiry()
+            version = self.order_book.version
+            cached = self._bodies.get(key)
+            if cached is None or cached[0] != version:
+                if len(self._bodies) >= self.max_entries:
+                    self._bodies.clear()
+                body = json.dumps(self.order_book.get_l2_order_book(depth, bucket), separators=(",", ":")).encode()
+                cached = self._bodies[key] = (version, body)
+        return cached
+
+    def cached(self, depth=None, bucket=None):
+        """The cached (version, body) if it is still current, else None; never takes the book lock."""
+        cached = self._bodies.get((depth, bucket))
+        if cached is not None and cached[0] == self.order_book.version and not self._expiry_due():
+            return cached
+        return None
+
+    def _expiry_due(self):
+        # Adding an order bumps the version, so a cached next expiry can only be late, never early
+        return self._next_expiry is not None and time.time() >= self._next_expiry
+
+class L2BookMirror:
+    """Client-side copy of the book rebuilt from feed messages.
+
+    apply() returns False when a message does not follow the last one applied;
+    the client should then resync (send {"type": "resync"} over WebSocket, or
+    reconnect an event stream with Last-Event-ID) and apply the snapshot it gets.
+    """
+
+    def __init__(self):
+        self.sequence = None
+        self.bids = {}
+        self.asks = {}
+        self.auctions = []
+
+    def apply(self, message):
+        if isinstance(message, str):
+            message = json.loads(message)
+        if message["type"] == "snapshot":
+            self.bids = {price: volume for price, volume in message["bids"]}
+            self.asks = {price: volume for price, volume in message["asks"]}
+            self.sequence = message["sequence"]
+            return True
+        if self.sequence is None or message["sequence"] != self.sequence + 1:
+            return False
+
+        self.sequence = message["sequence"]
+        if message["type"] == "l2_delta":
+            for side, price, volume in message["changes"]:
+                levels = self.bids if side == "bids" else self.asks
+                if volume:
+                    levels[price] = volume
+                else:
+                    levels.pop(price, None)
+        elif message["type"] == "auction":
+            self.auctions.append(message)
+        return True
+
+    def l2(self):
+        return {
+            "bids": sorted(self.bids.items(), reverse=True),
+            "asks": sorted(self.asks.items()),
+        }
@@ -1,10 +1,55 @@
 import time
 import logging
-from collections import defaultdict
+import threading
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from heapq import merge
+from itertools import accumulate, groupby
 from settlement import Settlement
 
 logger = logging.getLogger(__name__)
 
+class AuctionCurves(namedtuple("AuctionCurves", ["prices", "cumulative_demand", "cumulative_supply"])):
+    """Sorted candidate prices with cumulative demand and supply at each one."""
+    __slots__ = ()
+
+    def volumes_at(self, price):
+        index = bisect_left(self.prices, price)
+        if index == len(self.prices) or self.prices[index] != price:
+            return 0, 0
+        return self.cumulative_demand[index], self.cumulative_supply[index]
+
+class AuctionResult(namedtuple("AuctionResult", ["timestamp", "clearing_price", "volume", "fill_count", "ledger"], defaults=(None,))):
+    """Outcome of one batch auction; clearing_price is in ticks, or None if nothing crossed.
+
+    ``timestamp`` and ``ledger`` are the book clock and current ledger index the
+    auction started with, which its expiry and LastLedgerSequence filters used.
+    """
+    __slots__ = ()
+
+def allocate_pro_rata(amounts, volume, lot_size=1):
+    """Split ``volume`` drops across ``amounts`` pro rata, in whole lots.
+
+    Each order first gets its quota rounded down to a lot; leftover lots go one
+    at a time to the largest remainders, ties to the earlier order. All
+    arithmetic is on integers so repeated auctions never leave float dust.
+    """
+    total = sum(amounts)
+    if total <= volume:
+        return list(amounts)
+
+    fills = []
+    remainders = []
+    for amount in amounts:
+        lots = amount * volume // (total * lot_size)
+        fills.append(lots * lot_size)
+        remainders.append(amount * volume - lots * lot_size * total)
+
+    leftover_lots = (volume - sum(fills)) // lot_size
+    for index in sorted(range(len(amounts)), key=lambda i: -remainders[i])[:leftover_lots]:
+        fills[index] += lot_size
+    return fills
+
 class MatchingEngine:
     def __init__(self, order_book, xrpl_integration, multisig_wallet, batch_interval=15):  # 15 seconds batch interval
         self.order_book = order_book
@@ -12,42 +57,107 @@ class MatchingEngine:
         self.batch_interval = batch_interval
         self.last_batch_time = int(time.time())
         self.last_clearing_price = None
-        self.settlement = Settlement(xrpl_integration, multisig_wallet)
+        self.market = order_book.market
+        self.settlement = Settlement(xrpl_integration, multisig_wallet, self.market)
+        self.auction_listeners = []
+        self.settlement_listeners = []
+        # Serializes auctions, which only hold the book lock between settlement's round trips
+        self._auction_lock = threading.Lock()
+
+    def add_auction_listener(self, callback):
+        """Call ``callback(AuctionResult)`` once an auction's fills are applied.
+
+        Listeners run with the book lock held, before the fills are settled.
+        """
+        self.auction_listeners.append(callback)
+
+    def add_settlement_listener(self, callback):
+        """Call ``callback(settled)`` once an auction's settlement outcome is applied to the book.
+
+        Listeners run with the book lock held. Auctions that cleared nothing are
+        never settled and have no outcome.
+        """
+        self.settlement_listeners.append(callback)
 
     def run_batch_auction(self):
         current_time = int(time.time())
         if current_time - self.last_batch_time >= self.batch_interval:
-            logger.info(f"Running batch auction at {current_time}")
-            self.match_orders()
-            self.last_batch_time = current_time
-
-    def match_orders(self):
-        logger.info("Starting order matching process")
-        # Clean expired orders before matching
-        self.clean_order_book()
+            self.run_auction()
 
-        # Aggregate demand and supply
-        demand = self.order_book.bids
-        supply = self.order_book.asks
+    def run_auction(self):
+        """Run one auction now; AuctionScheduler calls this on its grid."""
+        self.last_batch_time = int(time.time())
+        logger.info(f"Running batch auction at {self.last_batch_time}")
+        self.match_orders()
 
-        # Find clearing price and max volume
-        clearing_price, max_volume = self.find_clearing_price(demand, supply)
+    def match_orders(self):
+        """Run one auction: clear and fill under the book lock, then settle without it.
+
+        Settlement waits on the ledger for seconds, so the book lock is released
+        while it runs and re-acquired to apply its outcome. Order entry and market
+        data only ever wait on the in-memory work.
+        """
+        with self._auction_lock:
+            logger.info("Starting order matching process")
+            # Settlement can take several ledgers; everything is filtered against the state at the start
+            started = self.order_book.clock()
+            current_ledger = self.xrpl_integration.get_current_ledger_sequence()
+
+            with self.order_book.lock:
+                # Clean expired orders before matching
+                self.clean_order_book()
+
+                # Aggregate demand and supply
+                demand = self.order_book.bids
+                supply = self.order_book.asks
+
+                # Build the aggregate curves once and find clearing price and max volume
+                curves = self.build_curves(demand, supply)
+                clearing_price, max_volume = self.find_clearing_price(demand, supply, curves)
+
+                fills = []
+                if clearing_price is not None:
+                    logger.info(f"Clearing price found: {clearing_price}, Max volume: {max_volume}")
+                    # Execute trades using pro-rata matching
+                    fills = self.execute_trades(clearing_price, max_volume, demand, supply, curves, current_ledger)
+                else:
+                    logger.info("No matching orders found in this batch")
+
+                result = AuctionResult(started, clearing_price, max_volume, len(fills), current_ledger)
+                for listener in self.auction_listeners:
+                    listener(result)
+
+            if clearing_price is not None:
+                self.settle(fills)
+            return result
+
+    def build_curves(self, demand, supply):
+        """Aggregate the demand and supply curves for one auction.
+
+        Level volumes come from the book's running totals and the two sorted
+        price indexes are merged, then a single sweep turns them into prefix
+        sums: cumulative demand is everything bid at or above a price,
+        cumulative supply everything offered at or below it.
+        """
+        demand_levels = {price: level.total_volume for price, level in demand.items()}
+        supply_levels = {price: level.total_volume for price, level in supply.items()}
+        # Both sides are already sorted, so a linear merge replaces a full sort
+        prices = [price for price, _ in groupby(merge(demand.ascending_prices(), supply.ascending_prices()))]
+
+        cumulative_supply = list(accumulate(supply_levels.get(price, 0) for price in prices))
+        cumulative_demand = list(accumulate(demand_levels.get(price, 0) for price in reversed(prices)))
+        cumulative_demand.reverse()
+
+        return AuctionCurves(prices, cumulative_demand, cumulative_supply)
+
+    def find_clearing_price(self, demand, supply, curves=None):
+        if curves is None:
+            curves = self.build_curves(demand, supply)
 
-        if clearing_price is not None:
-            logger.info(f"Clearing price found: {clearing_price}, Max volume: {max_volume}")
-            # Execute trades using pro-rata matching
-            self.execute_trades(clearing_price, max_volume, demand, supply)
-        else:
-            logger.info("No matching orders found in this batch")
-
-    def find_clearing_price(self, demand, supply):
-        all_prices = sorted(set(demand.keys()) | set(supply.keys()))
         max_volume = 0
         clearing_price = None
 
-        for price in all_prices:
-            cumulative_demand = sum(sum(order.amount for order in demand[p]) for p in demand if p >= price)
-            cumulative_supply = sum(sum(order.amount for order in supply[p]) for p in supply if p <= price)
+        for price, cumulative_demand, cumulative_supply in zip(curves.prices, curves.cumulative_demand, curves.cumulative_supply):
             volume = min(cumulative_demand, cumulative_supply)
 
             if volume > max_volume:
@@ -64,21 +174,23 @@ class MatchingEngine:
 
         return clearing_price, max_volume
 
-    def execute_trades(self, clearing_price, max_volume, demand, supply):
+    def execute_trades(self, clearing_price, max_volume, demand, supply, curves=None, current_ledger=None):
         print(f"Batch auction executed: {max_volume} @ {clearing_price}")
 
-        total_demand = sum(sum(order.amount for order in demand[p]) for p in demand if p >= clearing_price)
-        total_supply = sum(sum(order.amount for order in supply[p]) for p in supply if p <= clearing_price)
+        if curves is None:
+            curves = self.build_curves(demand, supply)
+        total_demand, total_supply = curves.volumes_at(clearing_price)
 
         matched_orders = []
 
-        # Pro-rata matching for bids
-        matched_orders.extend(self.pro_rata_match(demand, clearing_price, max_volume, total_demand, lambda p: p >= clearing_price))
+        # Pro-rata matching for bids at or above the clearing price
+        matched_orders.extend(self.pro_rata_match(demand.columns(clearing_price), max_volume, total_demand))
 
-        # Pro-rata matching for asks
-        matched_orders.extend(self.pro_rata_match(supply, clearing_price, max_volume, total_supply, lambda p: p <= clearing_price))
+        # Pro-rata matching for asks at or below it
+        matched_orders.extend(self.pro_rata_match(supply.columns(clearing_price), max_volume, total_supply))
 
-        current_ledger = self.xrpl_integration.get_current_ledger_sequence()
+        if current_ledger is None:
+            current_ledger = self.xrpl_integration.get_current_ledger_sequence()
         valid_orders = [
             (order, filled_amount) for order, filled_amount in matched_orders 
             if order.last_ledger_sequence is None or order.last_ledger_sequence > current_ledger
@@ -87,46 +199,57 @@ class MatchingEngine:
         # Update order amounts after matching
         for order, filled_amount in valid_orders:
             order.matched_amount = filled_amount
-            order.amount -= filled_amount
+            self.order_book.fill_order(order, filled_amount)
+        return valid_orders
+
+    def settle(self, valid_orders):
+        """Settle one auction's fills on the ledger, then apply the outcome to the book.
 
-        # Process settlement
-        if self.settlement.process_matched_orders([order for order, _ in valid_orders]):
-            # Remove fully filled orders and update partially filled orders
-            self.update_order_book(valid_orders)
-        else:
+        Called without the book lock. Orders may be cancelled or cleaned while the
+        payments are in flight; update_order_book only removes orders still live.
+        """
+        settled = self.settlement.process_matched_orders([order for order, _ in valid_orders])
+        if not settled:
             # If settlement failed, we need to invalidate this auction
             print("Settlement failed. Invalidating this auction.")
             # You might want to implement some recovery logic here
 
-        # Clean expired orders and remove 0 volume orders
-        self.clean_order_book()
-
-    def pro_rata_match(self, orders, clearing_price, max_volume, total_eligible_volume, price_condition):
-        eligible_orders = [order for price, order_list in orders.items() if price_condition(price) for order in order_list]
-        matched_orders = []
-        
-        for order in eligible_orders:
-            if total_eligible_volume > 0:
-                fill_ratio = min(1, max_volume / total_eligible_volume)
-                filled_amount = min(order.amount, order.amount * fill_ratio)
-                matched_orders.append((order, filled_amount))
-                max_volume -= filled_amount
-                total_eligible_volume -= order.amount
-        
-        return matched_orders
-
-    def clean_order_book(self):
-        current_time = int(time.time())
-        for price in list(self.order_book.bids.keys()):
-            for order in self.order_book.bids[price]:
-                if order.expiration <= current_time or order.amount == 0:
-                    self.order_book.remove_order(order)
-            if not self.order_book.bids[price]:
-                del self.order_book.bids[price]
-        
-        for price in list(self.order_book.asks.keys()):
-            for order in self.order_book.asks[price]:
-                if order.expiration <= current_time or order.amount == 0:
-                    self.order_book.remove_order(order)
-            if not self.order_book.asks[price]:
-                del self.order_book.asks[price]
+        with self.order_book.lock:
+            # Remove fully filled orders, orders whose sequence is now spent, and update partially filled orders
+            self.update_order_book(valid_orders, settled=settled)
+            # Clean expired orders and remove 0 volume orders
+            self.clean_order_book(valid_orders)
+            for listener in self.settlement_listeners:
+                listener(settled)
+        return settled
+
+    def pro_rata_match(self, columns, max_volume, total_eligible_volume):
+        """Allocate ``max_volume`` across the eligible orders in ``columns`` (an OrderColumns)."""
+        if total_eligible_volume <= 0:
+            return []
+
+        fills = allocate_pro_rata(columns.amount, max_volume, self.market.lot_size)
+        return [(order, filled_amount) for order, filled_amount in zip(columns.orders, fills) if filled_amount > 0]
+
+    def update_order_book(self, valid_orders, settled=False):
+        for order, _ in valid_orders:
+            if order.amount == 0 and self.order_book.is_live(order):
+                self.order_book.remove_order(order)
+            if settled and order.sequence is not None:
+                # The settled payment used this sequence, so the account's lower ones are spent
+                self.order_book.invalidate_below(order.xrp_address, order.sequence)
+
+    def clean_order_book(self, matched_orders=()):
+        # Expired orders come off the book's expiration index; only orders that
+        # were just matched can have been filled down to zero
+        self.order_book.clean_expired_orders()
+        self.update_order_book(matched_orders)
+
+def create_matching_engine(order_book, xrpl_integration, multisig_wallet, backend="python", **kwargs):
+    """Build the matching engine selected by MATCHING_CONFIG["backend"]."""
+    if backend == "python":
+        return MatchingEngine(order_book, xrpl_integration, multisig_wallet, **kwargs)
+    elif backend == "numpy":
+        from vectorized_matching_engine import VectorizedMatchingEngine
+        return VectorizedMatchingEngine(order_book, xrpl_integration, multisig_wallet, **kwargs)
+    raise ValueError(f"Unknown matching engine backend: {backend}")
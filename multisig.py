@@ -1,14 +1,14 @@
 from xrpl.wallet import Wallet
-from xrpl.clients import JsonRpcClient
 from xrpl.models.transactions import Payment
 from xrpl.core import keypairs
 import xrpl.account
 import os
 from cryptography.fernet import Fernet
+from xrpl_client import get_shared_pool
 
 class MultisigWallet:
     def __init__(self):
-        self.client = JsonRpcClient("https://s.altnet.rippletest.net:51234")
+        self.client = get_shared_pool().sync_client
         self.wallet = None
         self.key = self.load_key()
 
@@ -0,0 +1,28 @@
+from collections import namedtuple
+
+class NettedPayout(namedtuple("NettedPayout", ["destination", "amount", "orders"])):
+    """One payout to ``destination`` covering every leg it filled in the batch."""
+    __slots__ = ()
+
+def net_payouts(matched_orders, market):
+    """Group matched orders by xrp_address and net their legs into one payout each.
+
+    Buy legs pay out their matched drops; sell legs pay out their matched amount at
+    the order price. Sell notionals are summed in ticks and rounded down to whole
+    drops once per destination rather than once per order. Destinations keep the
+    order in which they first appear in the batch.
+    """
+    legs = {}
+    for order in matched_orders:
+        totals = legs.setdefault(order.xrp_address, [0, 0, []])  # buy drops, sell notional in ticks, orders
+        if order.order_type == "sell":
+            totals[1] += order.matched_amount * order.price
+        else:
+            totals[0] += order.matched_amount
+        totals[2].append(order)
+
+    # quote_amount(notional, 1) prices an amount already multiplied out in ticks
+    return [
+        NettedPayout(destination, buy_total + market.quote_amount(sell_notional, 1), orders)
+        for destination, (buy_total, sell_notional, orders) in legs.items()
+    ]
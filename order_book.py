@@ -1,65 +1,549 @@
+import sys
 import time
-from collections import defaultdict
+import heapq
+import threading
+from array import array
+from enum import StrEnum
+from functools import cached_property
+from operator import attrgetter
+from bisect import bisect_left, insort
+from itertools import count, islice, takewhile
 import logging
+from market import Market
 
 logger = logging.getLogger(__name__)
 
+class OrderType(StrEnum):
+    BUY = "buy"
+    SELL = "sell"
+
 class Order:
+    """A resting order.
+
+    Orders are slotted: at hundreds of thousands of resting orders a per-instance
+    __dict__ dominates memory and slows attribute access in the auction loops.
+    Account strings are interned since the same addresses recur across orders.
+    """
+    __slots__ = (
+        "price", "amount", "order_type", "xrp_address", "public_key", "expiration", "sequence",
+        "payment_tx_signature", "multisig_destination", "last_ledger_sequence", "signed_tx_json",
+        "matched_amount",
+    )
+
     def __init__(self, price, amount, order_type, xrp_address, public_key, expiration=None, sequence=None, payment_tx_signature=None, multisig_destination=None, last_ledger_sequence=None, signed_tx_json=None):
-        self.price = price
+        self.price = int(price)  # Integer ticks on the market's price grid
         self.amount = int(amount)  # Convert to integer here
-        self.order_type = order_type
-        self.xrp_address = xrp_address
-        self.public_key = public_key
+        self.order_type = OrderType(order_type)
+        self.xrp_address = _intern(xrp_address)
+        self.public_key = _intern(public_key)
         self.expiration = expiration if expiration is not None else int(time.time()) + 300  # Unix time, 5 minutes from now
         self.sequence = sequence
         self.payment_tx_signature = payment_tx_signature
-        self.multisig_destination = multisig_destination
+        self.multisig_destination = _intern(multisig_destination)
         self.last_ledger_sequence = last_ledger_sequence
         self.signed_tx_json = signed_tx_json
+        self.matched_amount = None
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in Order.__slots__}
+
+    def __repr__(self):
+        return (f"Order({self.order_type} {self.amount} @ {self.price}, xrp_address={self.xrp_address}, "
+                f"sequence={self.sequence}, expiration={self.expiration}, "
+                f"payment_tx_signature={self.payment_tx_signature})")
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class OrderColumns:
+    """Structure-of-arrays view over one side of the book.
+
+    Numeric fields are packed into typed arrays, parallel to ``orders``, so scans
+    over the book touch contiguous memory instead of chasing Order objects.
+    ``amount`` is packed up front for pro-rata matching; the other columns on
+    first use. Orders without a last_ledger_sequence are stored as 0.
+    """
+
+    def __init__(self, orders):
+        self.orders = orders if isinstance(orders, list) else list(orders)
+        self.amount = _column(self.orders, "amount")
+
+    @cached_property
+    def price(self):
+        return _column(self.orders, "price")
+
+    @cached_property
+    def expiration(self):
+        return _column(self.orders, "expiration")
+
+    @cached_property
+    def last_ledger_sequence(self):
+        return array("q", [order.last_ledger_sequence or 0 for order in self.orders])
+
+    def __len__(self):
+        return len(self.orders)
+
+def _column(orders, field):
+    return array("q", map(attrgetter(field), orders))
+
+class PriceLevel:
+    """Orders resting at one price, with the level's total volume kept up to date.
+
+    Orders sit in an insertion-ordered dict keyed by payment_tx_signature, so
+    arrival order is preserved for priority rules while unlinking or updating
+    a single order is O(1) and never scans the level.
+    """
+
+    def __init__(self):
+        self.orders = {}
+        self.total_volume = 0
+
+    @property
+    def order_count(self):
+        return len(self.orders)
+
+    def append(self, order):
+        self.orders[order.payment_tx_signature] = order
+        self.total_volume += order.amount
+
+    def remove(self, order):
+        del self.orders[order.payment_tx_signature]
+        self.total_volume -= order.amount
+
+    def reduce(self, order, filled_amount):
+        order.amount -= filled_amount
+        self.total_volume -= filled_amount
+
+    def get(self, payment_tx_signature):
+        return self.orders.get(payment_tx_signature)
+
+    def __iter__(self):
+        return iter(self.orders.values())
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order):
+        return self.orders.get(order.payment_tx_signature) is order
+
+    def __getitem__(self, index):
+        # Positional access walks the queue from the oldest order
+        if index < 0:
+            index += len(self.orders)
+        if not 0 <= index < len(self.orders):
+            raise IndexError("price level index out of range")
+        return next(islice(self.orders.values(), index, None))
+
+class PriceLevels:
+    """One side of the book: price levels kept sorted by price.
+
+    Levels are looked up through a dict, and a parallel ascending list of prices
+    is maintained with bisect, so the best price is O(1) and iterating from the
+    top of the book never needs a sort. Iteration, keys(), values() and items()
+    all run best price first (highest for bids, lowest for asks).
+    """
+
+    def __init__(self, descending=False):
+        self.descending = descending
+        self._levels = {}
+        self._prices = []
+
+    def get_or_create(self, price):
+        level = self._levels.get(price)
+        if level is None:
+            level = self._levels[price] = PriceLevel()
+            insort(self._prices, price)
+        return level
+
+    def get(self, price, default=None):
+        return self._levels.get(price, default)
+
+    def best_price(self):
+        if not self._prices:
+            return None
+        return self._prices[-1] if self.descending else self._prices[0]
+
+    def best_level(self):
+        price = self.best_price()
+        return None if price is None else self._levels[price]
+
+    def ascending_prices(self):
+        return self._prices
+
+    def keys(self):
+        return reversed(self._prices) if self.descending else iter(self._prices)
+
+    def values(self):
+        return (self._levels[price] for price in self.keys())
+
+    def items(self):
+        return ((price, self._levels[price]) for price in self.keys())
+
+    def columns(self, limit_price=None):
+        """OrderColumns over this side, best price first and in arrival order within a level.
+
+        With ``limit_price``, only levels at or better than it are included: at or
+        above it for bids, at or below it for asks.
+        """
+        levels = self.items()
+        if limit_price is not None:
+            levels = takewhile(lambda item: item[0] >= limit_price if self.descending else item[0] <= limit_price, levels)
+        orders = []
+        for _, level in levels:
+            orders.extend(level.orders.values())
+        return OrderColumns(orders)
+
+    def __getitem__(self, price):
+        return self._levels[price]
+
+    def __delitem__(self, price):
+        del self._levels[price]
+        del self._prices[bisect_left(self._prices, price)]
+
+    def __contains__(self, price):
+        return price in self._levels
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return len(self._prices)
+
+class ExpirationIndex:
+    """Min-heap of resting orders keyed on Order.expiration.
+
+    Removals elsewhere in the book are lazy: entries for orders that already left
+    are skipped when they reach the top of the heap, and the heap is rebuilt once
+    stale entries outnumber live ones. Evicting expired orders therefore costs
+    O(k log n) for k expiring orders instead of a scan of the whole book.
+    """
 
-class OrderBook:
     def __init__(self):
-        self.bids = defaultdict(list)
-        self.asks = defaultdict(list)
+        self._heap = []
+        self._counter = count()
+
+    def push(self, order):
+        heapq.heappush(self._heap, (order.expiration, next(self._counter), order))
+
+    def extend(self, orders):
+        self._heap.extend((order.expiration, next(self._counter), order) for order in orders)
+        heapq.heapify(self._heap)
+
+    def restore(self, expirations, orders):
+        """Load an empty index from parallel lists already sorted by expiration, ties in arrival order."""
+        # A sorted list is already a heap
+        self._heap = list(zip(expirations, self._counter, orders))
+
+    def pop_expired(self, current_time, is_live):
+        expired = []
+        while self._heap and self._heap[0][0] <= current_time:
+            _, _, order = heapq.heappop(self._heap)
+            if is_live(order):
+                expired.append(order)
+        return expired
+
+    def next_expiry(self, is_live):
+        while self._heap and not is_live(self._heap[0][2]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def compact(self, is_live, live_count):
+        if len(self._heap) > 2 * live_count + 64:
+            self._heap = [entry for entry in self._heap if is_live(entry[2])]
+            heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+def _sequence_key(order):
+    # Orders without a sequence sort first
+    return order.sequence if order.sequence is not None else -1
+
+class AccountOrders:
+    """One account's live orders, kept sorted by sequence.
+
+    Because sequences are consumed in order on the ledger, every order an
+    account can no longer execute sits at the front of this list, and
+    invalidate_below slices it off in one step.
+    """
+    __slots__ = ("orders",)
+
+    def __init__(self):
+        self.orders = []
+
+    def add(self, order):
+        insort(self.orders, order, key=_sequence_key)
+
+    def extend(self, orders):
+        # Stable, so equal sequences keep arrival order exactly as add() would
+        self.orders.extend(orders)
+        self.orders.sort(key=_sequence_key)
+
+    def remove(self, order):
+        index = bisect_left(self.orders, _sequence_key(order), key=_sequence_key)
+        while self.orders[index] is not order:
+            index += 1
+        del self.orders[index]
+
+    def pop_below(self, sequence):
+        """Remove and return the orders with a sequence lower than ``sequence``."""
+        index = bisect_left(self.orders, sequence, key=_sequence_key)
+        stale = self.orders[:index]
+        del self.orders[:index]
+        return stale
+
+    def __iter__(self):
+        return iter(self.orders)
+
+    def __len__(self):
+        return len(self.orders)
+
+class OrderBook:
+    def __init__(self, market=None):
+        self.market = market if market is not None else Market()
+        # Held by order entry and auctions, which may run on different threads
+        self.lock = threading.RLock()
+        self.bids = PriceLevels(descending=True)
+        self.asks = PriceLevels()
         self.order_map = {}
+        # xrp_address -> AccountOrders
+        self.accounts = {}
+        self.expirations = ExpirationIndex()
+        # Bumped on every mutation, so readers can tell an unchanged book in O(1)
+        self.version = 0
+        # (order_type, price) of levels touched since the last drain_changed_levels
+        self.changed_levels = set()
+        # OrderJournal recording every mutation, if one is attached
+        self.journal = None
+        # OrderFlowRecorder capturing adds and removals for offline replay, if one is attached
+        self.recorder = None
+        # Source of "now" for expiry; order-flow replay substitutes the recorded time
+        self.clock = time.time
+
+    def _side(self, order):
+        if order.order_type is OrderType.BUY:
+            return self.bids
+        elif order.order_type is OrderType.SELL:
+            return self.asks
+        return None
 
     def add_order(self, order):
-        if order.order_type == "buy":
-            self.bids[order.price].append(order)
-        elif order.order_type == "sell":
-            self.asks[order.price].append(order)
+        if order.payment_tx_signature in self.order_map:
+            # A second copy would replace the first in order_map but not in its level
+            raise ValueError(f"Duplicate order: {order.payment_tx_signature}")
+        side = self._side(order)
+        if side is not None:
+            side.get_or_create(order.price).append(order)
+            self.changed_levels.add((order.order_type, order.price))
+            self.version += 1
         self.order_map[order.payment_tx_signature] = order  # Using payment_tx_signature as a unique identifier
-        logger.info(f"Order added to the book: {order.__dict__}")
+        account = self.accounts.get(order.xrp_address)
+        if account is None:
+            account = self.accounts[order.xrp_address] = AccountOrders()
+        account.add(order)
+        self.expirations.push(order)
+        if self.journal is not None:
+            self.journal.record_add(order)
+        if self.recorder is not None:
+            self.recorder.record_add(order)
+        logger.debug("Order added to the book: %r", order)
+
+    def restore(self, orders):
+        """Load orders into an empty book in one pass, in arrival order.
+
+        Equivalent to add_order for each order, but the account index and the
+        expiration heap are sorted once at the end instead of per insert. Used
+        to rebuild the book from a snapshot; nothing is journaled.
+        """
+        if self.order_map:
+            raise ValueError("Orders can only be restored into an empty book")
+        order_map = self.order_map
+        accounts = {}
+        levels = {}
+        for order in orders:
+            signature = order.payment_tx_signature
+            if signature in order_map:
+                raise ValueError(f"Duplicate order: {signature}")
+            order_map[signature] = order
+            key = (order.order_type, order.price)
+            level = levels.get(key)
+            if level is None:
+                side = self._side(order)
+                level = levels[key] = side.get_or_create(order.price) if side is not None else None
+            if level is not None:
+                level.append(order)
+            account = accounts.get(order.xrp_address)
+            if account is None:
+                account = accounts[order.xrp_address] = []
+            account.append(order)
+        self.changed_levels.update(key for key, level in levels.items() if level is not None)
+        for address, account_orders in accounts.items():
+            self.accounts[address] = AccountOrders()
+            self.accounts[address].extend(account_orders)
+        self.expirations.extend(order_map.values())
+        self.version += 1
+
+    def restore_indexed(self, orders, levels, accounts, expirations, by_expiration):
+        """Load an empty book whose indexes were built ahead of time, as a BookSnapshot stores them.
+
+        ``orders`` are in arrival order. ``levels`` holds (order_type, price,
+        total_volume, orders in arrival order) per level, ``accounts`` (address,
+        orders in sequence order) per account, and ``by_expiration`` the orders
+        sorted by expiration with ``expirations`` parallel to it. Only each
+        order's payment_tx_signature is read, so nothing is per-order work but
+        filling order_map and the indexes' lists. Nothing is journaled.
+        """
+        if self.order_map:
+            raise ValueError("Orders can only be restored into an empty book")
+        self.order_map.update(zip(map(attrgetter("payment_tx_signature"), orders), orders))
+        if len(self.order_map) != len(orders):
+            self.order_map.clear()
+            raise ValueError("Duplicate order in restored book")
+        for order_type, price, total_volume, level_orders in levels:
+            level = (self.bids if order_type is OrderType.BUY else self.asks).get_or_create(price)
+            level.orders = dict(zip(map(attrgetter("payment_tx_signature"), level_orders), level_orders))
+            level.total_volume = total_volume
+            self.changed_levels.add((order_type, price))
+        for address, account_orders in accounts:
+            account = self.accounts[address] = AccountOrders()
+            account.orders = account_orders
+        self.expirations.restore(expirations, by_expiration)
+        self.version += 1
 
     def remove_order(self, order):
-        if order.order_type == "buy":
-            self.bids[order.price].remove(order)
-            if not self.bids[order.price]:
-                del self.bids[order.price]
-        elif order.order_type == "sell":
-            self.asks[order.price].remove(order)
-            if not self.asks[order.price]:
-                del self.asks[order.price]
+        account = self.accounts[order.xrp_address]
+        account.remove(order)
+        if not account:
+            del self.accounts[order.xrp_address]
+        self._unlink(order)
+
+    def _unlink(self, order):
+        # Remove from everything but the account index
+        side = self._side(order)
+        if side is not None:
+            side[order.price].remove(order)
+            if not side[order.price]:
+                del side[order.price]
+            self.changed_levels.add((order.order_type, order.price))
+            self.version += 1
         del self.order_map[order.payment_tx_signature]
+        self.expirations.compact(self.is_live, len(self.order_map))
+        if self.journal is not None:
+            self.journal.record_remove(order)
+        if self.recorder is not None:
+            self.recorder.record_remove(order)
+
+    def cancel_order(self, payment_tx_signature):
+        """Remove an order by its payment_tx_signature, returning it (or None if unknown)."""
+        order = self.order_map.get(payment_tx_signature)
+        if order is not None:
+            self.remove_order(order)
+        return order
+
+    def account_orders(self, xrp_address):
+        """The account's live orders in sequence order."""
+        account = self.accounts.get(xrp_address)
+        return list(account) if account is not None else []
+
+    def cancel_account(self, xrp_address):
+        """Remove every order of one account, returning them in sequence order."""
+        account = self.accounts.pop(xrp_address, None)
+        if account is None:
+            return []
+        for order in account:
+            self._unlink(order)
+        return account.orders
+
+    def invalidate_below(self, xrp_address, sequence):
+        """Remove the account's orders whose sequence is below ``sequence``, returning them.
+
+        Once the account's ledger sequence reaches ``sequence`` those orders'
+        payments can never apply.
+        """
+        account = self.accounts.get(xrp_address)
+        if account is None:
+            return []
+        stale = account.pop_below(sequence)
+        if not account:
+            del self.accounts[xrp_address]
+        for order in stale:
+            self._unlink(order)
+        return stale
 
-    def get_l2_order_book(self):
-        current_time = int(time.time())
+    def fill_order(self, order, filled_amount):
+        """Reduce a resting order by a partial or full fill, keeping level totals consistent."""
+        side = self._side(order)
+        if side is not None and order.price in side:
+            side[order.price].reduce(order, filled_amount)
+            self.changed_levels.add((order.order_type, order.price))
+            self.version += 1
+        else:
+            order.amount -= filled_amount
+        if self.journal is not None:
+            self.journal.record_fill(order)
+
+    def best_bid(self):
+        return self.bids.best_price()
+
+    def best_ask(self):
+        return self.asks.best_price()
+
+    def columns(self, order_type, limit_price=None):
+        """Columnar snapshot of one side; see PriceLevels.columns."""
+        side = self.bids if OrderType(order_type) is OrderType.BUY else self.asks
+        return side.columns(limit_price)
+
+    def get_l2_order_book(self, depth=None, bucket=None):
+        """Aggregated volume per price, best price first on each side.
+
+        ``bucket`` (in ticks) groups levels into buckets of that many ticks, bids
+        rounded down and asks up. ``depth`` keeps the best N levels (or buckets)
+        per side, reading only those from the sorted index.
+        """
         return {
-            "bids": [(price, sum(order.amount for order in orders if order.expiration > current_time))
-                     for price, orders in sorted(self.bids.items(), reverse=True)],
-            "asks": [(price, sum(order.amount for order in orders if order.expiration > current_time))
-                     for price, orders in sorted(self.asks.items())]
+            "bids": self._l2_side(self.bids, depth, bucket),
+            "asks": self._l2_side(self.asks, depth, bucket)
         }
 
-    def clean_expired_orders(self):
-        current_time = int(time.time())
-        for price, orders in list(self.bids.items()):
-            self.bids[price] = [order for order in orders if order.expiration > current_time]
-            if not self.bids[price]:
-                del self.bids[price]
-        for price, orders in list(self.asks.items()):
-            self.asks[price] = [order for order in orders if order.expiration > current_time]
-            if not self.asks[price]:
-                del self.asks[price]
-        self.order_map = {tx_sig: order for tx_sig, order in self.order_map.items() if order.expiration > current_time}
+    def _l2_side(self, side, depth, bucket):
+        to_price = self.market.ticks_to_price
+        if bucket is None or bucket == 1:
+            return [(to_price(price), level.total_volume) for price, level in islice(side.items(), depth)]
+
+        rows = []
+        for price, level in side.items():
+            bucket_price = price // bucket * bucket if side.descending else -(-price // bucket) * bucket
+            if rows and rows[-1][0] == bucket_price:
+                rows[-1][1] += level.total_volume
+            elif len(rows) == depth:
+                break
+            else:
+                rows.append([bucket_price, level.total_volume])
+        return [(to_price(price), volume) for price, volume in rows]
+
+    def drain_changed_levels(self):
+        """Current (order_type, price, total_volume) of every level touched since the last drain.
+
+        Levels that emptied out are reported with volume 0.
+        """
+        changes = []
+        for order_type, price in self.changed_levels:
+            level = (self.bids if order_type is OrderType.BUY else self.asks).get(price)
+            changes.append((order_type, price, level.total_volume if level is not None else 0))
+        self.changed_levels.clear()
+        return changes
+
+    def is_live(self, order):
+        return self.order_map.get(order.payment_tx_signature) is order
+
+    def next_expiry(self):
+        """Unix time at which the next resting order expires, or None for an empty book."""
+        return self.expirations.next_expiry(self.is_live)
+
+    def clean_expired_orders(self, current_time=None):
+        if current_time is None:
+            current_time = int(self.clock())
+        expired_orders = self.expirations.pop_expired(current_time, self.is_live)
+        for order in expired_orders:
+            self.remove_order(order)
+        return expired_orders
@@ -1,26 +1,155 @@
+import asyncio
+import logging
+import math
 import threading
-import time
+from xrpl.asyncio.clients import AsyncWebsocketClient
+from xrpl.models import Subscribe, Unsubscribe
+
+logger = logging.getLogger(__name__)
 
 class OrderCleaner:
-    def __init__(self, order_book, xrpl_integration):
+    """Pulls resting orders that can no longer settle on the ledger.
+
+    Every ``interval`` seconds each account with resting orders is revalidated:
+    its sequence is fetched with at most ``concurrency`` account_info requests
+    in flight, and orders below it leave the book through the account index.
+    Accounts whose orders are closest to their LastLedgerSequence go first,
+    and orders already past it are dropped without a lookup.
+
+    With a ``stream_url`` (an XRPL WebSocket endpoint) the cleaner also
+    subscribes to those accounts' transactions, following the set of accounts
+    with resting orders every ``stream_sync_interval`` seconds. Each validated
+    transaction spends the sender's lower sequences as soon as its ledger
+    closes; the periodic pass is then only a safety net.
+    """
+
+    def __init__(self, order_book, xrpl_integration, interval=60, concurrency=16, stream_url=None, stream_sync_interval=1.0):
         self.order_book = order_book
         self.xrpl_integration = xrpl_integration
-        self.running = False
+        self.interval = interval
+        self.concurrency = concurrency
+        self.stream_url = stream_url
+        self.stream_sync_interval = stream_sync_interval
+        self._stop_event = threading.Event()
+        self._threads = []
 
     def start(self):
-        self.running = True
-        threading.Thread(target=self._run).start()
+        self._stop_event.clear()
+        targets = [self._run]
+        if self.stream_url is not None:
+            targets.append(lambda: asyncio.run(self._stream(self.stream_url)))
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
 
     def stop(self):
-        self.running = False
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
 
     def _run(self):
-        while self.running:
-            self._clean_orders()
-            time.sleep(60)  # Run every minute
-
-    def _clean_orders(self):
-        for address in list(self.order_book.order_map.keys()):
-            current_sequence = self.xrpl_integration.get_account_sequence(address)
-            valid_orders = [order for order in self.order_book.order_map[address] if order.sequence >= current_sequence]
-            self.order_book.order_map[address] = valid_orders
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.revalidate()
+            except Exception as e:
+                logger.error(f"Error revalidating orders: {e}", exc_info=True)
+
+    def revalidate(self, addresses=None):
+        """Revalidate ``addresses`` (default: every account with resting orders); returns the orders removed."""
+        return asyncio.run(self.revalidate_async(addresses))
+
+    async def revalidate_async(self, addresses=None):
+        current_ledger = await self.xrpl_integration.get_current_ledger_sequence_async()
+        with self.order_book.lock:
+            if addresses is None:
+                addresses = list(self.order_book.accounts)
+            accounts = [(address, self.order_book.account_orders(address)) for address in addresses]
+
+        removed = self.remove_expired(accounts, current_ledger)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check(address):
+            async with semaphore:
+                sequence = await self.xrpl_integration.fetch_account_sequence_async(address)
+            with self.order_book.lock:
+                return self.order_book.invalidate_below(address, sequence)
+
+        # Tasks take the semaphore in creation order, so urgent accounts are fetched first
+        results = await asyncio.gather(*(check(address) for address in self.prioritize(accounts, current_ledger)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Could not revalidate account: {result}")
+            else:
+                removed.extend(result)
+        if removed:
+            logger.info(f"Removed {len(removed)} orders that can no longer settle")
+        return removed
+
+    def prioritize(self, accounts, current_ledger):
+        """Addresses ordered by their nearest LastLedgerSequence after ``current_ledger``, accounts without one last."""
+        def deadline(account):
+            return min((order.last_ledger_sequence for order in account[1]
+                        if order.last_ledger_sequence is not None and order.last_ledger_sequence > current_ledger), default=math.inf)
+        return [address for address, _ in sorted(accounts, key=deadline)]
+
+    def remove_expired(self, accounts, current_ledger):
+        expired = [order for _, orders in accounts for order in orders
+                   if order.last_ledger_sequence is not None and order.last_ledger_sequence <= current_ledger]
+        with self.order_book.lock:
+            expired = [order for order in expired if self.order_book.is_live(order)]
+            for order in expired:
+                self.order_book.remove_order(order)
+        return expired
+
+    def on_transaction(self, message):
+        """Handle an account ``transaction`` stream message; returns the orders removed."""
+        if message.get("type") != "transaction" or not message.get("validated"):
+            return []
+        tx = message.get("tx_json") or message.get("transaction") or {}
+        account, sequence = tx.get("Account"), tx.get("Sequence")
+        if not sequence:
+            return []  # Ticketed transactions do not consume the account sequence
+        with self.order_book.lock:
+            return self.order_book.invalidate_below(account, sequence + 1)
+
+    async def _stream(self, url):
+        while not self._stop_event.is_set():
+            try:
+                async with AsyncWebsocketClient(url) as client:
+                    tasks = [asyncio.create_task(self._read_stream(client)), asyncio.create_task(self._sync_subscriptions(client))]
+                    try:
+                        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                    for task in done:
+                        task.result()  # Re-raises whichever side failed
+                    if not self._stop_event.is_set():
+                        raise ConnectionError("connection closed")
+            except Exception as e:
+                logger.warning(f"Account stream disconnected ({e}); reconnecting")
+                await asyncio.sleep(self.stream_sync_interval)
+
+    async def _sync_subscriptions(self, client):
+        # Follow the set of accounts with resting orders
+        subscribed = set()
+        while not self._stop_event.is_set():
+            # A reader waiting on a dropped connection never wakes up, so watch it from here
+            if not client.is_open():
+                raise ConnectionError("connection closed")
+            with self.order_book.lock:
+                wanted = set(self.order_book.accounts)
+            if wanted - subscribed:
+                await client.send(Subscribe(accounts=sorted(wanted - subscribed)))
+            if subscribed - wanted:
+                await client.send(Unsubscribe(accounts=sorted(subscribed - wanted)))
+            subscribed = wanted
+            await asyncio.sleep(self.stream_sync_interval)
+
+    async def _read_stream(self, client):
+        async for message in client:
+            removed = self.on_transaction(message)
+            if removed:
+                logger.info(f"Removed {len(removed)} orders spent on-ledger by {removed[0].xrp_address}")
@@ -0,0 +1,186 @@
+import json
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from matching_engine import create_matching_engine
+from order_book import Order, OrderBook
+from order_journal import order_row
+
+logger = logging.getLogger(__name__)
+
+class OrderFlowRecorder:
+    """Records the order flow reaching the book, for offline replay with replay().
+
+    Attach it as ``OrderBook.recorder`` and register record_auction and
+    record_settlement with the MatchingEngine. Writes one JSON line per event:
+
+    - ``order``: an order added to the book, with the time and its fields;
+    - ``remove``: an order taken off the book, with the time and its
+      payment_tx_signature, whether the engine, OrderCleaner or a cancellation
+      removed it;
+    - ``auction``: an auction, with the book time and current ledger index it
+      started with (what it filtered expiry and LastLedgerSequence against,
+      not when settlement finished), and its result;
+    - ``settlement``: whether the ``auction``-th auction recorded (counting
+      from 0) settled, once the outcome is applied to the book.
+
+    All are recorded under the book lock, so their order in the file is the
+    order the engine saw them in. Requests the API rejected never reach the
+    book and are not recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1 << 20)
+        self._lock = threading.Lock()
+        self._auctions = 0
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def record_add(self, order):
+        self._write({"type": "order", "time": time.time(), "order": order_row(order)})
+
+    def record_remove(self, order):
+        self._write({"type": "remove", "time": time.time(), "signature": order.payment_tx_signature})
+
+    def record_auction(self, result):
+        """MatchingEngine auction listener."""
+        self._write({"type": "auction", "time": result.timestamp, "ledger": result.ledger,
+                     "clearing_price": result.clearing_price, "volume": result.volume, "fills": result.fill_count})
+        self._auctions += 1
+        with self._lock:
+            self._file.flush()
+
+    def record_settlement(self, settled):
+        """MatchingEngine settlement listener; auctions are serialized, so this settles the last one recorded."""
+        self._write({"type": "settlement", "time": time.time(), "auction": self._auctions - 1, "settled": settled})
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def load_order_flow(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class ReplayXRPLIntegration:
+    """XRPLIntegration stand-in for replay; nothing touches the network.
+
+    Submissions succeed while ``succeed`` is true and fail with a ``tec``
+    result otherwise, so replay can reproduce a recorded settlement failure.
+    """
+
+    def __init__(self):
+        self.current_ledger = 0
+        self.submitted = 0
+        self.succeed = True
+
+    def get_current_ledger_sequence(self):
+        return self.current_ledger
+
+    def get_account_sequence(self, address):
+        return 1
+
+    def fetch_account_sequence(self, address):
+        return 1
+
+    def create_payment_transaction(self, sender_address, destination, amount, sequence=None):
+        return {"Account": sender_address, "Destination": destination, "Amount": str(amount), "Sequence": sequence}
+
+    def submit_transaction(self, transaction):
+        self.submitted += 1
+        return _SubmitResult(f"{self.submitted:064X}", self.succeed)
+
+class _SubmitResult:
+    def __init__(self, tx_hash, succeeded=True):
+        self.result = {"hash": tx_hash}
+        if not succeeded:
+            self.result["meta"] = {"TransactionResult": "tecUNFUNDED_PAYMENT"}
+        self.succeeded = succeeded
+
+    def is_successful(self):
+        return self.succeeded
+
+class ReplayMultisigWallet:
+    def get_address(self):
+        return "rReplayMultisigWa11etAddressXXXXXX"
+
+class ReplayReport(namedtuple("ReplayReport", [
+        "orders", "rejected", "auctions", "fills", "volume", "mismatches",
+        "order_seconds", "auction_seconds", "wall_seconds"])):
+    """Outcome of one replay; ``auction_seconds`` holds each auction's latency."""
+    __slots__ = ()
+
+    @property
+    def orders_per_second(self):
+        return self.orders / self.order_seconds if self.order_seconds else math.inf
+
+    def auction_latency(self, quantile):
+        latencies = sorted(self.auction_seconds)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, max(0, math.ceil(len(latencies) * quantile) - 1))]
+
+def replay(events, backend="python", **engine_kwargs):
+    """Run a recorded order flow through a fresh OrderBook, MatchingEngine and Settlement at full speed.
+
+    The book's clock follows the recorded event times, so orders expire as
+    they did in production, and every auction sees the ledger index that was
+    recorded for it. Recorded removals are applied where they happened, and
+    an auction whose settlement was recorded as failed has every submission
+    fail, so the book takes the same unsettled path. Returns a ReplayReport;
+    ``mismatches`` counts recorded auctions whose clearing price, volume or
+    fill count came out differently.
+    """
+    now = 0.0
+    order_book = OrderBook()
+    order_book.clock = lambda: now
+    xrpl_integration = ReplayXRPLIntegration()
+    matching_engine = create_matching_engine(order_book, xrpl_integration, ReplayMultisigWallet(), backend=backend, **engine_kwargs)
+
+    # Outcomes are recorded after their auction, but settlement runs inside it
+    settled = {event["auction"]: event["settled"] for event in events if event["type"] == "settlement"}
+
+    orders = rejected = fills = volume = mismatches = 0
+    order_seconds = 0.0
+    auction_seconds = []
+    wall_start = time.perf_counter()
+    for event in events:
+        now = event["time"]
+        if event["type"] == "order":
+            order = Order(*event["order"])
+            start = time.perf_counter()
+            with order_book.lock:
+                try:
+                    order_book.add_order(order)
+                    orders += 1
+                except ValueError:
+                    rejected += 1
+            order_seconds += time.perf_counter() - start
+        elif event["type"] == "remove":
+            # Already gone if the replayed engine removed it itself
+            with order_book.lock:
+                order_book.cancel_order(event["signature"])
+        elif event["type"] == "auction":
+            if event["ledger"] is not None:
+                xrpl_integration.current_ledger = event["ledger"]
+            xrpl_integration.succeed = settled.get(len(auction_seconds), True)
+            start = time.perf_counter()
+            with order_book.lock:
+                result = matching_engine.match_orders()
+            auction_seconds.append(time.perf_counter() - start)
+            fills += result.fill_count
+            volume += result.volume
+            recorded = (event.get("clearing_price"), event.get("volume"), event.get("fills"))
+            if "volume" in event and (result.clearing_price, result.volume, result.fill_count) != recorded:
+                mismatches += 1
+
+    return ReplayReport(orders, rejected, len(auction_seconds), fills, volume, mismatches,
+                        order_seconds, auction_seconds, time.perf_counter() - wall_start)
@@ -0,0 +1,259 @@
+import fcntl
+import gc
+import json
+import logging
+import os
+import threading
+import time
+from operator import attrgetter
+from book_snapshot import BookSnapshot, write_snapshot
+from matching_engine import AuctionResult
+from order_book import Order
+
+logger = logging.getLogger(__name__)
+
+# Order constructor arguments, in order; everything a resting order needs to be rebuilt
+ORDER_FIELDS = (
+    "price", "amount", "order_type", "xrp_address", "public_key", "expiration", "sequence",
+    "payment_tx_signature", "multisig_destination", "last_ledger_sequence", "signed_tx_json",
+)
+order_row = attrgetter(*ORDER_FIELDS)
+
+class OrderJournal:
+    """Write-ahead journal and snapshots of an OrderBook, so a restart keeps resting orders.
+
+    While started, every book mutation is appended to the current journal
+    segment as one JSON line: ``add`` with the order's fields, ``remove`` with
+    its payment_tx_signature, ``fill`` with its remaining amount, and
+    ``auction`` for each auction result. Lines are buffered and fsynced
+    together every ``fsync_interval`` seconds, so a crash loses at most that
+    much acknowledged order flow.
+
+    Every ``snapshot_interval`` seconds the journal rolls over to a new segment
+    and the book as of that point is written next to it as a binary snapshot
+    (book_snapshot.py); older segments and snapshots are then deleted. Only the rollover and a copy of
+    the order list happen under the book lock. Fills record absolute amounts,
+    so a snapshot that catches an order after a later fill still replays to
+    the right state.
+
+    recover() loads the latest snapshot and replays the segments after it.
+
+    recover() and start() take an exclusive lock on the directory, held until
+    stop(), so a second process pointed at the same directory fails at once
+    instead of writing segments and deleting the first one's.
+    """
+
+    def __init__(self, order_book, directory, fsync_interval=0.05, snapshot_interval=300):
+        self.order_book = order_book
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        self.last_auction = None
+        self.segment = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._last_snapshot = time.monotonic()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _lock_directory(self):
+        if self._lock_file is not None:
+            return
+        lock_file = open(os.path.join(self.directory, "LOCK"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"Order journal directory {self.directory} is in use by another journal")
+        self._lock_file = lock_file
+
+    def _unlock_directory(self):
+        if self._lock_file is not None:
+            self._lock_file.close()  # Closing the descriptor releases the lock
+            self._lock_file = None
+
+    def _path(self, kind, number):
+        extension = "log" if kind == "journal" else "snap"
+        return os.path.join(self.directory, f"{kind}-{number:012d}.{extension}")
+
+    def _numbers(self, kind):
+        numbers = []
+        for name in os.listdir(self.directory):
+            prefix, _, rest = name.partition("-")
+            number, _, extension = rest.partition(".")
+            if prefix == kind and number.isdigit() and extension in ("log", "snap"):
+                numbers.append(int(number))
+        return sorted(numbers)
+
+    def start(self):
+        """Open a fresh segment, start journaling the book, and start the fsync/snapshot thread."""
+        self._lock_directory()
+        with self.order_book.lock:
+            with self._lock:
+                existing = self._numbers("journal") + self._numbers("snapshot")
+                self._open_segment(max(existing, default=-1) + 1)
+            self.order_book.journal = self
+        self._last_snapshot = time.monotonic()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self.order_book.lock:
+            self.order_book.journal = None
+            with self._lock:
+                self._close_segment()
+        self._unlock_directory()
+
+    def _run(self):
+        while not self._stop_event.wait(self.fsync_interval):
+            try:
+                self.sync()
+                if self.snapshot_interval and time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                    self.snapshot()
+            except Exception as e:
+                logger.error(f"Error writing order journal: {e}", exc_info=True)
+
+    def _open_segment(self, number):
+        # Caller holds self._lock
+        self.segment = number
+        self._file = open(self._path("journal", number), "x", encoding="utf-8", buffering=1 << 20)
+
+    def _close_segment(self):
+        # Caller holds self._lock
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def record_add(self, order):
+        self._write(["add", order_row(order)])
+
+    def record_remove(self, order):
+        self._write(["remove", order.payment_tx_signature])
+
+    def record_fill(self, order):
+        self._write(["fill", order.payment_tx_signature, order.amount])
+
+    def record_auction(self, result):
+        """MatchingEngine auction listener."""
+        self.last_auction = result
+        self._write(["auction", *result])
+
+    def sync(self):
+        """Make everything journaled so far durable."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            # A duplicate descriptor stays valid if a snapshot closes the segment meanwhile
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def snapshot(self):
+        """Roll over to a new segment and write the book as of that point; returns the snapshot path."""
+        with self._snapshot_lock:
+            with self.order_book.lock:
+                with self._lock:
+                    self._close_segment()
+                    self._open_segment(self.segment + 1)
+                    number = self.segment
+                orders = list(self.order_book.order_map.values())
+                last_auction = self.last_auction
+
+            path = self._path("snapshot", number)
+            metadata = {"segment": number, "last_auction": list(last_auction) if last_auction is not None else None}
+            write_snapshot(path + ".tmp", orders, metadata)
+            os.replace(path + ".tmp", path)
+            self._fsync_directory()
+
+            for kind in ("journal", "snapshot"):
+                for old in self._numbers(kind):
+                    if old < number:
+                        os.remove(self._path(kind, old))
+            self._last_snapshot = time.monotonic()
+            logger.info(f"Wrote order book snapshot {number} with {len(orders)} orders")
+            return path
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def recover(self):
+        """Rebuild the (empty) book from the latest snapshot and the journal after it.
+
+        Returns the last AuctionResult recorded, or None. Call before start().
+        """
+        if self.order_book.journal is not None:
+            raise RuntimeError("Recover before the journal is started")
+        self._lock_directory()
+        # Millions of new objects would trigger repeated full collections for nothing
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            first_segment = 0
+            snapshots = self._numbers("snapshot")
+            if snapshots:
+                snapshot = BookSnapshot(self._path("snapshot", snapshots[-1]))
+                snapshot.restore_into(self.order_book)
+                if snapshot.metadata["last_auction"] is not None:
+                    self.last_auction = AuctionResult(*snapshot.metadata["last_auction"])
+                first_segment = snapshot.metadata["segment"]
+
+            replayed = 0
+            for number in self._numbers("journal"):
+                if number >= first_segment:
+                    replayed += self._replay(number)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        logger.info(f"Recovered {len(self.order_book.order_map)} orders "
+                    f"({'snapshot ' + str(first_segment) if snapshots else 'no snapshot'}, {replayed} journal records)")
+        return self.last_auction
+
+    def _replay(self, number):
+        order_book = self.order_book
+        replayed = 0
+        with open(self._path("journal", number), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    if line.endswith("\n"):
+                        raise ValueError(f"Corrupt record in journal segment {number}: {line[:80]!r}")
+                    # A write torn by the crash; everything before it was complete
+                    logger.warning(f"Ignoring torn final record in journal segment {number}")
+                    break
+
+                kind = record[0]
+                if kind == "add":
+                    order_book.add_order(Order(*record[1]))
+                elif kind == "remove":
+                    order_book.cancel_order(record[1])
+                elif kind == "fill":
+                    order = order_book.order_map.get(record[1])
+                    if order is not None:
+                        order_book.fill_order(order, order.amount - record[2])
+                elif kind == "auction":
+                    self.last_auction = AuctionResult(*record[1:])
+                replayed += 1
+        return replayed
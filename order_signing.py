@@ -13,7 +13,7 @@ def sign_order(order_data, wallet):
 def verify_order_signature(order, message):
     """Verify the signature of an order"""
     try:
-        logger.debug(f"Verifying signature for order: {order.__dict__}")
+        logger.debug(f"Verifying signature for order: {order!r}")
         logger.debug(f"Message to verify: {message}")
         logger.debug(f"Signature to verify: {order.signature}")
         logger.debug(f"Public key: {order.public_key}")
@@ -3,7 +3,7 @@ import json
 import time
 import asyncio
 from xrpl.wallet import Wallet
-from xrpl.asyncio.clients import AsyncJsonRpcClient
+from xrpl_client import get_shared_pool
 from xrpl.core import keypairs
 from xrpl.models import AccountInfo, Payment
 from xrpl.asyncio.transaction import autofill_and_sign
@@ -33,13 +33,13 @@ def get_multisig_address():
     with open("multisig_address.txt", "r") as f:
         return f.read().strip()
         
-async def place_order(price, amount, order_type):
+async def place_order(price, amount, order_type, http_client):
     url = "http://127.0.0.1:5000/place_order"
     
     wallet = load_test_wallet()
     logger.debug(f"Loaded wallet with address: {wallet.classic_address}")
     
-    client = AsyncJsonRpcClient("https://s.altnet.rippletest.net:51234")
+    client = get_shared_pool().async_client
     account_info = await client.request(AccountInfo(account=wallet.classic_address))
     current_sequence = account_info.result['account_data']['Sequence']
 
@@ -89,8 +89,7 @@ async def place_order(price, amount, order_type):
     
     headers = {"Content-Type": "application/json"}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, headers=headers)
+    response = await http_client.post(url, json=payload, headers=headers)
     
     logger.debug(f"Status Code: {response.status_code}")
     logger.debug(f"Response Headers: {response.headers}")
@@ -102,13 +101,14 @@ async def place_order(price, amount, order_type):
         logger.error("Failed to decode JSON response")
 
 async def main():
-    for order in ORDER_CONFIG:
-        await place_order(order["price"], order["amount"], order["order_type"])
-        await asyncio.sleep(1)  # Small delay between orders
+    # One keep-alive HTTP client for the exchange API; XRPL calls share the pooled client layer
+    async with httpx.AsyncClient() as http_client:
+        for order in ORDER_CONFIG:
+            await place_order(order["price"], order["amount"], order["order_type"], http_client)
+            await asyncio.sleep(1)  # Small delay between orders
     
-    l2_order_book_url = "http://127.0.0.1:5000/l2_order_book"
-    async with httpx.AsyncClient() as client:
-        l2_order_book_response = await client.get(l2_order_book_url)
+        l2_order_book_url = "http://127.0.0.1:5000/l2_order_book"
+        l2_order_book_response = await http_client.get(l2_order_book_url)
     print("\nL2 Order book:")
     print(l2_order_book_response.text)
 
@@ -0,0 +1,44 @@
+import threading
+
+class ReplayFilter:
+    """Remembers payment signatures and tx hashes of recently accepted orders.
+
+    Keys live in two generations of exact sets. Lookups are O(1) set probes, and
+    expiry drops the older generation wholesale once the validated ledger has
+    moved ``window_ledgers`` past the current generation's start (or the current
+    generation reaches ``capacity`` keys), so a key is remembered for at least
+    one full window.
+    """
+
+    def __init__(self, window_ledgers=256, capacity=1_000_000):
+        self.window_ledgers = window_ledgers
+        self.capacity = capacity
+        self._current = set()
+        self._previous = set()
+        self._generation_start = None
+        self._lock = threading.Lock()
+
+    def seen(self, *keys):
+        current, previous = self._current, self._previous
+        return any(key in current or key in previous for key in keys)
+
+    def add(self, *keys):
+        with self._lock:
+            self._current.update(keys)
+            if len(self._current) >= self.capacity:
+                self._rotate()
+
+    def on_ledger_closed(self, ledger_index):
+        with self._lock:
+            if self._generation_start is None:
+                self._generation_start = ledger_index
+            elif ledger_index - self._generation_start >= self.window_ledgers:
+                self._rotate()
+                self._generation_start = ledger_index
+
+    def _rotate(self):
+        self._previous = self._current
+        self._current = set()
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
@@ -1,49 +1,184 @@
 from xrpl.transaction import XRPLReliableSubmissionException
+import asyncio
 import logging
+import threading
+import time
+from config import SETTLEMENT_CONFIG
+from market import Market
+from netting import net_payouts
 
 logger = logging.getLogger(__name__)
 
 class Settlement:
-    def __init__(self, xrpl_integration, multisig_wallet):
+    def __init__(self, xrpl_integration, multisig_wallet, market=None, concurrency=SETTLEMENT_CONFIG["concurrency"],
+                 payout_attempts=SETTLEMENT_CONFIG["payout_attempts"]):
         self.xrpl_integration = xrpl_integration
         self.multisig_wallet = multisig_wallet
+        self.market = market if market is not None else Market()
+        self.concurrency = concurrency
+        self.payout_attempts = payout_attempts
+        self.last_batch_wall_time = None
+        self.last_failed_orders = []
 
     def process_matched_orders(self, matched_orders):
-        for order in matched_orders:
-            if not self.execute_order(order):
-                return False
-        return True
+        return asyncio.run(self.process_matched_orders_async(matched_orders))
 
-    def execute_order(self, order):
+    async def process_matched_orders_async(self, matched_orders):
+        """Settle a batch with up to ``concurrency`` transactions in flight at once.
+
+        Matched orders are first netted into one payout per destination. Every
+        order's pre-signed payment is submitted in parallel, and each destination's
+        payout goes out as soon as its funding payments have all completed. If some
+        of them failed, the payout is re-netted over the orders whose payment
+        confirmed, and the failed orders are kept on ``last_failed_orders``. Payouts
+        from the multisig account take consecutive sequence numbers, so concurrent
+        payouts never race on autofill. Every destination is attempted; the batch
+        fails if any payment or payout fails.
+        """
+        start_time = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Always read from the ledger: a cached sequence may already be spent by the previous batch
+        payout_sequences = _SequenceAllocator(
+            lambda: self.xrpl_integration.fetch_account_sequence(self.multisig_wallet.get_address())
+        )
+        payouts = net_payouts(matched_orders, self.market)
+
+        async def submit_payment(order):
+            async with semaphore:
+                return await asyncio.to_thread(self.submit_payment, order)
+
+        failed_orders = []
+
+        async def settle(payout):
+            payments = await asyncio.gather(*(submit_payment(order) for order in payout.orders))
+            failed = [order for order, paid in zip(payout.orders, payments) if not paid]
+            if failed:
+                for order in failed:
+                    logger.error(f"Payment failed for {order!r}; leaving it out of the payout to {payout.destination}")
+                failed_orders.extend(failed)
+                confirmed = [order for order, paid in zip(payout.orders, payments) if paid]
+                if not confirmed:
+                    return False
+                # The confirmed payments already moved funds into the multisig; pay those back regardless
+                (payout,) = net_payouts(confirmed, self.market)
+            async with semaphore:
+                paid_out = await asyncio.to_thread(self.submit_payout, payout, payout_sequences)
+            return paid_out and not failed
+
+        results = await asyncio.gather(*(settle(payout) for payout in payouts))
+
+        self.last_failed_orders = failed_orders
+        self.last_batch_wall_time = time.perf_counter() - start_time
+        logger.info(f"Settled batch of {len(matched_orders)} orders as {len(payouts)} payouts in {self.last_batch_wall_time:.3f}s")
+        return all(results)
+
+    def submit_payment(self, order):
         # Note: For partial fills, we execute the full pre-signed transaction.
         # The remaining unfilled portion stays on the order book for future matching.
         # We do not refund excess amounts for partial fills.
+        return self.submit_transaction(order.signed_tx_json, f"Full payment for {order.order_type} order")
+
+    def submit_payout(self, payout, payout_sequences=None):
+        """Pay ``payout`` out of the multisig account.
+
+        With ``payout_sequences``, the sequence is taken right before the payout
+        is prepared and submitted. If the payout then fails without applying
+        (autofill errors, tem/tef/ter results, LastLedgerSequence passing), its
+        sequence was never used and every higher one handed out is stuck behind
+        it, so numbering restarts from the ledger and the payout is retried, up
+        to ``payout_attempts`` times.
+        """
+        description = f"Netted payout for {len(payout.orders)} orders"
+        if payout_sequences is None:
+            return self._submit_payout(payout, None, description)[0]
+
+        for _ in range(self.payout_attempts):
+            sequence, generation = payout_sequences.allocate()
+            succeeded, consumed_sequence = self._submit_payout(payout, sequence, description)
+            if succeeded or consumed_sequence:
+                return succeeded
+            logger.warning(f"{description} did not apply with sequence {sequence}; refetching the multisig sequence")
+            payout_sequences.reset(generation)
+        return False
 
+    def _submit_payout(self, payout, sequence, description):
+        try:
+            payout_tx = self.xrpl_integration.create_payment_transaction(
+                self.multisig_wallet.get_address(),
+                payout.destination,
+                payout.amount,
+                sequence=sequence
+            )
+        except Exception as e:
+            logger.error(f"Error preparing {description} transaction: {e}")
+            return False, False
+        return self._submit(payout_tx, description)
+
+    def execute_order(self, order, payout_sequences=None):
+        """Settle a single order on its own, without netting."""
         # Execute the full pre-signed transaction
-        if not self.submit_transaction(order.signed_tx_json, f"Full payment for {order.order_type} order"):
+        if not self.submit_payment(order):
             return False
 
         # Calculate the amount to pay out based on the matched amount
-        payout_amount = order.matched_amount * order.price if order.order_type == "sell" else order.matched_amount
+        payout_amount = self.market.quote_amount(order.matched_amount, order.price) if order.order_type == "sell" else order.matched_amount
 
         # Create and submit the payout transaction
         payout_tx = self.xrpl_integration.create_payment_transaction(
             self.multisig_wallet.get_address(),  # Get the address from the MultisigWallet object
             order.xrp_address,
-            payout_amount
+            payout_amount,
+            sequence=next(payout_sequences) if payout_sequences is not None else None
         )
         return self.submit_transaction(payout_tx, f"Payout for {order.order_type} order")
 
     def submit_transaction(self, transaction, description):
+        return self._submit(transaction, description)[0]
+
+    def _submit(self, transaction, description):
+        """Submit ``transaction``; returns (succeeded, whether it used up its sequence)."""
         try:
             result = self.xrpl_integration.submit_transaction(transaction)
             if result.is_successful():
                 hash_value = result.result.get('hash', 'Unknown')
                 logger.info(f"{description} transaction submitted successfully: {hash_value}")
-                return True
+                return True, True
             else:
                 logger.error(f"{description} transaction failed: {result.result}")
-                return False
+                return False, str(result.result.get('meta', {}).get('TransactionResult', '')).startswith("tec")
         except Exception as e:
             logger.error(f"Error submitting {description} transaction: {e}")
-            return False
+            # Only a validated tec result claims the fee and so uses the sequence up
+            return False, isinstance(e, XRPLReliableSubmissionException) and str(e).startswith("Transaction failed: tec")
+
+class _SequenceAllocator:
+    """Hands out consecutive account sequence numbers, fetching the first one lazily.
+
+    Each fetch starts a new generation. reset(generation) makes the next
+    allocation fetch again, unless another failure already restarted numbering
+    since ``generation`` was handed out.
+    """
+
+    def __init__(self, fetch_sequence):
+        self._fetch_sequence = fetch_sequence
+        self._next_sequence = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        """The next sequence and the generation it belongs to."""
+        with self._lock:
+            if self._next_sequence is None:
+                self._next_sequence = self._fetch_sequence()
+                self._generation += 1
+            sequence = self._next_sequence
+            self._next_sequence += 1
+            return sequence, self._generation
+
+    def reset(self, generation):
+        with self._lock:
+            if generation == self._generation:
+                self._next_sequence = None
+
+    def __next__(self):
+        return self.allocate()[0]
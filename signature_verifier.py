@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha512
+from xrpl.core import keypairs
+from xrpl.core.binarycodec import encode, encode_for_signing
+
+logger = logging.getLogger(__name__)
+
+def verify_payment_signature(payment_tx_signature, public_key, signed_tx_json):
+    if payment_tx_signature is None:
+        logger.error("Payment signature is None")
+        return False
+
+    try:
+        # Remove TxnSignature and hash fields
+        tx_json = {k: v for k, v in signed_tx_json.items() if k not in ["TxnSignature", "hash"]}
+
+        # Serialize the transaction
+        signing_data = encode_for_signing(tx_json)
+
+        # Convert the hex string to bytes
+        signing_data_bytes = bytes.fromhex(signing_data)
+
+        # Verify the Signature
+        is_valid = keypairs.is_valid_message(
+            message=signing_data_bytes,
+            signature=bytes.fromhex(payment_tx_signature),
+            public_key=public_key
+        )
+
+        logger.debug(f"Signature verification result: {is_valid}")
+        return is_valid
+
+    except Exception as e:
+        logger.error(f"Error verifying payment signature: {str(e)}", exc_info=True)
+        return False
+
+def signed_tx_hash(signed_tx_json):
+    """Transaction hash of a signed transaction, computed the way the ledger does."""
+    tx_json = {k: v for k, v in signed_tx_json.items() if k != "hash"}
+    return sha512(bytes.fromhex("54584E00" + encode(tx_json))).hexdigest().upper()[:64]
+
+def _verify_chunk(items):
+    return [verify_payment_signature(*item) for item in items]
+
+class SignatureVerifier:
+    """Verifies payment signatures on a pool of worker processes.
+
+    Signature checks are pure CPU work, so running them in the request thread caps
+    admission at one core. ``verify`` and ``verify_async`` check a single order;
+    ``verify_many`` takes (payment_tx_signature, public_key, signed_tx_json)
+    tuples and ships them to the workers in chunks to amortize IPC.
+    """
+
+    def __init__(self, workers=None, chunk_size=64):
+        self.chunk_size = chunk_size
+        # spawn rather than fork: the parent already runs pool and poller threads
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def verify(self, payment_tx_signature, public_key, signed_tx_json):
+        return self.executor.submit(verify_payment_signature, payment_tx_signature, public_key, signed_tx_json).result()
+
+    async def verify_async(self, payment_tx_signature, public_key, signed_tx_json):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, verify_payment_signature, payment_tx_signature, public_key, signed_tx_json)
+
+    async def verify_many(self, items):
+        items = list(items)
+        loop = asyncio.get_running_loop()
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self.executor, _verify_chunk, chunk) for chunk in chunks))
+        return [is_valid for chunk_results in results for is_valid in chunk_results]
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+class VerificationCache:
+    """Bounded LRU of signature verification results.
+
+    Keys are (signed tx hash, public_key, payment_tx_signature), so a cached
+    result only answers the exact same claim that was verified.
+    """
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+    def __len__(self):
+        return len(self._results)
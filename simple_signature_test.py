@@ -1,6 +1,6 @@
 import json
 import asyncio
-from xrpl.asyncio.clients import AsyncJsonRpcClient
+from xrpl_client import get_shared_pool
 from xrpl.models.transactions import Payment
 from xrpl.asyncio.transaction import autofill_and_sign
 from xrpl.wallet import Wallet
@@ -23,7 +23,7 @@ async def main():
     )
 
     # Create a client connection
-    client = AsyncJsonRpcClient("https://s.altnet.rippletest.net:51234")
+    client = get_shared_pool().async_client
     try:
         # Autofill and sign the transaction (but don't submit)
         signed_tx = await autofill_and_sign(payment, client, wallet)
@@ -54,8 +54,7 @@ async def main():
 
         print(f"Signature valid: {is_valid}")
     finally:
-        # AsyncJsonRpcClient doesn't have a close method, so we'll remove this line
-        pass
+        get_shared_pool().close()
 
 if __name__ == "__main__":
     asyncio.run(main())
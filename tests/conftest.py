@@ -0,0 +1,36 @@
+import time
+from unittest.mock import AsyncMock, Mock
+import pytest
+from xrpl.models import Payment
+from xrpl.transaction import sign
+from signature_verifier import verify_payment_signature
+
+def signed_payment(wallet, sequence=1):
+    payment = Payment(account=wallet.classic_address, amount="1000000", destination="rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+                      sequence=sequence, fee="12", last_ledger_sequence=1000)
+    return sign(payment, wallet)
+
+def order_request(wallet, signed_tx_json):
+    return {
+        "price": "1.00", "amount_drops": 1000000, "order_type": "buy",
+        "xrp_address": wallet.classic_address, "public_key": wallet.public_key,
+        "expiration": int(time.time()) + 300, "sequence": 1,
+        "payment_tx_signature": signed_tx_json["TxnSignature"],
+        "multisig_destination": "rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+        "signed_tx_json": signed_tx_json,
+    }
+
+def verify_all(items):
+    return [verify_payment_signature(*item) for item in items]
+
+@pytest.fixture
+def xrpl_integration():
+    """XRPLIntegration for order entry: every account is at sequence 1 and signatures are really checked."""
+    xrpl_integration = Mock()
+    xrpl_integration.get_account_sequence.return_value = 1
+    xrpl_integration.get_account_sequence_async = AsyncMock(return_value=1)
+    xrpl_integration.verify_payment_signature.side_effect = verify_payment_signature
+    xrpl_integration.verify_payment_signature_async = AsyncMock(side_effect=verify_payment_signature)
+    xrpl_integration.verify_payment_signatures.side_effect = verify_all
+    xrpl_integration.verify_payment_signatures_async = AsyncMock(side_effect=verify_all)
+    return xrpl_integration
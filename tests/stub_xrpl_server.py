@@ -0,0 +1,50 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubXRPLServer:
+    """Local stand-in for an XRPL JSON-RPC endpoint.
+
+    ``handlers`` maps an RPC method name to a function taking the request params
+    and returning the result dict. Calls per method are counted in ``calls`` and
+    the client (host, port) pairs seen are collected in ``connections``.
+    """
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.calls = Counter()
+        self.connections = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep connections alive between requests
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                method = body["method"]
+                stub.calls[method] += 1
+                stub.connections.add(self.client_address)
+                params = body.get("params") or [{}]
+                result = dict(stub.handlers[method](params[0]), status="success")
+                payload = json.dumps({"result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
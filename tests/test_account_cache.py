@@ -0,0 +1,107 @@
+import threading
+import time
+import pytest
+from xrpl_client import XRPLClientPool
+from account_cache import AccountSequenceCache
+from xrpl_integration import XRPLIntegration
+from tests.stub_xrpl_server import StubXRPLServer
+
+def test_cached_within_ttl():
+    calls = []
+    cache = AccountSequenceCache(lambda address: calls.append(address) or 7, ttl=60)
+
+    assert cache.get("rAlice") == 7
+    assert cache.get("rAlice") == 7
+    assert calls == ["rAlice"]
+
+def test_ttl_expiry_and_ledger_close_invalidation():
+    sequences = {"rAlice": 7}
+    cache = AccountSequenceCache(lambda address: sequences[address], ttl=0.05)
+    assert cache.get("rAlice") == 7
+
+    sequences["rAlice"] = 8
+    time.sleep(0.1)
+    assert cache.get("rAlice") == 8
+
+    sequences["rAlice"] = 9
+    cache.on_ledger_closed(1000)
+    assert cache.get("rAlice") == 9
+
+def test_single_flight():
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(address):
+        calls.append(address)
+        release.wait()
+        return 42
+
+    cache = AccountSequenceCache(slow_fetch, ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("rAlice"))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 10
+    assert calls == ["rAlice"]
+
+def test_errors_are_not_cached():
+    outcomes = iter([RuntimeError("actNotFound"), 3])
+
+    def fetch(address):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    cache = AccountSequenceCache(fetch)
+    with pytest.raises(RuntimeError):
+        cache.get("rAlice")
+    assert cache.get("rAlice") == 3
+
+def test_failed_fetch_after_invalidation_releases_waiters():
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_fetch(address):
+        started.set()
+        release.wait()
+        raise RuntimeError("timeout")
+
+    cache = AccountSequenceCache(failing_fetch, ttl=60)
+    errors = []
+
+    def get():
+        try:
+            cache.get("rAlice")
+        except Exception as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=get, daemon=True)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=get, daemon=True)
+    follower.start()
+    time.sleep(0.05)
+    # A ledger closes while the fetch is in flight
+    cache.on_ledger_closed(1000)
+    release.set()
+    leader.join(2)
+    follower.join(2)
+
+    assert not follower.is_alive()
+    assert [str(e) for e in errors] == ["timeout", "timeout"]
+
+def test_integration_uses_cache():
+    handlers = {"account_info": lambda params: {"account_data": {"Account": params["account"], "Sequence": 5}}}
+    with StubXRPLServer(handlers) as server:
+        xrpl_integration = XRPLIntegration(XRPLClientPool([server.url]))
+        xrpl_integration.enable_account_cache(ttl=60)
+
+        for _ in range(20):
+            assert xrpl_integration.get_account_sequence("rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh") == 5
+        assert server.calls["account_info"] == 1
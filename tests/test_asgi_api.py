@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+import httpx
+import pytest
+from starlette.testclient import TestClient
+from xrpl.wallet import Wallet
+from asgi_api import AsyncAPI
+from order_book import OrderBook
+from tests.conftest import order_request, signed_payment
+
+@pytest.fixture
+def api(xrpl_integration):
+    return AsyncAPI(OrderBook(), Mock(), xrpl_integration)
+
+def test_same_contract_as_flask(api):
+    wallet = Wallet.create()
+    data = order_request(wallet, signed_payment(wallet).to_xrpl())
+
+    with TestClient(api.app) as client:
+        assert client.post("/place_order", json=data).json() == {"status": "success", "message": "Order placed and processed"}
+        assert client.post("/place_order", json=data).json()["message"] == "Order already placed"
+        assert client.get("/l2_order_book").json() == {"bids": [[1.0, 1000000]], "asks": []}
+
+        data = order_request(wallet, signed_payment(wallet, sequence=2).to_xrpl())
+        data["public_key"] = Wallet.create().public_key
+        response = client.post("/place_order", json=data)
+        assert response.status_code == 400
+        assert response.json()["message"] == "Invalid payment transaction signature"
+    # Auctions belong to AuctionScheduler, never to a request
+    api.matching_engine.assert_not_called()
+
+def test_submissions_overlap(api):
+    async def slow_lookup(address):
+        await asyncio.sleep(0.2)
+        return 1
+    api.xrpl_integration.get_account_sequence_async = slow_lookup
+    wallets = [Wallet.create() for _ in range(20)]
+    requests = [order_request(wallet, signed_payment(wallet).to_xrpl()) for wallet in wallets]
+
+    async def submit_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/place_order", json=data) for data in requests))
+
+    start = time.perf_counter()
+    responses = asyncio.run(submit_all())
+    assert all(response.status_code == 200 for response in responses)
+    assert len(api.order_book.order_map) == 20
+    # Twenty 200ms lookups in flight together, not one after another
+    assert time.perf_counter() - start < 2.0
+
+def test_cached_l2_served_during_auction(api):
+    wallet = Wallet.create()
+    with TestClient(api.app) as client:
+        assert client.post("/place_order", json=order_request(wallet, signed_payment(wallet).to_xrpl())).status_code == 200
+        first = client.get("/l2_order_book")
+
+        # An auction holds the book lock, e.g. while it waits on settlement
+        locked, release = threading.Event(), threading.Event()
+
+        def auction():
+            with api.order_book.lock:
+                locked.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=auction)
+        thread.start()
+        locked.wait()
+        try:
+            start = time.perf_counter()
+            assert client.get("/l2_order_book").content == first.content
+            assert client.get("/l2_order_book", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+            assert client.get("/l2_order_book?bucket=abc").status_code == 400
+            assert time.perf_counter() - start < 1.0
+        finally:
+            release.set()
+            thread.join()
@@ -0,0 +1,60 @@
+import threading
+import time
+from unittest.mock import Mock
+from flask import Flask
+from api import API
+from auction_scheduler import AuctionScheduler
+from order_book import OrderBook
+
+def test_next_auction_time_is_on_grid():
+    scheduler = AuctionScheduler(lambda: None, batch_interval=15)
+    assert scheduler.next_auction_time(1000.0) == 1005
+    assert scheduler.next_auction_time(1005.0) == 1020
+    assert scheduler.next_auction_time(1019.9) == 1020
+
+def test_fires_on_grid_off_the_caller_thread():
+    threads = []
+    scheduler = AuctionScheduler(lambda: threads.append(threading.current_thread()), batch_interval=0.05)
+    scheduler.start()
+    try:
+        time.sleep(0.32)
+    finally:
+        scheduler.stop()
+
+    assert len(scheduler.runs) >= 4
+    assert threading.current_thread() not in threads
+    for run in scheduler.runs:
+        assert round(run.scheduled / 0.05, 6).is_integer()
+        assert 0 <= run.skew < 0.05
+    metrics = scheduler.metrics()
+    assert metrics["auctions"] == len(scheduler.runs)
+    assert metrics["last_finished"] >= metrics["last_started"] >= metrics["last_scheduled"]
+    assert metrics["skew_max"] >= metrics["skew_mean"]
+
+def test_overrun_skips_grid_points_and_failures_are_recorded():
+    def slow_failing_auction():
+        time.sleep(0.12)
+        raise RuntimeError("settlement down")
+
+    scheduler = AuctionScheduler(slow_failing_auction, batch_interval=0.05)
+    scheduler.start()
+    try:
+        time.sleep(0.3)
+    finally:
+        scheduler.stop()
+
+    metrics = scheduler.metrics()
+    assert metrics["missed"] >= 2
+    assert metrics["failed"] == metrics["auctions"] >= 1
+    # Runs never overlap or bunch up after an overrun
+    runs = list(scheduler.runs)
+    assert all(later.started >= earlier.finished for earlier, later in zip(runs, runs[1:]))
+
+def test_flask_server_runs_without_the_reloader(monkeypatch):
+    run = Mock()
+    monkeypatch.setattr(Flask, "run", run)
+
+    API(OrderBook(), Mock(), Mock()).run("127.0.0.1", 5000)
+
+    # The reloader would re-run main() in a child, and both processes would schedule auctions
+    assert run.call_args.kwargs["use_reloader"] is False
@@ -0,0 +1,128 @@
+import time
+import pytest
+from book_snapshot import BookSnapshot, SnapshotOrder, write_snapshot
+from order_book import OrderBook, Order, OrderType
+
+def sample_orders():
+    expiration = int(time.time()) + 300
+    return [
+        Order(10050, 5, "buy", "rAlice", "pkA", expiration, sequence=7, payment_tx_signature="sig_a",
+              multisig_destination="rDest", last_ledger_sequence=1200, signed_tx_json={"Sequence": 7, "Memos": ["é"]}),
+        Order(10100, 3, "sell", "rBob", "pkB", expiration + 1, payment_tx_signature="sig_b"),
+        Order(10050, 2, "buy", "rAlice", "pkA", expiration + 2, sequence=5, payment_tx_signature="sig_c",
+              multisig_destination="rDest", signed_tx_json={"Sequence": 5}),
+    ]
+
+FIELDS = ("price", "amount", "order_type", "xrp_address", "public_key", "expiration", "sequence",
+          "payment_tx_signature", "multisig_destination", "last_ledger_sequence", "signed_tx_json")
+
+def fields(order):
+    return tuple(getattr(order, field) for field in FIELDS)
+
+def levels(order_book):
+    return [[(price, level.total_volume, list(level.orders)) for price, level in side.items()] for side in (order_book.bids, order_book.asks)]
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "book.snap"
+    orders = sample_orders()
+    assert write_snapshot(path, orders, {"segment": 3}) == 3
+
+    snapshot = BookSnapshot(path)
+    assert len(snapshot) == 3
+    assert snapshot.metadata == {"segment": 3}
+    assert [fields(order) for order in snapshot] == [fields(order) for order in orders]
+    assert snapshot[-1].order_type is OrderType.BUY
+    # Repeated strings are stored once and come back as the same object
+    assert snapshot[0].xrp_address is snapshot[2].xrp_address
+    with pytest.raises(IndexError):
+        snapshot[3]
+
+def test_records_and_lazy_signed_tx_json(tmp_path):
+    path = tmp_path / "book.snap"
+    write_snapshot(path, sample_orders())
+    snapshot = BookSnapshot(path)
+
+    # Numeric columns are readable without building orders
+    assert [(record[0], record[1]) for record in snapshot.records()] == [(10050, 5), (10100, 3), (10050, 2)]
+
+    order = snapshot[0]
+    assert isinstance(order, SnapshotOrder)
+    assert order._snapshot is snapshot
+    assert order.signed_tx_json == {"Sequence": 7, "Memos": ["é"]}
+    assert order._snapshot is None
+    order.signed_tx_json = {"Sequence": 8}
+    assert order.signed_tx_json == {"Sequence": 8}
+    assert order.to_dict()["signed_tx_json"] == {"Sequence": 8}
+
+def test_resnapshot_of_restored_book(tmp_path):
+    write_snapshot(tmp_path / "first.snap", sample_orders())
+    order_book = OrderBook()
+    BookSnapshot(tmp_path / "first.snap").restore_into(order_book)
+    assert order_book.bids[10050].total_volume == 7
+    assert [order.sequence for order in order_book.account_orders("rAlice")] == [5, 7]
+
+    order_book.fill_order(order_book.order_map["sig_a"], 1)
+    order_book.order_map["sig_c"].signed_tx_json = {"Sequence": 5, "Fee": "12"}
+    write_snapshot(tmp_path / "second.snap", order_book.order_map.values())
+
+    restored = list(BookSnapshot(tmp_path / "second.snap"))
+    assert [order.amount for order in restored] == [4, 3, 2]
+    assert [order.signed_tx_json for order in restored] == [{"Sequence": 7, "Memos": ["é"]}, None, {"Sequence": 5, "Fee": "12"}]
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "book.snap"
+    path.write_bytes(b"not a snapshot" + bytes(64))
+    with pytest.raises(ValueError):
+        BookSnapshot(path)
+
+def test_restore_rebuilds_the_books_indexes(tmp_path):
+    expiration = int(time.time()) + 300
+    orders = [
+        Order(100, 5, "buy", "rAlice", "pkA", expiration + 2, sequence=9, payment_tx_signature="a9"),
+        Order(101, 4, "sell", "rBob", "pkB", expiration, sequence=3, payment_tx_signature="b3"),
+        Order(100, 3, "buy", "rAlice", "pkA", expiration, sequence=4, payment_tx_signature="a4"),
+        Order(99, 2, "buy", "rCarol", "pkC", expiration + 1, payment_tx_signature="c"),
+        Order(101, 1, "sell", "rBob", "pkB", expiration, sequence=2, payment_tx_signature="b2"),
+    ]
+    write_snapshot(tmp_path / "book.snap", orders)
+    restored = OrderBook()
+    BookSnapshot(tmp_path / "book.snap").restore_into(restored)
+    added = OrderBook()
+    for order in orders:
+        added.add_order(order)
+
+    assert levels(restored) == levels(added)
+    assert list(restored.order_map) == list(added.order_map)
+    assert {address: [order.payment_tx_signature for order in account] for address, account in restored.accounts.items()} == \
+        {address: [order.payment_tx_signature for order in account] for address, account in added.accounts.items()}
+    far_future = expiration + 10
+    assert [order.payment_tx_signature for order in restored.expirations.pop_expired(far_future, restored.is_live)] == \
+        [order.payment_tx_signature for order in added.expirations.pop_expired(far_future, added.is_live)]
+    assert fields(restored.order_map["a9"]) == fields(orders[0])
+
+def test_restored_orders_load_on_first_use(tmp_path):
+    write_snapshot(tmp_path / "book.snap", sample_orders())
+    order_book = OrderBook()
+    BookSnapshot(tmp_path / "book.snap").restore_into(order_book)
+
+    order = order_book.order_map["sig_a"]
+    with pytest.raises(AttributeError):
+        SnapshotOrder._blob_offset.__get__(order)
+    order.matched_amount = 2
+    assert order.amount == 5
+    # Loading fills in the record without touching fields already written
+    assert order.matched_amount == 2
+    assert fields(order) == fields(sample_orders()[0])
+    with pytest.raises(AttributeError):
+        order.no_such_field
+
+def test_signatures_with_newlines_and_none(tmp_path):
+    orders = sample_orders()
+    orders[0].payment_tx_signature = "line\nbreak"
+    orders[1].payment_tx_signature = None
+    orders[2].payment_tx_signature = ""
+    write_snapshot(tmp_path / "book.snap", orders)
+    snapshot = BookSnapshot(tmp_path / "book.snap")
+
+    assert snapshot.signatures() == ["line\nbreak", None, ""]
+    assert [order.payment_tx_signature for order in snapshot] == ["line\nbreak", None, ""]
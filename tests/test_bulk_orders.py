@@ -0,0 +1,68 @@
+from unittest.mock import Mock
+import pytest
+from starlette.testclient import TestClient
+from xrpl.wallet import Wallet
+from api import API
+from asgi_api import AsyncAPI
+from order_book import OrderBook
+from tests.conftest import order_request, signed_payment
+
+@pytest.fixture(params=["flask", "asgi"])
+def client(request, xrpl_integration):
+    if request.param == "flask":
+        api = API(OrderBook(), Mock(), xrpl_integration)
+        client = api.app.test_client()
+        client.get_json = lambda response: response.json
+    else:
+        api = AsyncAPI(OrderBook(), Mock(), xrpl_integration)
+        client = TestClient(api.app)
+        client.get_json = lambda response: response.json()
+    client.api = api
+    client.lookups = xrpl_integration.get_account_sequence if request.param == "flask" else xrpl_integration.get_account_sequence_async
+    client.verifications = xrpl_integration.verify_payment_signatures if request.param == "flask" else xrpl_integration.verify_payment_signatures_async
+    return client
+
+def ladder(wallet, levels):
+    orders = []
+    for sequence in range(1, levels + 1):
+        data = order_request(wallet, signed_payment(wallet, sequence).to_xrpl())
+        data.update(price=f"{1 + sequence / 100:.2f}", sequence=sequence)
+        orders.append(data)
+    return orders
+
+def test_ladder_in_one_round_trip(client):
+    alice, bob = Wallet.create(), Wallet.create()
+    orders = ladder(alice, 10) + ladder(bob, 5)
+
+    response = client.post("/place_orders", json={"orders": orders})
+    body = client.get_json(response)
+    assert response.status_code == 200
+    assert [result["code"] for result in body["results"]] == [200] * 15
+    assert len(client.api.order_book.order_map) == 15
+    assert len(client.api.order_book.bids) == 10
+
+    # One lookup per account and one verification batch for the whole request
+    assert sorted(call.args[0] for call in client.lookups.call_args_list) == sorted([alice.classic_address, bob.classic_address])
+    assert client.verifications.call_count == 1
+
+def test_per_order_results(client):
+    wallet = Wallet.create()
+    good, forged, off_grid, placed = ladder(wallet, 4)
+    forged["public_key"] = Wallet.create().public_key
+    off_grid["price"] = "1.005"
+    client.post("/place_order", json=placed)
+    missing_address = dict(good)
+    del missing_address["xrp_address"]
+
+    response = client.post("/place_orders", json={"orders": [good, forged, off_grid, placed, good, missing_address]})
+    results = client.get_json(response)["results"]
+    assert [result["code"] for result in results] == [200, 400, 400, 200, 409, 400]
+    assert results[1]["message"] == "Invalid payment transaction signature"
+    assert results[3]["message"] == "Order already placed"
+    assert set(client.api.order_book.order_map) == {good["payment_tx_signature"], placed["payment_tx_signature"]}
+
+@pytest.mark.parametrize("body", [{}, {"orders": []}, {"orders": "nope"}])
+def test_malformed_request(client, body):
+    response = client.post("/place_orders", json=body)
+    assert response.status_code == 400
+    assert client.get_json(response)["status"] == "error"
@@ -0,0 +1,60 @@
+import time
+from xrpl_client import XRPLClientPool
+from ledger_tracker import LedgerTracker
+from xrpl_integration import XRPLIntegration
+from tests.stub_xrpl_server import StubXRPLServer
+
+def ledger_handlers(ledger):
+    return {
+        "ledger_current": lambda params: {"ledger_current_index": ledger["validated"] + 1},
+        "ledger": lambda params: {"ledger_index": ledger["validated"], "validated": True},
+    }
+
+def test_tracker_serves_cached_indexes():
+    ledger = {"validated": 100}
+    with StubXRPLServer(ledger_handlers(ledger)) as server:
+        xrpl_integration = XRPLIntegration(XRPLClientPool([server.url]))
+        tracker = xrpl_integration.start_ledger_tracker(poll_interval=60, max_staleness=60)
+        try:
+            for _ in range(50):
+                assert xrpl_integration.get_current_ledger_sequence() == 101
+            assert tracker.get_validated_ledger_index() == 100
+            # Only the initial refresh went to the server
+            assert server.calls["ledger_current"] == 1
+        finally:
+            tracker.stop()
+
+def test_tracker_polls_and_notifies_listeners():
+    ledger = {"validated": 100}
+    closed_ledgers = []
+    with StubXRPLServer(ledger_handlers(ledger)) as server:
+        xrpl_integration = XRPLIntegration(XRPLClientPool([server.url]))
+        tracker = LedgerTracker(xrpl_integration.get_ledger_indexes, poll_interval=0.05)
+        tracker.add_listener(closed_ledgers.append)
+        tracker.start()
+        try:
+            ledger["validated"] = 101
+            deadline = time.monotonic() + 2
+            while tracker.get_current_ledger_index() != 102 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert tracker.get_current_ledger_index() == 102
+            assert closed_ledgers == [100, 101]
+        finally:
+            tracker.stop()
+
+def test_stale_reads_refresh_synchronously():
+    indexes = iter([(11, 10), (13, 12)])
+    tracker = LedgerTracker(lambda: next(indexes), max_staleness=0.05)
+    tracker.refresh()
+    assert tracker.get_current_ledger_index() == 11
+
+    time.sleep(0.1)
+    assert tracker.get_current_ledger_index() == 13
+    assert tracker.staleness() < 0.05
+
+def test_late_responses_never_move_backwards():
+    tracker = LedgerTracker(lambda: (0, 0))
+    tracker.update(21, 20)
+    tracker.update(19, 18)
+    assert tracker.get_current_ledger_index() == 21
+    assert tracker.get_validated_ledger_index() == 20
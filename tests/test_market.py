@@ -0,0 +1,32 @@
+import pytest
+from market import Market
+
+def test_price_ticks_round_trip():
+    market = Market(tick_size="0.01", lot_size=1)
+    assert market.price_to_ticks(100.0) == 10000
+    assert market.price_to_ticks("99.99") == 9999
+    assert market.ticks_to_price(10125) == 101.25
+
+def test_off_grid_price_rejected():
+    market = Market(tick_size="0.05")
+    with pytest.raises(ValueError):
+        market.price_to_ticks(100.01)
+
+@pytest.mark.parametrize("price", ["abc", "", "inf", "-Infinity", "nan", "sNaN"])
+def test_unparseable_and_non_finite_prices_rejected(price):
+    with pytest.raises(ValueError):
+        Market().price_to_ticks(price)
+
+def test_validate_amount():
+    market = Market(lot_size=10)
+    assert market.validate_amount("30") == 30
+    with pytest.raises(ValueError):
+        market.validate_amount(25)
+    with pytest.raises(ValueError):
+        market.validate_amount(0)
+
+def test_quote_amount_rounds_down_to_drops():
+    market = Market(tick_size="0.01")
+    assert market.quote_amount(7, 10000) == 700
+    assert market.quote_amount(3, 33) == 0
+    assert market.quote_amount(100, 33) == 33
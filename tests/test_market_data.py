@@ -0,0 +1,160 @@
+import json
+import time
+from unittest.mock import Mock
+import pytest
+from starlette.testclient import TestClient
+from api import API
+from asgi_api import AsyncAPI
+from market_data import L2BookMirror, MarketDataFeed
+from matching_engine import AuctionResult
+from order_book import OrderBook
+from tests.test_order_book import create_order
+
+@pytest.fixture
+def order_book():
+    return OrderBook()
+
+@pytest.fixture
+def feed(order_book):
+    return MarketDataFeed(order_book, flush_interval=60, replay_buffer=4, max_pending=3)
+
+def messages(subscription):
+    received = []
+    while (message := subscription.get(timeout=0)) is not None:
+        received.append(json.loads(message.text))
+    return received
+
+def test_snapshot_then_deltas_rebuild_the_book(order_book, feed):
+    order_book.add_order(create_order(10000, 5, "buy", "1"))
+    subscription, initial = feed.subscribe()
+    mirror = L2BookMirror()
+    assert [message.sequence for message in initial] == [feed.sequence]
+    assert mirror.apply(initial[0].text)
+
+    second = create_order(10000, 3, "buy", "2")
+    order_book.add_order(second)
+    order_book.add_order(create_order(10100, 4, "sell", "3"))
+    order_book.fill_order(second, 1)
+    feed.flush()
+    feed.flush()  # Nothing changed, so nothing is sent
+
+    order_book.cancel_order("sig_1")
+    order_book.cancel_order("sig_3")
+    feed.publish_auction(AuctionResult(time.time(), 10000, 2, 2))
+
+    received = messages(subscription)
+    assert [message["type"] for message in received] == ["l2_delta", "l2_delta", "auction"]
+    assert received[0]["changes"] == [["bids", 100.0, 7], ["asks", 101.0, 4]]
+    assert received[1]["changes"] == [["bids", 100.0, 2], ["asks", 101.0, 0]]
+    assert received[2]["clearing_price"] == 100.0
+    for message in received:
+        assert mirror.apply(message)
+    assert mirror.l2() == {"bids": [(100.0, 2)], "asks": []}
+    assert len(mirror.auctions) == 1
+
+def test_one_serialization_fans_out(order_book, feed):
+    first, _ = feed.subscribe()
+    second, _ = feed.subscribe()
+    order_book.add_order(create_order(10000, 5, "buy", "1"))
+    feed.flush()
+    assert first.get(timeout=0) is second.get(timeout=0)
+
+def test_gap_detection_and_resync(order_book, feed):
+    subscription, initial = feed.subscribe()
+    mirror = L2BookMirror()
+    mirror.apply(initial[0].text)
+
+    for i in range(4):
+        order_book.add_order(create_order(10000 + i, 1, "buy", str(i)))
+        feed.flush()
+    # More than max_pending behind: the backlog is dropped and the consumer must resync
+    assert subscription.lagged
+    assert subscription.get(timeout=0) is None
+
+    received = [json.loads(message.text) for message in feed.history_since(initial[0].sequence + 2)]
+    assert not mirror.apply(received[0])  # Skipping a message is detected
+
+    snapshot = feed.resync(subscription)
+    assert mirror.apply(snapshot.text)
+    assert mirror.sequence == feed.sequence
+    assert mirror.l2() == {"bids": [(float(f"{100 + i / 100:.2f}"), 1) for i in reversed(range(4))], "asks": []}
+    assert not subscription.lagged
+
+def test_reconnect_replays_from_buffer(order_book, feed):
+    for i in range(3):
+        order_book.add_order(create_order(10000 + i, 1, "buy", str(i)))
+        feed.flush()
+
+    _, initial = feed.subscribe(last_sequence=1)
+    assert [message.sequence for message in initial] == [2, 3]
+    _, initial = feed.subscribe(last_sequence=3)
+    assert initial == []
+
+    for i in range(3, 8):
+        order_book.add_order(create_order(10000 + i, 1, "buy", str(i)))
+        feed.flush()
+    # Too far behind for the replay buffer: start over from a snapshot
+    _, initial = feed.subscribe(last_sequence=1)
+    assert [json.loads(message.text)["type"] for message in initial] == ["snapshot"]
+
+def test_websocket_feed(order_book, feed):
+    api = AsyncAPI(order_book, Mock(), Mock(), feed)
+    with TestClient(api.app) as client, client.websocket_connect("/ws/l2") as websocket:
+        mirror = L2BookMirror()
+        assert mirror.apply(websocket.receive_json())
+
+        order_book.add_order(create_order(10000, 5, "buy", "1"))
+        feed.flush()
+        assert mirror.apply(websocket.receive_json())
+        assert mirror.l2()["bids"] == [(100.0, 5)]
+
+        websocket.send_json({"type": "resync"})
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["sequence"] == mirror.sequence
+
+def test_event_stream(order_book, feed):
+    api = API(order_book, Mock(), Mock(), feed)
+    order_book.add_order(create_order(10000, 5, "buy", "1"))
+    feed.flush()
+
+    events = api.l2_events(last_sequence=0)
+    assert next(events).startswith(b"id: 1\ndata: ")
+    order_book.add_order(create_order(10100, 5, "sell", "2"))
+    feed.flush()
+    event = next(events)
+    assert event.startswith(b"id: 2\n")
+    assert json.loads(event.split(b"data: ")[1])["changes"] == [["asks", 101.0, 5]]
+    events.close()
+    assert len(feed) == 0
+
+def test_l2_cache_serves_one_body_per_version(order_book, monkeypatch):
+    api = API(order_book, Mock(), Mock())
+    client = api.app.test_client()
+    order_book.add_order(create_order(10000, 5, "buy", "1"))
+    order_book.add_order(create_order(10001, 3, "buy", "2"))
+
+    first = client.get("/l2_order_book")
+    assert first.json == {"bids": [[100.01, 3], [100.0, 5]], "asks": []}
+    builds = []
+    monkeypatch.setattr(order_book, "get_l2_order_book", lambda *args: builds.append(args) or {"bids": [], "asks": []})
+    assert client.get("/l2_order_book").data == first.data
+    assert client.get("/l2_order_book", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert builds == []
+
+    order_book.cancel_order("sig_2")
+    assert client.get("/l2_order_book").headers["ETag"] != first.headers["ETag"]
+    assert client.get("/l2_order_book?depth=1&bucket=0.05").status_code == 200
+    assert builds == [(None, None), (1, 5)]
+    assert client.get("/l2_order_book?depth=0").status_code == 400
+    assert client.get("/l2_order_book?bucket=0.001").status_code == 400
+    for bucket in ("abc", "inf", "nan"):
+        assert client.get(f"/l2_order_book?bucket={bucket}").status_code == 400
+
+def test_l2_cache_drops_expired_orders(order_book):
+    order_book.add_order(create_order(10000, 5, "buy", "1", expiration=int(time.time()) + 1))
+    cache = API(order_book, Mock(), Mock()).l2_cache
+    version, body = cache.get()
+    assert json.loads(body)["bids"] == [[100.0, 5]]
+    time.sleep(1.1)
+    assert json.loads(cache.get()[1])["bids"] == []
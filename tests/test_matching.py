@@ -1,7 +1,8 @@
 import pytest
+import threading
 import time
 from unittest.mock import Mock
-from matching_engine import MatchingEngine
+from matching_engine import MatchingEngine, create_matching_engine, allocate_pro_rata
 from order_book import OrderBook, Order
 from xrpl_integration import XRPLIntegration
 from multisig import MultisigWallet
@@ -14,6 +15,7 @@ def order_book():
 def mock_xrpl_integration():
     mock = Mock(spec=XRPLIntegration)
     mock.get_account_sequence.return_value = 1  # Default sequence number
+    mock.fetch_account_sequence.return_value = 1
     mock.submit_transaction.return_value.is_successful.return_value = True
     mock.submit_transaction.return_value.result = {'hash': 'mock_hash'}
     return mock
@@ -22,12 +24,15 @@ def mock_xrpl_integration():
 def mock_multisig_wallet():
     return Mock(spec=MultisigWallet)
 
-@pytest.fixture
-def matching_engine(order_book, mock_xrpl_integration, mock_multisig_wallet):
-    return MatchingEngine(order_book, mock_xrpl_integration, mock_multisig_wallet, batch_interval=1)  # Use a shorter interval for testing
+@pytest.fixture(params=["python", "numpy"])
+def matching_engine(request, order_book, mock_xrpl_integration, mock_multisig_wallet):
+    # Every test runs against both backends, which must agree on prices and fills
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    return create_matching_engine(order_book, mock_xrpl_integration, mock_multisig_wallet, backend=request.param, batch_interval=1)  # Use a shorter interval for testing
 
 def create_order(price, amount, order_type, order_id=None, sequence=None):
-    return Order(price, amount, order_type, f"address_{order_id}", f"pubkey_{order_id}", f"sig_{order_id}", int(time.time()) + 300, sequence=sequence)
+    return Order(price, amount, order_type, f"address_{order_id}", f"pubkey_{order_id}", expiration=int(time.time()) + 300, sequence=sequence, payment_tx_signature=f"sig_{order_id}")
 
 class TestMatchingEngine:
 
@@ -126,8 +131,8 @@ class TestMatchingEngine:
 
     def test_large_order_book(self, matching_engine):
         for i in range(1000):
-            matching_engine.order_book.add_order(create_order(100 + i * 0.01, 1, "buy", f"buy_{i}", sequence=i+1))
-            matching_engine.order_book.add_order(create_order(110 - i * 0.01, 1, "sell", f"sell_{i}", sequence=i+1001))
+            matching_engine.order_book.add_order(create_order(10000 + i, 1, "buy", f"buy_{i}", sequence=i+1))
+            matching_engine.order_book.add_order(create_order(11000 - i, 1, "sell", f"sell_{i}", sequence=i+1001))
 
         matching_engine.match_orders()
 
@@ -140,3 +145,117 @@ class TestMatchingEngine:
         matching_engine.run_batch_auction()
         matching_engine.run_batch_auction()  # This should not run immediately
         assert time.time() - start_time < 2 * matching_engine.batch_interval
+
+    def test_build_curves(self, matching_engine):
+        matching_engine.order_book.add_order(create_order(101, 5, "buy", "1", sequence=1))
+        matching_engine.order_book.add_order(create_order(99, 3, "buy", "2", sequence=2))
+        matching_engine.order_book.add_order(create_order(100, 4, "sell", "3", sequence=3))
+        matching_engine.order_book.add_order(create_order(102, 6, "sell", "4", sequence=4))
+
+        curves = matching_engine.build_curves(matching_engine.order_book.bids, matching_engine.order_book.asks)
+
+        assert list(curves.prices) == [99, 100, 101, 102]
+        assert list(curves.cumulative_demand) == [8, 5, 5, 0]
+        assert list(curves.cumulative_supply) == [0, 4, 4, 10]
+        assert curves.volumes_at(101) == (5, 4)
+        assert curves.volumes_at(98) == (0, 0)
+
+    def test_clearing_price_tie_break(self, matching_engine):
+        matching_engine.order_book.add_order(create_order(103, 5, "buy", "1", sequence=1))
+        matching_engine.order_book.add_order(create_order(100, 5, "sell", "2", sequence=2))
+        demand = matching_engine.order_book.bids
+        supply = matching_engine.order_book.asks
+
+        # Volume is 5 at both 100 and 103; without a previous price the lowest wins
+        assert matching_engine.find_clearing_price(demand, supply) == (100, 5)
+
+        # Otherwise the price closest to the last clearing price wins
+        matching_engine.last_clearing_price = 104
+        assert matching_engine.find_clearing_price(demand, supply) == (103, 5)
+
+def test_backends_agree(mock_xrpl_integration, mock_multisig_wallet):
+    pytest.importorskip("numpy")
+    import random
+    rng = random.Random(7)
+    specs = [(rng.randint(95, 105), rng.randint(1, 50), rng.choice(["buy", "sell"])) for _ in range(500)]
+
+    results = []
+    for backend in ("python", "numpy"):
+        book = OrderBook()
+        for i, (price, amount, order_type) in enumerate(specs):
+            book.add_order(create_order(price, amount, order_type, str(i), sequence=i))
+        engine = create_matching_engine(book, mock_xrpl_integration, mock_multisig_wallet, backend=backend)
+        curves = engine.build_curves(book.bids, book.asks)
+        clearing_price, max_volume = engine.find_clearing_price(book.bids, book.asks, curves)
+        total_demand, total_supply = curves.volumes_at(clearing_price)
+        fills = engine.pro_rata_match(book.columns("buy", clearing_price), max_volume, total_demand)
+        fills += engine.pro_rata_match(book.columns("sell", clearing_price), max_volume, total_supply)
+        results.append((clearing_price, max_volume, [(order.payment_tx_signature, filled) for order, filled in fills]))
+
+    (python_price, python_volume, python_fills), (numpy_price, numpy_volume, numpy_fills) = results
+    assert python_price == numpy_price
+    assert python_volume == numpy_volume
+    assert python_fills == numpy_fills
+
+def test_allocate_pro_rata():
+    # 10 drops over 3 equal orders: one drop of remainder goes to the earliest order
+    assert allocate_pro_rata([5, 5, 5], 10) == [4, 3, 3]
+    # Largest remainder wins before arrival order
+    assert allocate_pro_rata([2, 3, 5], 6) == [1, 2, 3]
+    assert allocate_pro_rata([2, 3], 5) == [2, 3]
+    # Whole lots only
+    assert allocate_pro_rata([30, 30, 40], 50, lot_size=10) == [20, 10, 20]
+    assert sum(allocate_pro_rata([7, 11, 13, 17], 23)) == 23
+
+def test_integer_fills_leave_no_dust(matching_engine):
+    for i in range(3):
+        matching_engine.order_book.add_order(create_order(100, 5, "buy", f"b{i}", sequence=i))
+    matching_engine.order_book.add_order(create_order(100, 10, "sell", "s", sequence=3))
+
+    matching_engine.match_orders()
+
+    assert [order.amount for order in matching_engine.order_book.bids[100]] == [1, 2, 2]
+    assert all(isinstance(order.amount, int) for order in matching_engine.order_book.bids[100])
+    assert 100 not in matching_engine.order_book.asks
+
+def test_settlement_spends_lower_sequences(matching_engine):
+    order_book = matching_engine.order_book
+    spent = Order(95, 10, "buy", "rAlice", "pk", expiration=int(time.time()) + 300, sequence=3, payment_tx_signature="a3")
+    matched = Order(100, 10, "buy", "rAlice", "pk", expiration=int(time.time()) + 300, sequence=4, payment_tx_signature="a4")
+    later = Order(90, 10, "buy", "rAlice", "pk", expiration=int(time.time()) + 300, sequence=5, payment_tx_signature="a5")
+    for order in (spent, matched, later):
+        order_book.add_order(order)
+    order_book.add_order(create_order(100, 10, "sell", "2", sequence=1))
+
+    matching_engine.match_orders()
+
+    # Settling sequence 4 means sequence 3 can never apply; 5 still can
+    assert [order.sequence for order in order_book.account_orders("rAlice")] == [5]
+    assert set(order_book.order_map) == {"a5"}
+
+def test_settlement_runs_without_the_book_lock(matching_engine):
+    order_book = matching_engine.order_book
+    order_book.add_order(create_order(100, 10, "buy", "1", sequence=1))
+    order_book.add_order(create_order(100, 10, "sell", "2", sequence=2))
+    settling = threading.Event()
+    release = threading.Event()
+
+    def slow_settlement(orders):
+        settling.set()
+        release.wait(5)
+        return True
+    matching_engine.settlement.process_matched_orders = slow_settlement
+
+    auction = threading.Thread(target=matching_engine.run_auction, daemon=True)
+    auction.start()
+    assert settling.wait(5)
+
+    # Order entry is not held up by the ledger round trips
+    started = time.monotonic()
+    with order_book.lock:
+        order_book.add_order(create_order(101, 10, "buy", "3", sequence=3))
+    assert time.monotonic() - started < 0.5
+
+    release.set()
+    auction.join(5)
+    assert set(order_book.order_map) == {"sig_3"}
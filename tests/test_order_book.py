@@ -0,0 +1,213 @@
+import pytest
+import time
+from order_book import OrderBook, Order, OrderType
+
+@pytest.fixture
+def order_book():
+    return OrderBook()
+
+def create_order(price, amount, order_type, order_id=None, sequence=None, expiration=None):
+    return Order(price, amount, order_type, f"address_{order_id}", f"pubkey_{order_id}",
+                 expiration=expiration if expiration is not None else int(time.time()) + 300,
+                 sequence=sequence, payment_tx_signature=f"sig_{order_id}")
+
+class TestOrderBook:
+
+    def test_level_aggregates(self, order_book):
+        first = create_order(100, 6, "buy", "1")
+        second = create_order(100, 4, "buy", "2")
+        order_book.add_order(first)
+        order_book.add_order(second)
+
+        assert order_book.bids[100].total_volume == 10
+        assert order_book.bids[100].order_count == 2
+
+        order_book.fill_order(first, 5)
+        assert first.amount == 1
+        assert order_book.bids[100].total_volume == 5
+
+        order_book.remove_order(second)
+        assert order_book.bids[100].total_volume == 1
+        assert order_book.bids[100].order_count == 1
+
+        order_book.remove_order(first)
+        assert 100 not in order_book.bids
+
+    def test_l2_order_book(self, order_book):
+        # Prices are stored as ticks of 0.01 and reported as decimal prices
+        order_book.add_order(create_order(9900, 2, "buy", "1"))
+        order_book.add_order(create_order(10000, 3, "buy", "2"))
+        order_book.add_order(create_order(10000, 1, "buy", "3"))
+        order_book.add_order(create_order(10250, 5, "sell", "4"))
+        order_book.add_order(create_order(10125, 7, "sell", "5"))
+
+        assert order_book.get_l2_order_book() == {
+            "bids": [(100.0, 4), (99.0, 2)],
+            "asks": [(101.25, 7), (102.5, 5)],
+        }
+
+    def test_clean_expired_orders(self, order_book):
+        current_time = int(time.time())
+        order_book.add_order(create_order(100, 6, "buy", "1", expiration=current_time - 1))
+        order_book.add_order(create_order(100, 4, "buy", "2"))
+        order_book.add_order(create_order(101, 5, "sell", "3", expiration=current_time - 1))
+
+        order_book.clean_expired_orders()
+
+        assert order_book.bids[100].total_volume == 4
+        assert 101 not in order_book.asks
+        assert set(order_book.order_map) == {"sig_2"}
+
+    def test_best_prices_and_ordering(self, order_book):
+        assert order_book.best_bid() is None
+        assert order_book.best_ask() is None
+
+        for i, price in enumerate([99, 101, 100]):
+            order_book.add_order(create_order(price, 1, "buy", f"b{i}"))
+            order_book.add_order(create_order(price + 5, 1, "sell", f"s{i}"))
+
+        assert order_book.best_bid() == 101
+        assert order_book.best_ask() == 104
+        assert list(order_book.bids) == [101, 100, 99]
+        assert list(order_book.asks) == [104, 105, 106]
+
+        order_book.remove_order(order_book.bids[101][0])
+        assert order_book.best_bid() == 100
+        assert list(order_book.bids.ascending_prices()) == [99, 100]
+
+    def test_expiration_index(self, order_book):
+        current_time = int(time.time())
+        soon = create_order(100, 1, "buy", "1", expiration=current_time + 10)
+        later = create_order(100, 1, "buy", "2", expiration=current_time + 20)
+        removed = create_order(101, 1, "sell", "3", expiration=current_time + 5)
+        for order in (later, soon, removed):
+            order_book.add_order(order)
+
+        order_book.remove_order(removed)
+        assert order_book.next_expiry() == current_time + 10
+
+        assert order_book.clean_expired_orders(current_time + 9) == []
+        assert order_book.clean_expired_orders(current_time + 15) == [soon]
+        assert order_book.next_expiry() == current_time + 20
+        assert set(order_book.order_map) == {"sig_2"}
+
+        order_book.remove_order(later)
+        assert order_book.next_expiry() is None
+
+    def test_level_queue_keeps_arrival_order(self, order_book):
+        orders = [create_order(100, i + 1, "buy", str(i)) for i in range(5)]
+        for order in orders:
+            order_book.add_order(order)
+
+        assert order_book.cancel_order("sig_2") is orders[2]
+        assert order_book.cancel_order("sig_unknown") is None
+        order_book.fill_order(orders[3], 2)
+
+        level = order_book.bids[100]
+        assert list(level) == [orders[0], orders[1], orders[3], orders[4]]
+        assert level[0] is orders[0]
+        assert level[-1] is orders[4]
+        assert level.get("sig_3").amount == 2
+        assert level.total_volume == 1 + 2 + 2 + 5
+
+    def test_compact_order(self):
+        order = create_order(100, 5, "sell", "1")
+
+        assert not hasattr(order, "__dict__")
+        assert order.order_type is OrderType.SELL
+        assert order.order_type == "sell"
+        assert order.to_dict()["payment_tx_signature"] == "sig_1"
+        with pytest.raises(ValueError):
+            create_order(100, 5, "hold", "2")
+
+    def test_columnar_view(self, order_book):
+        order_book.add_order(create_order(99, 2, "buy", "1"))
+        order_book.add_order(create_order(100, 3, "buy", "2"))
+        order_book.add_order(create_order(100, 1, "buy", "3"))
+
+        columns = order_book.columns("buy")
+
+        assert len(columns) == 3
+        assert list(columns.price) == [100, 100, 99]
+        assert list(columns.amount) == [3, 1, 2]
+        assert list(columns.last_ledger_sequence) == [0, 0, 0]
+        assert [order.payment_tx_signature for order in columns.orders] == ["sig_2", "sig_3", "sig_1"]
+
+        # Only levels at or better than a limit price
+        assert list(order_book.columns("buy", 100).amount) == [3, 1]
+        assert len(order_book.columns("sell", 100)) == 0
+
+    def test_duplicate_order_rejected(self, order_book):
+        order_book.add_order(create_order(100, 5, "buy", "1"))
+        with pytest.raises(ValueError):
+            order_book.add_order(create_order(100, 5, "buy", "1"))
+        assert order_book.bids[100].total_volume == 5
+
+    def test_version_bumps_on_every_mutation(self, order_book):
+        order = create_order(100, 5, "buy", "1")
+        order_book.add_order(order)
+        order_book.fill_order(order, 2)
+        order_book.remove_order(order)
+        assert order_book.version == 3
+
+    def test_l2_depth_and_buckets(self, order_book):
+        for i, price in enumerate([10001, 10004, 10009, 10012, 9998]):
+            order_book.add_order(create_order(price, 1 + i, "buy", f"b{i}"))
+            order_book.add_order(create_order(price + 100, 1 + i, "sell", f"s{i}"))
+
+        assert order_book.get_l2_order_book(depth=2) == {
+            "bids": [(100.12, 4), (100.09, 3)],
+            "asks": [(100.98, 5), (101.01, 1)],
+        }
+        # Buckets of 5 ticks: bids round down, asks round up
+        assert order_book.get_l2_order_book(bucket=5) == {
+            "bids": [(100.1, 4), (100.05, 3), (100.0, 3), (99.95, 5)],
+            "asks": [(101.0, 5), (101.05, 3), (101.1, 3), (101.15, 4)],
+        }
+        assert order_book.get_l2_order_book(depth=1, bucket=10) == {
+            "bids": [(100.1, 4)],
+            "asks": [(101.0, 5)],
+        }
+
+    def test_account_index(self, order_book):
+        orders = [Order(100 + i, 1, "buy", "rAlice", "pk", expiration=int(time.time()) + 300, sequence=sequence, payment_tx_signature=f"a{sequence}")
+                  for i, sequence in enumerate([7, 3, 5, 9])]
+        for order in orders:
+            order_book.add_order(order)
+        order_book.add_order(create_order(100, 1, "sell", "bob", sequence=1))
+        assert [order.sequence for order in order_book.account_orders("rAlice")] == [3, 5, 7, 9]
+
+        order_book.cancel_order("a5")
+        assert [order.sequence for order in order_book.account_orders("rAlice")] == [3, 7, 9]
+
+        # Sequence 7 is now the account's next: everything below it is spent
+        assert [order.sequence for order in order_book.invalidate_below("rAlice", 7)] == [3]
+        assert "a3" not in order_book.order_map
+        assert 101 not in order_book.bids
+
+        assert [order.sequence for order in order_book.cancel_account("rAlice")] == [7, 9]
+        assert order_book.account_orders("rAlice") == []
+        assert "rAlice" not in order_book.accounts
+        assert list(order_book.order_map) == ["sig_bob"]
+        assert order_book.invalidate_below("rAlice", 100) == []
+
+    def test_restore_matches_add_order(self, order_book):
+        def orders():
+            # Four accounts, sequences arriving out of order, shared price levels
+            return [Order(100 + i % 3, 1 + i, "buy" if i % 2 else "sell", f"r{i % 4}", "pk", expiration=int(time.time()) + 300 - i,
+                          sequence=10 - i, payment_tx_signature=f"sig_{i}") for i in range(10)]
+        for order in orders():
+            order_book.add_order(order)
+        restored = OrderBook()
+        restored.restore(orders())
+
+        def levels(side):
+            return [(price, level.total_volume, [order.payment_tx_signature for order in level]) for price, level in side.items()]
+        assert levels(restored.bids) == levels(order_book.bids)
+        assert levels(restored.asks) == levels(order_book.asks)
+        assert {address: [order.sequence for order in account] for address, account in restored.accounts.items()} == \
+               {address: [order.sequence for order in account] for address, account in order_book.accounts.items()}
+        assert restored.next_expiry() == order_book.next_expiry()
+
+        with pytest.raises(ValueError):
+            restored.restore([create_order(100, 1, "buy", "new")])
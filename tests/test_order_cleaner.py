@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+import order_cleaner
+from order_book import OrderBook, Order
+from order_cleaner import OrderCleaner
+from xrpl_client import XRPLClientPool
+from xrpl_integration import XRPLIntegration
+from tests.stub_xrpl_server import StubXRPLServer
+
+def create_order(address, sequence, last_ledger_sequence=None):
+    return Order(100, 1, "buy", address, "pk", expiration=int(time.time()) + 300, sequence=sequence,
+                 payment_tx_signature=f"{address}_{sequence}", last_ledger_sequence=last_ledger_sequence)
+
+def book_with(*orders):
+    order_book = OrderBook()
+    for order in orders:
+        order_book.add_order(order)
+    return order_book
+
+class InFlight:
+    """account_info handler that answers slowly and records peak concurrency."""
+
+    def __init__(self, sequences, delay=0.1):
+        self.sequences = sequences
+        self.delay = delay
+        self.current = 0
+        self.peak = 0
+        self.order = []
+        self._lock = threading.Lock()
+
+    def __call__(self, params):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+            self.order.append(params["account"])
+        time.sleep(self.delay)
+        with self._lock:
+            self.current -= 1
+        return {"account_data": {"Account": params["account"], "Sequence": self.sequences[params["account"]]}}
+
+def test_revalidation_is_bounded_and_concurrent():
+    addresses = [f"r{i}" for i in range(8)]
+    order_book = book_with(*(create_order(address, sequence) for address in addresses for sequence in (1, 2)))
+    account_info = InFlight({address: 2 for address in addresses})
+    handlers = {"account_info": account_info, "ledger_current": lambda params: {"ledger_current_index": 100}}
+
+    with StubXRPLServer(handlers) as server:
+        pool = XRPLClientPool([server.url])
+        try:
+            cleaner = OrderCleaner(order_book, XRPLIntegration(pool), concurrency=4)
+            start = time.perf_counter()
+            removed = cleaner.revalidate()
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.close()
+
+    assert sorted(order.payment_tx_signature for order in removed) == [f"{address}_1" for address in addresses]
+    assert all(order_book.account_orders(address)[0].sequence == 2 for address in addresses)
+    assert account_info.peak == 4
+    # Two waves of four, not eight serial round trips
+    assert elapsed < 8 * account_info.delay
+
+def test_only_accounts_with_resting_orders_are_checked():
+    order_book = book_with(create_order("rAlice", 1), create_order("rBob", 1))
+    order_book.cancel_account("rBob")
+    account_info = InFlight({"rAlice": 1}, delay=0)
+    handlers = {"account_info": account_info, "ledger_current": lambda params: {"ledger_current_index": 100}}
+
+    with StubXRPLServer(handlers) as server:
+        pool = XRPLClientPool([server.url])
+        try:
+            assert OrderCleaner(order_book, XRPLIntegration(pool)).revalidate() == []
+        finally:
+            pool.close()
+    assert account_info.order == ["rAlice"]
+
+def test_urgent_accounts_first_and_expired_orders_dropped():
+    order_book = book_with(
+        create_order("rLater", 1, last_ledger_sequence=500),
+        create_order("rNone", 1),
+        create_order("rSoon", 1, last_ledger_sequence=120),
+        create_order("rSoon", 2, last_ledger_sequence=400),
+        create_order("rGone", 1, last_ledger_sequence=90),
+        create_order("rGone", 2),
+    )
+    account_info = InFlight({"rLater": 1, "rNone": 1, "rSoon": 1, "rGone": 1}, delay=0)
+    handlers = {"account_info": account_info, "ledger_current": lambda params: {"ledger_current_index": 100}}
+
+    with StubXRPLServer(handlers) as server:
+        pool = XRPLClientPool([server.url])
+        try:
+            removed = OrderCleaner(order_book, XRPLIntegration(pool), concurrency=1).revalidate()
+        finally:
+            pool.close()
+
+    # rGone's first order is past its LastLedgerSequence and leaves without a lookup
+    assert [order.payment_tx_signature for order in removed] == ["rGone_1"]
+    assert account_info.order == ["rSoon", "rLater", "rNone", "rGone"]
+
+def test_stream_transaction_spends_lower_sequences():
+    order_book = book_with(create_order("rAlice", 3), create_order("rAlice", 4), create_order("rAlice", 6))
+    cleaner = OrderCleaner(order_book, xrpl_integration=None)
+
+    def transaction(sequence, validated=True):
+        return {"type": "transaction", "validated": validated, "tx_json": {"Account": "rAlice", "Sequence": sequence}}
+
+    assert cleaner.on_transaction(transaction(4, validated=False)) == []
+    assert cleaner.on_transaction({"type": "ledgerClosed", "ledger_index": 101}) == []
+    # Ticketed transactions carry Sequence 0 and leave the account sequence alone
+    assert cleaner.on_transaction(transaction(0)) == []
+
+    assert [order.sequence for order in cleaner.on_transaction(transaction(4))] == [3, 4]
+    assert [order.sequence for order in order_book.account_orders("rAlice")] == [6]
+    assert cleaner.on_transaction({"type": "transaction", "validated": True,
+                                   "transaction": {"Account": "rBob", "Sequence": 9}}) == []
+
+class ScriptedStream:
+    """AsyncWebsocketClient stand-in. Each connection sends one message, then ends as its script says."""
+
+    def __init__(self, endings):
+        self.endings = endings
+        self.connections = 0
+
+    def __call__(self, url):
+        self.connections += 1
+        return _ScriptedConnection(self.connections, self.endings[self.connections - 1] if self.connections <= len(self.endings) else "open")
+
+class _ScriptedConnection:
+    def __init__(self, sequence, ending):
+        self.sequence = sequence
+        self.ending = ending
+        self.open = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.open = False
+
+    def is_open(self):
+        return self.open
+
+    async def send(self, request):
+        pass
+
+    async def __aiter__(self):
+        yield {"type": "transaction", "validated": True, "tx_json": {"Account": "rAlice", "Sequence": self.sequence}}
+        if self.ending == "error":
+            raise ConnectionResetError("reset by peer")
+        if self.ending == "dropped":
+            self.open = False
+        # Like the real client, a reader on a dead connection waits forever
+        await asyncio.Event().wait()
+
+def test_stream_reconnects_when_the_connection_fails(monkeypatch):
+    order_book = book_with(*(create_order("rAlice", sequence) for sequence in range(1, 5)))
+    stream = ScriptedStream(["error", "dropped"])
+    monkeypatch.setattr(order_cleaner, "AsyncWebsocketClient", stream)
+    cleaner = OrderCleaner(order_book, xrpl_integration=None, interval=3600, stream_url="ws://stream", stream_sync_interval=0.01)
+
+    cleaner.start()
+    try:
+        deadline = time.monotonic() + 2
+        while stream.connections < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+    finally:
+        cleaner.stop()
+
+    # The account set never changed, yet both the failed reader and the dropped connection were replaced
+    assert stream.connections == 3
+    assert [order.sequence for order in order_book.account_orders("rAlice")] == [4]
@@ -0,0 +1,161 @@
+import time
+from unittest.mock import Mock
+import pytest
+from xrpl.wallet import Wallet
+from api import API
+from matching_engine import MatchingEngine
+from order_book import OrderBook
+from order_flow import OrderFlowRecorder, ReplayMultisigWallet, ReplayXRPLIntegration, load_order_flow, replay
+from tests.conftest import signed_payment
+
+def order_request(wallet, sequence, price, order_type, expiration=None, last_ledger_sequence=1000):
+    signed_tx_json = signed_payment(wallet, sequence).to_xrpl()
+    return {
+        "price": price, "amount_drops": 1000000 * sequence, "order_type": order_type,
+        "xrp_address": wallet.classic_address, "public_key": wallet.public_key,
+        "expiration": expiration if expiration is not None else int(time.time()) + 300, "sequence": sequence,
+        "payment_tx_signature": signed_tx_json["TxnSignature"],
+        "multisig_destination": "rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+        "last_ledger_sequence": last_ledger_sequence,
+        "signed_tx_json": signed_tx_json,
+    }
+
+@pytest.fixture
+def recording(tmp_path):
+    """Run a small production-like session with a recorder attached; returns the events."""
+    order_book = OrderBook()
+    xrpl_integration = ReplayXRPLIntegration()
+    xrpl_integration.current_ledger = 500
+    matching_engine = MatchingEngine(order_book, xrpl_integration, ReplayMultisigWallet())
+    admission = Mock()
+    admission.get_account_sequence.return_value = 1
+    admission.verify_payment_signature.return_value = True
+    api = API(order_book, matching_engine, admission)
+
+    recorder = OrderFlowRecorder(tmp_path / "flow.jsonl")
+    order_book.recorder = recorder
+    matching_engine.add_auction_listener(recorder.record_auction)
+    matching_engine.add_settlement_listener(recorder.record_settlement)
+
+    buyer, seller, late = Wallet.create(), Wallet.create(), Wallet.create()
+    requests = [
+        order_request(buyer, 1, "1.02", "buy"),
+        order_request(seller, 1, "0.99", "sell"),
+        order_request(seller, 2, "1.01", "sell"),
+        # Already expired when the auction runs, so it must not cross in replay either
+        order_request(late, 1, "1.50", "buy", expiration=int(time.time()) - 5),
+    ]
+    for data in requests:
+        assert api.place_order(data)[1] == 200
+    # A client retry is answered from the book and never reaches it again
+    assert api.place_order(requests[0])[0]["message"] == "Order already placed"
+    matching_engine.run_auction()
+
+    assert api.place_order(order_request(buyer, 2, "1.01", "buy"))[1] == 200
+    xrpl_integration.current_ledger = 600
+    matching_engine.run_auction()
+    recorder.close()
+    return load_order_flow(tmp_path / "flow.jsonl")
+
+def test_recording(recording):
+    # The expired order comes off before the first auction; filled orders after each settlement
+    assert [event["type"] for event in recording] == (
+        ["order"] * 4 + ["remove", "auction", "remove", "remove", "settlement", "order", "auction", "remove", "remove", "settlement"])
+    assert [(event["auction"], event["settled"]) for event in recording if event["type"] == "settlement"] == [(0, True), (1, True)]
+    assert [event["ledger"] for event in recording if event["type"] == "auction"] == [500, 600]
+    assert recording[5]["fills"] > 0
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+def test_replay_reproduces_recorded_auctions(recording, backend):
+    report = replay(recording, backend=backend)
+    assert report.orders == 5
+    assert report.auctions == 2
+    assert report.mismatches == 0
+    assert report.fills == sum(event["fills"] for event in recording if event["type"] == "auction")
+    assert report.volume == sum(event["volume"] for event in recording if event["type"] == "auction")
+    assert len(report.auction_seconds) == 2
+    assert report.auction_latency(0.99) == max(report.auction_seconds)
+
+    # Deterministic: a second run gives the same outcome
+    assert replay(recording, backend=backend)[:6] == report[:6]
+
+class SlowSettlementXRPL(ReplayXRPLIntegration):
+    """Every submission waits out a few ledgers, moving the book clock and ledger index on."""
+
+    def __init__(self, order_book):
+        super().__init__()
+        self.order_book = order_book
+        self.now = time.time()
+        order_book.clock = lambda: self.now
+
+    def submit_transaction(self, transaction):
+        self.now += 20
+        self.current_ledger += 5
+        return super().submit_transaction(transaction)
+
+def test_auction_recorded_as_of_its_start(tmp_path):
+    order_book = OrderBook()
+    xrpl_integration = SlowSettlementXRPL(order_book)
+    xrpl_integration.current_ledger = 500
+    matching_engine = MatchingEngine(order_book, xrpl_integration, ReplayMultisigWallet())
+    admission = Mock()
+    admission.get_account_sequence.return_value = 1
+    admission.verify_payment_signature.return_value = True
+    api = API(order_book, matching_engine, admission)
+    recorder = OrderFlowRecorder(tmp_path / "flow.jsonl")
+    order_book.recorder = recorder
+    matching_engine.add_auction_listener(recorder.record_auction)
+    matching_engine.add_settlement_listener(recorder.record_settlement)
+
+    # Both legs are live when the auction starts, but settling it outlasts the buy's
+    # expiration and the sell's LastLedgerSequence
+    buyer, seller = Wallet.create(), Wallet.create()
+    started = xrpl_integration.now
+    assert api.place_order(order_request(buyer, 1, "1.00", "buy", expiration=int(started) + 30))[1] == 200
+    assert api.place_order(order_request(seller, 1, "1.00", "sell", last_ledger_sequence=505))[1] == 200
+    result = matching_engine.match_orders()
+    recorder.close()
+
+    assert result.fill_count == 2
+    assert (result.timestamp, result.ledger) == (started, 500)
+    assert xrpl_integration.current_ledger > 505 and xrpl_integration.now > started + 30
+    events = load_order_flow(tmp_path / "flow.jsonl")
+    auction = next(event for event in events if event["type"] == "auction")
+    assert (auction["time"], auction["ledger"]) == (started, 500)
+    assert replay(events).mismatches == 0
+
+def test_replay_reproduces_removals_and_failed_settlements(tmp_path):
+    order_book = OrderBook()
+    xrpl_integration = ReplayXRPLIntegration()
+    matching_engine = MatchingEngine(order_book, xrpl_integration, ReplayMultisigWallet())
+    admission = Mock()
+    admission.get_account_sequence.return_value = 1
+    admission.verify_payment_signature.return_value = True
+    api = API(order_book, matching_engine, admission)
+    recorder = OrderFlowRecorder(tmp_path / "flow.jsonl")
+    order_book.recorder = recorder
+    matching_engine.add_auction_listener(recorder.record_auction)
+    matching_engine.add_settlement_listener(recorder.record_settlement)
+
+    buyer, seller, stale, late = Wallet.create(), Wallet.create(), Wallet.create(), Wallet.create()
+    for data in [order_request(seller, 1, "1.00", "sell"), order_request(seller, 2, "1.00", "sell"),
+                 order_request(buyer, 1, "1.00", "buy"), order_request(stale, 1, "1.20", "buy")]:
+        assert api.place_order(data)[1] == 200
+    # As OrderCleaner does once the account's ledger sequence moves on
+    with order_book.lock:
+        order_book.invalidate_below(stale.classic_address, 2)
+
+    # A failed settlement leaves the seller's lower sequence on the book for the next auction
+    xrpl_integration.succeed = False
+    matching_engine.match_orders()
+    xrpl_integration.succeed = True
+    assert api.place_order(order_request(late, 1, "1.00", "buy"))[1] == 200
+    matching_engine.match_orders()
+    recorder.close()
+
+    events = load_order_flow(tmp_path / "flow.jsonl")
+    assert [event["settled"] for event in events if event["type"] == "settlement"] == [False, True]
+    assert replay(events).mismatches == 0
+    # Both the removal and the failure change what the second auction sees
+    assert replay([event for event in events if event["type"] != "remove"]).mismatches > 0
+    assert replay([event for event in events if event["type"] != "settlement"]).mismatches > 0
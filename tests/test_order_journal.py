@@ -0,0 +1,134 @@
+import os
+import time
+import pytest
+from matching_engine import AuctionResult
+from order_book import OrderBook, Order
+from order_journal import OrderJournal
+
+def create_order(order_id, price=100, amount=10, order_type="buy", address="rAlice", sequence=None):
+    return Order(price, amount, order_type, address, "pk", expiration=int(time.time()) + 300,
+                 sequence=sequence, payment_tx_signature=f"sig_{order_id}",
+                 signed_tx_json={"TxnSignature": f"sig_{order_id}", "Sequence": sequence})
+
+def book_state(order_book):
+    return {
+        "orders": [(order.payment_tx_signature, order.price, order.amount, order.sequence, order.signed_tx_json)
+                   for order in order_book.order_map.values()],
+        "bids": [(price, level.total_volume, [order.payment_tx_signature for order in level]) for price, level in order_book.bids.items()],
+        "asks": [(price, level.total_volume, [order.payment_tx_signature for order in level]) for price, level in order_book.asks.items()],
+        "accounts": {address: [order.payment_tx_signature for order in orders] for address, orders in order_book.accounts.items()},
+    }
+
+def recovered(directory):
+    order_book = OrderBook()
+    journal = OrderJournal(order_book, directory, snapshot_interval=None)
+    return order_book, journal.recover()
+
+def test_journal_replays_mutations(tmp_path):
+    order_book = OrderBook()
+    journal = OrderJournal(order_book, tmp_path, snapshot_interval=None)
+    journal.start()
+    for i in range(6):
+        order_book.add_order(create_order(i, price=100 + i % 2, order_type="buy" if i < 4 else "sell", sequence=i + 1))
+    order_book.fill_order(order_book.order_map["sig_1"], 4)
+    order_book.cancel_order("sig_2")
+    order_book.invalidate_below("rAlice", 2)
+    journal.record_auction(AuctionResult(1700000000.0, 101, 6, 2))
+    journal.stop()
+
+    order_book_copy, last_auction = recovered(tmp_path)
+    assert book_state(order_book_copy) == book_state(order_book)
+    assert order_book_copy.order_map["sig_1"].amount == 6
+    assert last_auction == AuctionResult(1700000000.0, 101, 6, 2)
+
+def test_snapshot_then_tail(tmp_path):
+    order_book = OrderBook()
+    journal = OrderJournal(order_book, tmp_path, snapshot_interval=None)
+    journal.start()
+    for i in range(4):
+        order_book.add_order(create_order(i, amount=10, sequence=i + 1))
+    journal.record_auction(AuctionResult(1700000000.0, 100, 0, 0))
+    journal.snapshot()
+    order_book.fill_order(order_book.order_map["sig_0"], 3)
+    order_book.cancel_order("sig_3")
+    order_book.add_order(create_order(4, price=99, order_type="sell", address="rBob"))
+    journal.stop()
+
+    # Only the snapshot and the segment after it are kept
+    assert sorted(os.listdir(tmp_path)) == ["LOCK", "journal-000000000001.log", "snapshot-000000000001.snap"]
+    order_book_copy, last_auction = recovered(tmp_path)
+    assert book_state(order_book_copy) == book_state(order_book)
+    assert last_auction.clearing_price == 100
+
+def test_fills_after_rollover_replay_idempotently(tmp_path):
+    order_book = OrderBook()
+    journal = OrderJournal(order_book, tmp_path, snapshot_interval=None)
+    journal.start()
+    order_book.add_order(create_order(0, amount=10))
+    journal.snapshot()
+    order_book.fill_order(order_book.order_map["sig_0"], 2)
+    order_book.fill_order(order_book.order_map["sig_0"], 3)
+    journal.stop()
+
+    # As if the snapshot had been serialized after both fills landed
+    snapshot_book = OrderBook()
+    snapshot_book.restore([create_order(0, amount=5)])
+    journal = OrderJournal(snapshot_book, tmp_path, snapshot_interval=None)
+    journal._replay(1)
+    assert snapshot_book.order_map["sig_0"].amount == 5
+    assert snapshot_book.bids[100].total_volume == 5
+
+def test_torn_final_record_is_ignored(tmp_path):
+    order_book = OrderBook()
+    journal = OrderJournal(order_book, tmp_path, snapshot_interval=None)
+    journal.start()
+    order_book.add_order(create_order(0))
+    order_book.add_order(create_order(1))
+    journal.stop()
+
+    path = tmp_path / "journal-000000000000.log"
+    content = path.read_text()
+    path.write_text(content[:-20])
+    order_book_copy, _ = recovered(tmp_path)
+    assert list(order_book_copy.order_map) == ["sig_0"]
+
+    # A bad record followed by more records is corruption, not a torn write
+    path.write_text("{not json\n" + content)
+    with pytest.raises(ValueError):
+        recovered(tmp_path)
+
+def test_restart_continues_in_a_new_segment(tmp_path):
+    order_book = OrderBook()
+    journal = OrderJournal(order_book, tmp_path, snapshot_interval=None)
+    journal.start()
+    order_book.add_order(create_order(0))
+    journal.stop()
+
+    order_book, _ = recovered(tmp_path)
+    journal = OrderJournal(order_book, tmp_path, snapshot_interval=None)
+    journal.start()
+    order_book.add_order(create_order(1))
+    journal.stop()
+    assert journal.segment == 1
+
+    order_book_copy, _ = recovered(tmp_path)
+    assert list(order_book_copy.order_map) == ["sig_0", "sig_1"]
+
+def test_second_journal_on_a_directory_fails_fast(tmp_path):
+    journal = OrderJournal(OrderBook(), tmp_path, snapshot_interval=None)
+    journal.recover()
+    journal.start()
+    try:
+        other = OrderJournal(OrderBook(), tmp_path, snapshot_interval=None)
+        with pytest.raises(RuntimeError):
+            other.recover()
+        with pytest.raises(RuntimeError):
+            other.start()
+    finally:
+        journal.stop()
+
+    # Released on stop
+    other = OrderJournal(OrderBook(), tmp_path, snapshot_interval=None)
+    other.recover()
+    other.start()
+    other.stop()
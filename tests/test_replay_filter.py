@@ -0,0 +1,96 @@
+from unittest.mock import Mock, patch
+import pytest
+from xrpl.wallet import Wallet
+from api import API
+from order_book import OrderBook
+from replay_filter import ReplayFilter
+from signature_verifier import VerificationCache, signed_tx_hash
+from tests.conftest import order_request, signed_payment
+
+def test_signed_tx_hash_matches_xrpl():
+    signed = signed_payment(Wallet.create())
+    assert signed_tx_hash(signed.to_xrpl()) == signed.get_hash()
+
+def test_replay_filter_window():
+    replay_filter = ReplayFilter(window_ledgers=10)
+    replay_filter.on_ledger_closed(100)
+    replay_filter.add("sig_1", "hash_1")
+    assert replay_filter.seen("sig_1")
+    assert replay_filter.seen("other", "hash_1")
+    assert not replay_filter.seen("sig_2")
+
+    # Keys survive at least one full window, then age out
+    replay_filter.on_ledger_closed(110)
+    assert replay_filter.seen("sig_1")
+    replay_filter.on_ledger_closed(120)
+    assert not replay_filter.seen("sig_1")
+    assert len(replay_filter) == 0
+
+def test_replay_filter_capacity_rotation():
+    replay_filter = ReplayFilter(capacity=2)
+    replay_filter.add("a")
+    replay_filter.add("b")
+    replay_filter.add("c")
+    replay_filter.add("d")
+    assert not replay_filter.seen("a")
+    assert replay_filter.seen("c", "d")
+
+def test_verification_cache_lru():
+    cache = VerificationCache(maxsize=2)
+    cache.put("a", True)
+    cache.put("b", False)
+    assert cache.get("a") is True
+    cache.put("c", True)
+    assert cache.get("b") is None
+    assert cache.get("a") is True
+    assert cache.get("c") is True
+
+@pytest.fixture
+def api(xrpl_integration):
+    return API(OrderBook(), Mock(), xrpl_integration)
+
+def test_retried_order_is_acknowledged_once(api):
+    wallet = Wallet.create()
+    data = order_request(wallet, signed_payment(wallet).to_xrpl())
+    client = api.app.test_client()
+
+    assert client.post("/place_order", json=data).json["message"] == "Order placed and processed"
+    with patch("api.signed_tx_hash", wraps=signed_tx_hash) as tx_hash:
+        retry = client.post("/place_order", json=data)
+    # Caught on its signature, before hashing
+    tx_hash.assert_not_called()
+    assert retry.status_code == 200
+    assert retry.json["message"] == "Order already placed"
+    assert len(api.order_book.order_map) == 1
+    # The retry never reached the account lookup or the verifier
+    assert api.xrpl_integration.get_account_sequence.call_count == 1
+    assert api.xrpl_integration.verify_payment_signature.call_count == 1
+
+    # Once the order has left the book a replay is rejected outright
+    api.order_book.cancel_order(data["payment_tx_signature"])
+    assert client.post("/place_order", json=data).status_code == 409
+
+def test_racing_retry_is_acknowledged(api):
+    # Both copies passed screen_replay before either reached the book
+    wallet = Wallet.create()
+    data = order_request(wallet, signed_payment(wallet).to_xrpl())
+    tx_hash = signed_tx_hash(data["signed_tx_json"])
+    first, _ = api.build_order(data, 1)
+    second, _ = api.build_order(data, 1)
+
+    assert api.admit_order(first, tx_hash, True) == ({"status": "success", "message": "Order placed and processed"}, 200)
+    assert api.admit_order(second, tx_hash, True) == ({"status": "success", "message": "Order already placed"}, 200)
+    assert list(api.order_book.order_map.values()) == [first]
+
+def test_rejected_signature_is_cached(api):
+    wallet = Wallet.create()
+    data = order_request(wallet, signed_payment(wallet).to_xrpl())
+    data["public_key"] = Wallet.create().public_key
+    client = api.app.test_client()
+
+    for _ in range(2):
+        response = client.post("/place_order", json=data)
+        assert response.status_code == 400
+        assert response.json["message"] == "Invalid payment transaction signature"
+    assert api.xrpl_integration.verify_payment_signature.call_count == 1
+    assert not api.order_book.order_map
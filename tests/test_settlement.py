@@ -1,7 +1,10 @@
 import pytest
+import time
 from unittest.mock import Mock, patch
 from settlement import Settlement
 from order_book import Order
+from market import Market
+from netting import net_payouts
 from xrpl.transaction import XRPLReliableSubmissionException
 
 @pytest.fixture
@@ -29,27 +32,55 @@ def create_mock_order(order_type, price, amount, matched_amount=None, address="r
     order.matched_amount = matched_amount if matched_amount is not None else amount
     order.xrp_address = address
     order.payment_tx_signature = "mock_payment_signature"
+    order.signed_tx_json = {"TxnSignature": "mock_payment_signature"}
     return order
 
 def test_process_matched_orders_success(settlement):
     buy_order = create_mock_order("buy", 100, 10, matched_amount=8)
     sell_order = create_mock_order("sell", 100, 10, matched_amount=8)
     
-    with patch.object(Settlement, 'execute_order', return_value=True) as mock_execute:
+    with patch.object(Settlement, 'submit_payment', return_value=True) as mock_payment, \
+         patch.object(Settlement, 'submit_payout', return_value=True) as mock_payout:
         result = settlement.process_matched_orders([buy_order, sell_order])
     
     assert result == True
-    assert mock_execute.call_count == 2
+    assert mock_payment.call_count == 2
+    # Both legs belong to the same account and are netted into a single payout
+    assert mock_payout.call_count == 1
 
 def test_process_matched_orders_failure(settlement):
     buy_order = create_mock_order("buy", 100, 10, matched_amount=8)
     sell_order = create_mock_order("sell", 100, 10, matched_amount=8)
     
-    with patch.object(Settlement, 'execute_order', side_effect=[True, False]) as mock_execute:
+    with patch.object(Settlement, 'submit_payment', side_effect=lambda order: order is buy_order) as mock_payment, \
+         patch.object(Settlement, 'submit_payout', return_value=True) as mock_payout:
         result = settlement.process_matched_orders([buy_order, sell_order])
     
     assert result == False
-    assert mock_execute.call_count == 2
+    assert mock_payment.call_count == 2
+    # The buy leg's payment confirmed, so it is still paid out on its own
+    (payout, _), _ = mock_payout.call_args
+    assert payout.orders == [buy_order]
+    assert payout.amount == 8
+    assert settlement.last_failed_orders == [sell_order]
+
+def test_failed_payment_is_left_out_of_netted_payout(settlement):
+    market = settlement.market
+    first = create_mock_order("sell", 10000, 10, matched_amount=5, address="rAlice")
+    second = create_mock_order("sell", 10000, 10, matched_amount=3, address="rAlice")
+    other = create_mock_order("buy", 10000, 10, matched_amount=4, address="rBob")
+
+    with patch.object(Settlement, 'submit_payment', side_effect=lambda order: order is not first), \
+         patch.object(Settlement, 'submit_payout', return_value=True) as mock_payout:
+        result = settlement.process_matched_orders([first, second, other])
+
+    assert result == False
+    payouts = sorted((call.args[0] for call in mock_payout.call_args_list), key=lambda payout: payout.destination)
+    assert [(payout.destination, payout.amount, payout.orders) for payout in payouts] == [
+        ("rAlice", market.quote_amount(3, 10000), [second]),
+        ("rBob", 4, [other]),
+    ]
+    assert settlement.last_failed_orders == [first]
 
 def test_execute_order_buy(settlement, mock_xrpl_integration, mock_multisig_wallet):
     buy_order = create_mock_order("buy", 100, 10, matched_amount=8)  # Partial fill
@@ -59,24 +90,24 @@ def test_execute_order_buy(settlement, mock_xrpl_integration, mock_multisig_wall
         result = settlement.execute_order(buy_order)
     
     assert result == True
-    mock_submit.assert_any_call(buy_order.payment_tx_signature, "Full payment for buy order")
+    mock_submit.assert_any_call(buy_order.signed_tx_json, "Full payment for buy order")
     mock_submit.assert_any_call("mock_payout_tx", "Payout for buy order")
     mock_xrpl_integration.create_payment_transaction.assert_called_once_with(
-        mock_multisig_wallet.get_address(), buy_order.xrp_address, 8  # Use matched_amount
+        mock_multisig_wallet.get_address(), buy_order.xrp_address, 8, sequence=None  # Use matched_amount
     )
 
 def test_execute_order_sell(settlement, mock_xrpl_integration, mock_multisig_wallet):
-    sell_order = create_mock_order("sell", 100, 10, matched_amount=7)  # Partial fill
+    sell_order = create_mock_order("sell", 10000, 10, matched_amount=7)  # Partial fill at 100.00 (price in ticks)
     mock_xrpl_integration.create_payment_transaction.return_value = "mock_payout_tx"
     
     with patch.object(Settlement, 'submit_transaction', side_effect=[True, True]) as mock_submit:
         result = settlement.execute_order(sell_order)
     
     assert result == True
-    mock_submit.assert_any_call(sell_order.payment_tx_signature, "Full payment for sell order")
+    mock_submit.assert_any_call(sell_order.signed_tx_json, "Full payment for sell order")
     mock_submit.assert_any_call("mock_payout_tx", "Payout for sell order")
     mock_xrpl_integration.create_payment_transaction.assert_called_once_with(
-        mock_multisig_wallet.get_address(), sell_order.xrp_address, 700  # 7 * 100
+        mock_multisig_wallet.get_address(), sell_order.xrp_address, 700, sequence=None  # 7 * 100
     )
 
 def test_submit_transaction_success(settlement, mock_xrpl_integration):
@@ -104,3 +135,119 @@ def test_submit_transaction_exception(settlement, mock_xrpl_integration):
     
     assert result == False
     mock_xrpl_integration.submit_transaction.assert_called_once_with("mock_tx")
+
+def test_concurrent_settlement(mock_xrpl_integration, mock_multisig_wallet):
+    def slow_submit(transaction):
+        time.sleep(0.05)  # Stand-in for waiting on a ledger close
+        return mock_xrpl_integration.submit_transaction.return_value
+
+    mock_xrpl_integration.submit_transaction.side_effect = slow_submit
+    mock_xrpl_integration.fetch_account_sequence.return_value = 40
+    mock_xrpl_integration.create_payment_transaction.side_effect = lambda sender, destination, amount, sequence: sequence
+    orders = [create_mock_order("buy", 100, 10, address=f"rUser{i}") for i in range(10)]
+
+    settlement = Settlement(mock_xrpl_integration, mock_multisig_wallet, concurrency=10)
+    assert settlement.process_matched_orders(orders) == True
+
+    # Two round trips per order; run serially this would take about a second
+    assert settlement.last_batch_wall_time < 0.5
+    # Read from the ledger, never from the admission cache
+    mock_xrpl_integration.fetch_account_sequence.assert_called_once_with("rMultisigWalletAddress")
+    mock_xrpl_integration.get_account_sequence.assert_not_called()
+    payout_sequences = [call.args[0] for call in mock_xrpl_integration.submit_transaction.call_args_list
+                        if isinstance(call.args[0], int)]
+    assert sorted(payout_sequences) == list(range(40, 50))
+
+def test_concurrent_settlement_attempts_every_order(settlement):
+    orders = [create_mock_order("buy", 100, 10, address=f"rUser{i}") for i in range(4)]
+
+    with patch.object(Settlement, 'submit_payment', side_effect=[True, False, True, True]) as mock_payment, \
+         patch.object(Settlement, 'submit_payout', return_value=True) as mock_payout:
+        result = settlement.process_matched_orders(orders)
+
+    assert result == False
+    assert mock_payment.call_count == 4
+    assert mock_payout.call_count == 3
+
+def test_net_payouts():
+    market = Market(tick_size="0.01")
+    orders = [
+        create_mock_order("buy", 10000, 10, matched_amount=8, address="rAlice"),
+        create_mock_order("sell", 10050, 10, matched_amount=3, address="rBob"),
+        create_mock_order("sell", 10050, 10, matched_amount=3, address="rAlice"),
+        create_mock_order("sell", 10033, 10, matched_amount=1, address="rAlice"),
+    ]
+
+    payouts = net_payouts(orders, market)
+
+    assert [payout.destination for payout in payouts] == ["rAlice", "rBob"]
+    # 8 drops bought, plus 3 * 100.50 + 1 * 100.33 = 401.83 sold, rounded down once
+    assert payouts[0].amount == 8 + 401
+    assert payouts[0].orders == [orders[0], orders[2], orders[3]]
+    assert payouts[1].amount == 301
+
+def payout_sequence_xrpl(mock_xrpl_integration, failures):
+    """Payouts are built as their sequence; ``failures`` maps a sequence to the errors its next submissions raise."""
+    submitted = []
+
+    def submit(transaction):
+        if isinstance(transaction, int):
+            submitted.append(transaction)
+            errors = failures.get(transaction)
+            if errors:
+                raise errors.pop(0)
+        return mock_xrpl_integration.submit_transaction.return_value
+
+    mock_xrpl_integration.submit_transaction.side_effect = submit
+    mock_xrpl_integration.create_payment_transaction.side_effect = lambda sender, destination, amount, sequence: sequence
+    return submitted
+
+def test_unused_payout_sequence_is_refetched(mock_xrpl_integration, mock_multisig_wallet):
+    # The payout with sequence 40 never applies, so 41 would sit at terPRE_SEQ behind it
+    submitted = payout_sequence_xrpl(mock_xrpl_integration, {40: [XRPLReliableSubmissionException("temBAD_FEE: Invalid fee")]})
+    mock_xrpl_integration.fetch_account_sequence.side_effect = [40, 40]
+    orders = [create_mock_order("buy", 100, 10, address=f"rUser{i}") for i in range(2)]
+
+    settlement = Settlement(mock_xrpl_integration, mock_multisig_wallet, concurrency=1)
+    assert settlement.process_matched_orders(orders) == True
+
+    assert submitted == [40, 40, 41]
+    assert mock_xrpl_integration.fetch_account_sequence.call_count == 2
+
+def test_failed_autofill_does_not_use_a_sequence(mock_xrpl_integration, mock_multisig_wallet):
+    submitted = payout_sequence_xrpl(mock_xrpl_integration, {})
+    attempts = iter([ConnectionError("connection reset")])
+
+    def create(sender, destination, amount, sequence):
+        error = next(attempts, None)
+        if error is not None:
+            raise error
+        return sequence
+
+    mock_xrpl_integration.create_payment_transaction.side_effect = create
+    mock_xrpl_integration.fetch_account_sequence.side_effect = [40, 40]
+    orders = [create_mock_order("buy", 100, 10, address=f"rUser{i}") for i in range(2)]
+
+    settlement = Settlement(mock_xrpl_integration, mock_multisig_wallet, concurrency=1)
+    assert settlement.process_matched_orders(orders) == True
+    assert submitted == [40, 41]
+
+def test_tec_payout_keeps_its_sequence(mock_xrpl_integration, mock_multisig_wallet):
+    # A tec result is applied to claim the fee, so the sequence is spent and not retried
+    submitted = payout_sequence_xrpl(mock_xrpl_integration, {40: [XRPLReliableSubmissionException("Transaction failed: tecUNFUNDED_PAYMENT")]})
+    mock_xrpl_integration.fetch_account_sequence.return_value = 40
+    orders = [create_mock_order("buy", 100, 10, address=f"rUser{i}") for i in range(2)]
+
+    settlement = Settlement(mock_xrpl_integration, mock_multisig_wallet, concurrency=1)
+    assert settlement.process_matched_orders(orders) == False
+
+    assert submitted == [40, 41]
+    mock_xrpl_integration.fetch_account_sequence.assert_called_once()
+
+def test_payout_attempts_are_bounded(mock_xrpl_integration, mock_multisig_wallet):
+    submitted = payout_sequence_xrpl(mock_xrpl_integration, {40: [XRPLReliableSubmissionException("temBAD_FEE")] * 5})
+    mock_xrpl_integration.fetch_account_sequence.return_value = 40
+
+    settlement = Settlement(mock_xrpl_integration, mock_multisig_wallet, payout_attempts=3)
+    assert settlement.process_matched_orders([create_mock_order("buy", 100, 10)]) == False
+    assert submitted == [40, 40, 40]
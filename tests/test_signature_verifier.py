@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from xrpl.constants import CryptoAlgorithm
+from xrpl.models import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+from signature_verifier import SignatureVerifier, verify_payment_signature
+
+def signed_order(algorithm, sequence=1):
+    wallet = Wallet.create(algorithm=algorithm)
+    payment = Payment(account=wallet.classic_address, amount="1000000", destination="rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+                      sequence=sequence, fee="12", last_ledger_sequence=1000)
+    signed_tx_json = sign(payment, wallet).to_xrpl()
+    return signed_tx_json["TxnSignature"], wallet.public_key, signed_tx_json
+
+def tampered(order):
+    payment_tx_signature, public_key, signed_tx_json = order
+    return payment_tx_signature, public_key, dict(signed_tx_json, Amount="2000000")
+
+@pytest.fixture(scope="module")
+def verifier():
+    verifier = SignatureVerifier(workers=2, chunk_size=2)
+    yield verifier
+    verifier.shutdown()
+
+@pytest.mark.parametrize("algorithm", [CryptoAlgorithm.SECP256K1, CryptoAlgorithm.ED25519])
+def test_verify_payment_signature(algorithm):
+    order = signed_order(algorithm)
+    assert verify_payment_signature(*order)
+    assert not verify_payment_signature(*tampered(order))
+    assert not verify_payment_signature(None, order[1], order[2])
+
+def test_verify_on_worker_pool(verifier):
+    order = signed_order(CryptoAlgorithm.ED25519)
+    assert verifier.verify(*order)
+    assert not asyncio.run(verifier.verify_async(*tampered(order)))
+
+def test_verify_many_keeps_order(verifier):
+    orders = [signed_order(CryptoAlgorithm.SECP256K1, i) for i in range(1, 4)] + [signed_order(CryptoAlgorithm.ED25519, 4)]
+    batch = [orders[0], tampered(orders[1]), orders[2], orders[3], tampered(orders[3])]
+
+    assert asyncio.run(verifier.verify_many(batch)) == [True, False, True, True, False]
@@ -0,0 +1,45 @@
+import asyncio
+from xrpl.models import AccountInfo
+from xrpl_client import XRPLClientPool
+from xrpl_integration import XRPLIntegration
+from tests.stub_xrpl_server import StubXRPLServer
+
+ADDRESSES = ["rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh", "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe", "rJrRMgiRgrU6hDF4pgu5DXQdWyPbY35ErN"]
+
+def account_handlers():
+    sequences = {address: i + 1 for i, address in enumerate(ADDRESSES)}
+    return {"account_info": lambda params: {"account_data": {"Account": params["account"], "Sequence": sequences[params["account"]]}}}
+
+def test_sync_requests_reuse_connections():
+    with StubXRPLServer(account_handlers()) as server:
+        pool = XRPLClientPool([server.url])
+        try:
+            for _ in range(10):
+                response = pool.sync_client.request(AccountInfo(account=ADDRESSES[0]))
+                assert response.result["account_data"]["Sequence"] == 1
+            assert server.calls["account_info"] == 10
+            assert len(server.connections) == 1
+        finally:
+            pool.close()
+
+def test_batched_async_reads():
+    with StubXRPLServer(account_handlers()) as server:
+        pool = XRPLClientPool([server.url])
+        xrpl_integration = XRPLIntegration(pool)
+        try:
+            sequences = asyncio.run(xrpl_integration.get_account_sequences_async(ADDRESSES))
+            assert sequences == {ADDRESSES[0]: 1, ADDRESSES[1]: 2, ADDRESSES[2]: 3}
+            assert asyncio.run(xrpl_integration.get_account_sequence_async(ADDRESSES[1])) == 2
+        finally:
+            pool.close()
+
+def test_failover_to_next_endpoint():
+    with StubXRPLServer(account_handlers()) as server:
+        # Nothing listens on port 9 locally, so the first endpoint refuses the connection
+        pool = XRPLClientPool(["http://127.0.0.1:9", server.url])
+        try:
+            response = pool.request(AccountInfo(account=ADDRESSES[2]))
+            assert response.result["account_data"]["Sequence"] == 3
+            assert pool.url == server.url
+        finally:
+            pool.close()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import threading
+from json import JSONDecodeError
+import httpx
+from xrpl.asyncio.clients.async_client import AsyncClient
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
+from xrpl.asyncio.clients.json_rpc_base import JsonRpcBase
+from xrpl.asyncio.clients.utils import json_to_response, request_to_json_rpc
+from xrpl.clients.sync_client import SyncClient
+from config import XRPL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class XRPLClientPool:
+    """Shared connection pool for all JSON-RPC traffic to the XRPL.
+
+    One httpx.AsyncClient with persistent keep-alive connections lives on a
+    dedicated event loop thread, and every request from any thread or event loop
+    is dispatched onto it. Endpoints are tried in order, failing over to the next
+    one on transport errors. Use ``sync_client`` and ``async_client`` wherever
+    xrpl-py expects a client.
+    """
+
+    def __init__(self, endpoints=None, timeout=XRPL_CONFIG["timeout"],
+                 max_connections=XRPL_CONFIG["max_connections"],
+                 max_keepalive_connections=XRPL_CONFIG["max_keepalive_connections"]):
+        self.endpoints = list(endpoints if endpoints is not None else XRPL_CONFIG["endpoints"])
+        if not self.endpoints:
+            raise ValueError("At least one XRPL endpoint is required")
+        self.timeout = timeout
+        self._active_endpoint = 0
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self._http_client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.sync_client = PooledJsonRpcClient(self)
+        self.async_client = AsyncPooledJsonRpcClient(self)
+
+    @property
+    def url(self):
+        return self.endpoints[self._active_endpoint]
+
+    def request(self, request, timeout=None):
+        """Send a request from synchronous code, blocking until the response arrives."""
+        return asyncio.run_coroutine_threadsafe(self._send(request, timeout), self._loop).result()
+
+    async def request_async(self, request, timeout=None):
+        """Send a request from any event loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._send(request, timeout), self._loop))
+
+    def request_many(self, requests, timeout=None):
+        """Send independent reads concurrently over the pool, returning responses in order."""
+        return asyncio.run_coroutine_threadsafe(self._send_many(requests, timeout), self._loop).result()
+
+    async def request_many_async(self, requests, timeout=None):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._send_many(requests, timeout), self._loop))
+
+    def close(self):
+        if self._http_client is not None:
+            asyncio.run_coroutine_threadsafe(self._http_client.aclose(), self._loop).result()
+            self._http_client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def _send_many(self, requests, timeout):
+        return await asyncio.gather(*(self._send(request, timeout) for request in requests))
+
+    async def _send(self, request, timeout):
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(limits=self._limits, timeout=self.timeout)
+        timeout = timeout if timeout is not None else self.timeout
+
+        for attempt in range(len(self.endpoints)):
+            endpoint = self._active_endpoint
+            try:
+                response = await self._http_client.post(self.endpoints[endpoint], json=request_to_json_rpc(request), timeout=timeout)
+                break
+            except httpx.TransportError as e:
+                if attempt == len(self.endpoints) - 1:
+                    raise
+                logger.warning(f"XRPL endpoint {self.endpoints[endpoint]} failed ({e}); failing over")
+                self._active_endpoint = (endpoint + 1) % len(self.endpoints)
+
+        try:
+            return json_to_response(response.json())
+        except JSONDecodeError:
+            raise XRPLRequestFailureException({"error": response.status_code, "error_message": response.text})
+
+class PooledJsonRpcClient(SyncClient, JsonRpcBase):
+    """Synchronous xrpl-py client backed by an XRPLClientPool."""
+
+    def __init__(self, pool):
+        super().__init__(pool.url)
+        self.pool = pool
+
+    def request(self, request):
+        return self.pool.request(request)
+
+    async def _request_impl(self, request, *, timeout=None):
+        return await self.pool.request_async(request, timeout)
+
+class AsyncPooledJsonRpcClient(AsyncClient, JsonRpcBase):
+    """Asynchronous xrpl-py client backed by an XRPLClientPool."""
+
+    def __init__(self, pool):
+        super().__init__(pool.url)
+        self.pool = pool
+
+    async def _request_impl(self, request, *, timeout=None):
+        return await self.pool.request_async(request, timeout)
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_shared_pool():
+    """The process-wide XRPLClientPool, created from XRPL_CONFIG on first use."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = XRPLClientPool()
+        return _shared_pool
@@ -1,21 +1,49 @@
+import asyncio
 import logging
 import copy
 import json
-from xrpl.clients import JsonRpcClient
 from xrpl.models.transactions import Payment
-from xrpl.models import AccountInfo, LedgerCurrent, Payment
+from xrpl.models import AccountInfo, Ledger, LedgerCurrent, Payment, Tx
 from xrpl.wallet import generate_faucet_wallet
 from xrpl.transaction import submit_and_wait, autofill_and_sign, autofill
-from xrpl.core import keypairs
+from xrpl.asyncio import transaction as async_transaction
+from xrpl.asyncio.wallet import generate_faucet_wallet as generate_faucet_wallet_async
 from xrpl.account import get_next_valid_seq_number
 from xrpl.ledger import get_fee
-from xrpl.core.binarycodec import encode_for_signing
+from ledger_tracker import LedgerTracker
+from account_cache import AccountSequenceCache
+from xrpl_client import get_shared_pool
+from signature_verifier import SignatureVerifier, verify_payment_signature
 
 logger = logging.getLogger(__name__)
 
 class XRPLIntegration:
-    def __init__(self):
-        self.client = JsonRpcClient("https://s.altnet.rippletest.net:51234")
+    def __init__(self, client_pool=None):
+        # All XRPL I/O goes through one pooled client layer; see xrpl_client.py
+        self.client_pool = client_pool if client_pool is not None else get_shared_pool()
+        self.client = self.client_pool.sync_client
+        self.async_client = self.client_pool.async_client
+        self.ledger_tracker = None
+        self.account_cache = None
+        self.signature_verifier = None
+
+    def start_ledger_tracker(self, poll_interval=1.0, max_staleness=4.0):
+        """Serve ledger indexes from a shared background poller instead of one RPC per call."""
+        self.ledger_tracker = LedgerTracker(self.get_ledger_indexes, poll_interval, max_staleness)
+        self.ledger_tracker.start()
+        return self.ledger_tracker
+
+    def enable_account_cache(self, ttl=10.0):
+        """Cache account sequences, dropping them on every validated ledger when a tracker is running."""
+        self.account_cache = AccountSequenceCache(self.fetch_account_sequence, ttl)
+        if self.ledger_tracker is not None:
+            self.ledger_tracker.add_listener(self.account_cache.on_ledger_closed)
+        return self.account_cache
+
+    def start_signature_verifier(self, workers=None, chunk_size=64):
+        """Move signature verification off the request thread onto a process pool."""
+        self.signature_verifier = SignatureVerifier(workers, chunk_size)
+        return self.signature_verifier
 
     def create_wallet(self):
         return generate_faucet_wallet(self.client)
@@ -31,44 +59,32 @@ class XRPLIntegration:
         return response
 
     def get_account_sequence(self, address):
+        if self.account_cache is not None:
+            return self.account_cache.get(address)
+        return self.fetch_account_sequence(address)
+
+    def fetch_account_sequence(self, address):
         request = AccountInfo(account=address)
         response = self.client.request(request)
         return response.result['account_data']['Sequence']
 
     def verify_payment_signature(self, payment_tx_signature, public_key, signed_tx_json):
-        if payment_tx_signature is None:
-            logger.error("Payment signature is None")
-            return False
-        
-        try:
-            # Remove TxnSignature and hash fields
-            tx_json = {k: v for k, v in signed_tx_json.items() if k not in ["TxnSignature", "hash"]}
-            
-            # Serialize the transaction
-            signing_data = encode_for_signing(tx_json)
-            
-            # Convert the hex string to bytes
-            signing_data_bytes = bytes.fromhex(signing_data)
-
-            # Verify the Signature
-            is_valid = keypairs.is_valid_message(
-                message=signing_data_bytes,
-                signature=bytes.fromhex(payment_tx_signature),
-                public_key=public_key
-            )
-
-            logger.debug(f"Signature verification result: {is_valid}")
-            return is_valid
-
-        except Exception as e:
-            logger.error(f"Error verifying payment signature: {str(e)}", exc_info=True)
-            return False
-
-    def create_payment_transaction(self, sender_address, destination, amount):
+        if self.signature_verifier is not None:
+            return self.signature_verifier.verify(payment_tx_signature, public_key, signed_tx_json)
+        return verify_payment_signature(payment_tx_signature, public_key, signed_tx_json)
+
+    def verify_payment_signatures(self, items):
+        """Verify (payment_tx_signature, public_key, signed_tx_json) tuples as one batch."""
+        if self.signature_verifier is not None:
+            return asyncio.run(self.signature_verifier.verify_many(items))
+        return [verify_payment_signature(*item) for item in items]
+
+    def create_payment_transaction(self, sender_address, destination, amount, sequence=None):
         payment = Payment(
             account=sender_address,
             destination=destination,
-            amount=str(amount)
+            amount=str(amount),
+            sequence=sequence
         )
         return autofill(payment, self.client)
 
@@ -86,7 +102,94 @@ class XRPLIntegration:
             return submit_and_wait(transaction, self.client)
 
     def get_current_ledger_sequence(self):
+        if self.ledger_tracker is not None:
+            return self.ledger_tracker.get_current_ledger_index()
         request = LedgerCurrent()
         response = self.client.request(request)
         return response.result['ledger_current_index']
 
+    def get_ledger_indexes(self):
+        current, validated = self.client_pool.request_many([LedgerCurrent(), Ledger(ledger_index="validated")])
+        return current.result['ledger_current_index'], validated.result['ledger_index']
+
+    # Async variants. These run on the caller's event loop and share the same
+    # connection pool as the synchronous methods above.
+
+    async def create_wallet_async(self):
+        return await generate_faucet_wallet_async(self.async_client)
+
+    async def send_payment_async(self, sender_wallet, destination_address, amount):
+        payment = Payment(
+            account=sender_wallet.classic_address,
+            amount=str(amount),
+            destination=destination_address,
+        )
+        signed_tx = await async_transaction.autofill_and_sign(payment, self.async_client, sender_wallet)
+        return await async_transaction.submit_and_wait(signed_tx, self.async_client)
+
+    async def get_account_sequence_async(self, address, timeout=None):
+        if self.account_cache is not None:
+            sequence = self.account_cache.peek(address)
+            if sequence is not None:
+                return sequence
+            # Misses go through the cache so they stay single-flight with synchronous callers
+            return await asyncio.to_thread(self.account_cache.get, address)
+        return await self.fetch_account_sequence_async(address, timeout)
+
+    async def fetch_account_sequence_async(self, address, timeout=None):
+        response = await self.client_pool.request_async(AccountInfo(account=address), timeout)
+        return response.result['account_data']['Sequence']
+
+    async def get_account_sequences_async(self, addresses, timeout=None):
+        """Fetch many account sequences concurrently, returning {address: sequence}."""
+        addresses = list(addresses)
+        responses = await self.client_pool.request_many_async([AccountInfo(account=address) for address in addresses], timeout)
+        return {address: response.result['account_data']['Sequence'] for address, response in zip(addresses, responses)}
+
+    async def get_transaction_statuses_async(self, tx_hashes, timeout=None):
+        """Look up many transactions concurrently, returning {hash: tx result}."""
+        tx_hashes = list(tx_hashes)
+        responses = await self.client_pool.request_many_async([Tx(transaction=tx_hash) for tx_hash in tx_hashes], timeout)
+        return {tx_hash: response.result for tx_hash, response in zip(tx_hashes, responses)}
+
+    async def verify_payment_signature_async(self, payment_tx_signature, public_key, signed_tx_json):
+        if self.signature_verifier is not None:
+            return await self.signature_verifier.verify_async(payment_tx_signature, public_key, signed_tx_json)
+        return await asyncio.to_thread(verify_payment_signature, payment_tx_signature, public_key, signed_tx_json)
+
+    async def verify_payment_signatures_async(self, items):
+        """Verify (payment_tx_signature, public_key, signed_tx_json) tuples as one batch."""
+        if self.signature_verifier is not None:
+            return await self.signature_verifier.verify_many(items)
+        return await asyncio.to_thread(lambda: [verify_payment_signature(*item) for item in items])
+
+    async def create_payment_transaction_async(self, sender_address, destination, amount, sequence=None):
+        payment = Payment(
+            account=sender_address,
+            destination=destination,
+            amount=str(amount),
+            sequence=sequence
+        )
+        return await async_transaction.autofill(payment, self.async_client)
+
+    async def submit_transaction_async(self, transaction):
+        if isinstance(transaction, dict):
+            payment = Payment.from_xrpl(transaction)
+            return await async_transaction.submit_and_wait(payment, self.async_client)
+        if hasattr(transaction, 'last_ledger_sequence') and transaction.last_ledger_sequence is not None:
+            current_ledger = await self.get_current_ledger_sequence_async()
+            if transaction.last_ledger_sequence <= current_ledger:
+                raise ValueError("Transaction has expired (LastLedgerSequence has passed)")
+        return await async_transaction.submit_and_wait(transaction, self.async_client)
+
+    async def get_current_ledger_sequence_async(self, timeout=None):
+        if self.ledger_tracker is not None:
+            staleness = self.ledger_tracker.staleness()
+            if staleness is not None and staleness <= self.ledger_tracker.max_staleness:
+                return self.ledger_tracker.get_current_ledger_index()
+        response = await self.client_pool.request_async(LedgerCurrent(), timeout)
+        return response.result['ledger_current_index']
+
+    async def get_ledger_indexes_async(self, timeout=None):
+        current, validated = await self.client_pool.request_many_async([LedgerCurrent(), Ledger(ledger_index="validated")], timeout)
+        return current.result['ledger_current_index'], validated.result['ledger_index']